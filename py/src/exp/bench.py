@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tcc.alns import (
+    IncrementalFeasibility,
+    LogOptions,
+    SolverContext,
+    TreeState,
+    run_alns_sa,
+    destroy_remove_k_global_edges,
+    destroy_disconnect_cluster,
+    repair_r1_dijkstra,
+    repair_r1_dijkstra_topL,
+    repair_r3_mst_components,
+    repair_r4_steiner_hub,
+)
+from tcc.instance import Instance
+from tcc.instance_cache import load_instance
+from tcc.solution import Solution
+from tcc.verify import verify_solution
+
+from exp.run_alns_sa import cost_fn, feasible_fn, num_edges_fn
+from exp.runner import solve_two_level_mst
+
+BENCH_VERSION = 1
+
+# escada padrão de instâncias sintéticas: vértices x clusters
+DEFAULT_SIZES = "250x10,1000x25,2000x40"
+
+DESTROYS = [
+    ("D1_rm_k", partial(destroy_remove_k_global_edges, k=2)),
+    ("D2_disc_cluster", destroy_disconnect_cluster),
+]
+REPAIRS = [
+    ("R1_topL", partial(repair_r1_dijkstra_topL, L=5)),
+    ("R1_dijkstra", repair_r1_dijkstra),
+    ("R3_comp_mst", repair_r3_mst_components),
+    ("R4_steiner_hub", partial(repair_r4_steiner_hub, max_candidates=25)),
+]
+
+
+def synthetic_instance(n: int, num_clusters: int, seed: int = 0, terminal_frac: float = 0.5) -> Instance:
+    """
+    Instância euclidiana (EUC_2D, pesos calculados das coordenadas) com `n`
+    vértices: round(terminal_frac * n) terminais em `num_clusters` nuvens
+    gaussianas e o resto espalhado uniformemente como vértices Steiner.
+    Determinística em (n, num_clusters, seed, terminal_frac).
+    """
+    n_term = int(round(terminal_frac * n))
+    if num_clusters < 1 or n_term < num_clusters or n_term > n:
+        raise ValueError(f"precisa de 1 <= clusters <= terminais <= n (n={n}, clusters={num_clusters}, terminais={n_term})")
+    rng = np.random.default_rng(seed)
+    side = 100.0 * math.sqrt(n)
+    centers = rng.uniform(0.1 * side, 0.9 * side, size=(num_clusters, 2))
+    labels = np.arange(n_term) % num_clusters
+    spread = side / (4.0 * math.sqrt(num_clusters))
+    terms = centers[labels] + rng.normal(0.0, spread, size=(n_term, 2))
+    steiner = rng.uniform(0.0, side, size=(n - n_term, 2))
+    coords = np.rint(np.clip(np.vstack([terms, steiner]), 0.0, side))
+
+    # embaralha para os terminais não ficarem todos no começo
+    perm = rng.permutation(n)
+    coords = coords[perm]
+    cluster_of = np.full(n, -1, dtype=np.int64)
+    cluster_of[perm[:n_term]] = labels
+    clusters = [sorted(np.flatnonzero(cluster_of == c).tolist()) for c in range(num_clusters)]
+
+    inst = Instance(
+        name=f"SYN_{n}n{num_clusters}c_s{seed}",
+        n=n,
+        m=n * (n - 1) // 2,
+        edges=None,
+        terminals=sorted(v for c in clusters for v in c),
+        clusters=clusters,
+        cluster_of=cluster_of.tolist(),
+        is_euclidean=True,
+        coords=coords,
+        edge_weight_type="EUC_2D",
+    )
+    inst.validate()
+    return inst
+
+
+def parse_sizes(spec: str) -> List[Tuple[int, int]]:
+    out = []
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        try:
+            n, h = item.lower().split("x")
+            out.append((int(n), int(h)))
+        except ValueError:
+            raise ValueError(f"tamanho inválido {item!r} (esperava NxH, ex.: 1000x25)") from None
+    return out
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    t = np.asarray(samples, dtype=np.float64)
+    return {
+        "samples": int(t.size),
+        "mean_s": float(t.mean()),
+        "std_s": float(t.std(ddof=1)) if t.size > 1 else 0.0,
+        "min_s": float(t.min()),
+        "p50_s": float(np.percentile(t, 50)),
+        "p90_s": float(np.percentile(t, 90)),
+        "max_s": float(t.max()),
+    }
+
+
+def measure(fn: Callable[[int], Any], warmup: int, repeat: int) -> List[float]:
+    """
+    Tempos de `repeat` chamadas fn(rep) depois de `warmup` chamadas
+    descartadas. `rep` vai para as sementes: a repetição i faz o mesmo
+    trabalho em qualquer commit.
+    """
+    for i in range(warmup):
+        fn(-1 - i)
+    out = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn(i)
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def bench_instance(inst: Instance, args) -> List[Dict[str, Any]]:
+    if args.knn and args.knn > 0:
+        inst.build_candidates(args.knn)
+    ctx = SolverContext.from_instance(inst)
+    cost, edges = solve_two_level_mst(inst)
+    base = Solution(instance_name=inst.name, cost=cost, edges=edges)
+    if not verify_solution(inst, base).feasible:
+        raise RuntimeError(f"{inst.name}: baseline inviável")
+
+    rows: List[Dict[str, Any]] = []
+
+    def add(bench: str, samples: List[float], **extra: Any) -> None:
+        row = {"instance": inst.name, "n": inst.n, "clusters": len(inst.clusters), "bench": bench}
+        row.update(summarize(samples))
+        row.update(extra)
+        rows.append(row)
+        print(f"  {bench:<22} p50={1e3 * row['p50_s']:10.3f}ms  mean={1e3 * row['mean_s']:10.3f}ms  samples={row['samples']}", flush=True)
+
+    add("construct", measure(lambda rep: solve_two_level_mst(inst), args.warmup, args.repeat_slow))
+    add("verify", measure(lambda rep: verify_solution(inst, base), args.warmup, args.repeat_slow))
+
+    # operadores no modo no lugar, como em run_alns_sa: cada repetição parte
+    # da baseline (rollback) com um rng fixo por repetição
+    state = TreeState.from_solution(ctx, base)
+    for dname, destroy in DESTROYS:
+        def run_destroy(rep: int) -> None:
+            mark = state.checkpoint()
+            destroy(ctx, state, random.Random(args.seed * 1_000_003 + rep))
+            state.rollback(mark)
+
+        add(f"destroy/{dname}", measure(run_destroy, args.warmup, args.repeat))
+
+    for rname, repair in REPAIRS:
+        samples: List[float] = []
+        for i in range(args.warmup + args.repeat):
+            rep = i - args.warmup
+            rng = random.Random(args.seed * 1_000_003 + rep)
+            _, destroy = DESTROYS[i % len(DESTROYS)]
+            mark = state.checkpoint()
+            partial_state = destroy(ctx, state, rng)
+            t0 = time.perf_counter()
+            repair(ctx, partial_state, rng)
+            t1 = time.perf_counter()
+            state.rollback(mark)
+            if rep >= 0:
+                samples.append(t1 - t0)
+        add(f"repair/{rname}", samples)
+
+    # factibilidade incremental: check() do candidato (comparar com
+    # "verify") e accept(), que re-enraíza a árvore inteira (O(n)).
+    # Depois de cada accept o state volta à baseline e verify() ressincroniza.
+    feas = IncrementalFeasibility(ctx, state)
+    t_check: List[float] = []
+    t_accept: List[float] = []
+    for i in range(args.warmup + args.repeat):
+        rep = i - args.warmup
+        rng = random.Random(args.seed * 1_000_003 + rep)
+        _, destroy = DESTROYS[i % len(DESTROYS)]
+        _, repair = REPAIRS[i % len(REPAIRS)]
+        mark = state.checkpoint()
+        repair(ctx, destroy(ctx, state, rng), rng)
+        t0 = time.perf_counter()
+        ok = feas.check(mark)
+        t1 = time.perf_counter()
+        if ok:
+            feas.accept()
+            t2 = time.perf_counter()
+        state.rollback(mark)
+        feas.verify()
+        if rep >= 0:
+            t_check.append(t1 - t0)
+            if ok:
+                t_accept.append(t2 - t1)
+    add("feasibility/check", t_check)
+    if t_accept:
+        add("feasibility/accept", t_accept)
+
+    # ALNS completo: tempo por iteração (log desligado, sem limite de tempo)
+    def run_alns(rep: int) -> None:
+        run_alns_sa(
+            instance=inst,
+            instance_id=inst.name,
+            build_initial=lambda _inst: base,
+            cost_fn=cost_fn,
+            feasible_fn=feasible_fn,
+            num_edges_fn=num_edges_fn,
+            destroy_ops=DESTROYS,
+            repair_ops=REPAIRS,
+            log_path=os.devnull,
+            time_limit_s=math.inf,
+            max_iters=args.alns_iters,
+            seed=args.seed + max(rep, 0),
+            ctx=ctx,
+            incremental_feasibility=True,
+            log_options=LogOptions(backend="none"),
+        )
+
+    per_iter = [t / args.alns_iters for t in measure(run_alns, min(args.warmup, 1), args.repeat_slow)]
+    add("alns_sa/iter", per_iter, iters=args.alns_iters)
+    return rows
+
+
+def git_commit(repo_root: Path) -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo_root, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def compare(old_path: Path, report: Dict[str, Any], threshold: float) -> int:
+    """Compara medianas com um JSON anterior; devolve quantos benchmarks ficaram `threshold` vezes mais lentos."""
+    old = json.loads(old_path.read_text(encoding="utf-8"))
+    if old.get("version") != BENCH_VERSION:
+        raise ValueError(f"{old_path}: versão {old.get('version')} do benchmark não suportada (esperava {BENCH_VERSION})")
+    before = {(r["instance"], r["bench"]): r for r in old["results"]}
+    print(f"\n[COMPARE] {old_path} (commit {old.get('commit')})")
+    changed = sorted(k for k in set(old["config"]) | set(report["config"]) if k != "threshold" and old["config"].get(k) != report["config"].get(k))
+    if changed or old.get("platform") != report["platform"]:
+        print(f"[WARN] configuração/máquina diferente ({', '.join(changed) or 'platform'}): tempos podem não ser comparáveis", flush=True)
+    rows = report["results"]
+    slower = 0
+    for r in rows:
+        o = before.get((r["instance"], r["bench"]))
+        if o is None:
+            continue
+        ratio = r["p50_s"] / o["p50_s"] if o["p50_s"] > 0 else math.inf
+        flag = ""
+        if ratio >= threshold:
+            flag = "  <-- mais lento"
+            slower += 1
+        print(f"  {r['instance']:<24} {r['bench']:<22} {1e3 * o['p50_s']:10.3f}ms -> {1e3 * r['p50_s']:10.3f}ms  x{ratio:.2f}{flag}")
+    return slower
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark do construtor, do verificador, dos operadores e do ALNS")
+    ap.add_argument("--instances", nargs="*", default=[], help="Arquivos de instância (além da escada sintética)")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help="Escada sintética: lista NxH (vértices x clusters); vazio desliga")
+    ap.add_argument("--terminal_frac", type=float, default=0.5, help="Fração de terminais nas instâncias sintéticas")
+    ap.add_argument("--seed", type=int, default=0, help="Semente das instâncias sintéticas e dos operadores")
+    ap.add_argument("--knn", type=int, default=0, help="Se >0, monta listas KNN antes de medir (como --knn do run_alns_sa); torna viável a escada acima de ~2000 vértices")
+    ap.add_argument("--warmup", type=int, default=3, help="Chamadas descartadas antes de medir")
+    ap.add_argument("--repeat", type=int, default=50, help="Repetições medidas por operador")
+    ap.add_argument("--repeat_slow", type=int, default=5, help="Repetições do construtor, do verificador e do ALNS")
+    ap.add_argument("--alns_iters", type=int, default=100, help="Iterações por execução do ALNS")
+    ap.add_argument("--cache_dir", type=Path, default=None, help="Cache de instâncias (padrão: $TCC_CACHE_DIR ou ~/.cache/tcc)")
+    ap.add_argument("--out", type=Path, default=None, help="JSON de saída (padrão: experiments/results/bench/<commit>.json)")
+    ap.add_argument("--compare", type=Path, default=None, help="JSON de uma execução anterior para comparar as medianas")
+    ap.add_argument("--threshold", type=float, default=1.10, help="Com --compare: razão de mediana a partir da qual conta como regressão")
+    args = ap.parse_args()
+    if args.warmup < 0 or args.repeat < 1 or args.repeat_slow < 1 or args.alns_iters < 1:
+        raise ValueError("warmup deve ser >= 0 e repeat, repeat_slow e alns_iters >= 1")
+
+    repo_root = Path(__file__).resolve().parents[3]
+    commit = git_commit(repo_root)
+
+    rows: List[Dict[str, Any]] = []
+    for path in args.instances:
+        inst = load_instance(Path(path), cache_dir=args.cache_dir, trusted=True)
+        print(f"[BENCH] {inst.name} n={inst.n} clusters={len(inst.clusters)}", flush=True)
+        rows.extend(bench_instance(inst, args))
+    for n, h in parse_sizes(args.sizes):
+        inst = synthetic_instance(n, h, seed=args.seed, terminal_frac=args.terminal_frac)
+        print(f"[BENCH] {inst.name} n={inst.n} clusters={h}", flush=True)
+        rows.extend(bench_instance(inst, args))
+
+    report = {
+        "version": BENCH_VERSION,
+        "commit": commit,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items() if k not in ("out", "compare", "cache_dir")},
+        "results": rows,
+    }
+    out = args.out or repo_root / "experiments" / "results" / "bench" / f"{(commit or 'nocommit')[:12]}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"[OK] {out}", flush=True)
+
+    if args.compare is not None:
+        slower = compare(args.compare, report, args.threshold)
+        if slower:
+            print(f"[WARN] {slower} benchmark(s) com mediana >= x{args.threshold:.2f}", flush=True)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
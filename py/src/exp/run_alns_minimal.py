@@ -3,8 +3,8 @@ import argparse
 from pathlib import Path
 
 from tcc.alns.minimal import run_alns_minimal
-from tcc.tsplib_loader import load_tsplib_clusteiner
-from tcc.verify import verify_solution
+from tcc.instance_cache import load_instance
+from tcc.verify import is_feasible, verify_solution
 from tcc.solution import Solution
 
 # Baseline da Semana 2 (está no exp/runner.py)
@@ -17,6 +17,7 @@ def main() -> None:
     ap.add_argument("--time", type=float, default=2.0)
     ap.add_argument("--iters", type=int, default=200)
     ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--cache_dir", type=Path, default=None, help="Cache de instâncias (padrão: $TCC_CACHE_DIR ou ~/.cache/tcc)")
     args = ap.parse_args()
 
     instance_path = Path(args.instance)
@@ -27,7 +28,7 @@ def main() -> None:
     out_dir.mkdir(parents=True, exist_ok=True)
     log_path = out_dir / f"{instance_id}_seed{args.seed}.csv"
 
-    inst = load_tsplib_clusteiner(instance_path)
+    inst = load_instance(instance_path, cache_dir=args.cache_dir, trusted=True)
 
     # build_initial: usa o baseline factível da Semana 2
     def build_initial(instance):
@@ -38,7 +39,7 @@ def main() -> None:
         return float(sol.cost)
 
     def feasible_fn(instance, sol: Solution) -> bool:
-        return bool(verify_solution(instance, sol).feasible)
+        return is_feasible(instance, sol)
 
     def num_edges_fn(sol: Solution) -> int:
         return len(sol.edges)
@@ -56,7 +57,10 @@ def main() -> None:
         seed=args.seed,
     )
 
-    ok = verify_solution(inst, best).feasible
+    res = verify_solution(inst, best)
+    ok = res.feasible
+    if not res.cost_matches():
+        print(f"[WARN] custo do best ({best.cost}) difere do recalculado ({res.cost})", flush=True)
     print(f"[OK] log={log_path} best_cost={best.cost:.6f} feasible={ok}")
 
 
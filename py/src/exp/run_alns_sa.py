@@ -2,9 +2,20 @@ from __future__ import annotations
 
 import argparse
 import csv
+from functools import partial
 from pathlib import Path
 
 from tcc.alns import (
+    AdaptiveConfig,
+    IslandConfig,
+    LogOptions,
+    OperatorProfile,
+    ParallelJob,
+    SolverContext,
+    Termination,
+    run_alns_batch,
+    run_alns_islands,
+    run_alns_parallel,
     run_alns_sa,
     destroy_remove_k_global_edges,
     destroy_disconnect_cluster,
@@ -13,8 +24,8 @@ from tcc.alns import (
     repair_r3_mst_components,
     repair_r4_steiner_hub,
 )
-from tcc.tsplib_loader import load_tsplib_clusteiner
-from tcc.verify import verify_solution
+from tcc.instance_cache import load_instance
+from tcc.verify import is_feasible, verify_solution
 from tcc.solution import Solution
 
 from exp.runner import solve_two_level_mst
@@ -33,12 +44,47 @@ def read_bks_for_instance(inst_name: str) -> float | None:
     return None
 
 
+# funções de nível de módulo (e partial delas): vão por pickle para os workers de --workers
+
+def build_initial(instance):
+    cost, edges = solve_two_level_mst(instance)
+    return Solution(instance_name=instance.name, cost=cost, edges=edges)
+
+
+def cost_fn(sol: Solution) -> float:
+    return float(sol.cost)
+
+
+def feasible_fn(instance, sol: Solution) -> bool:
+    return is_feasible(instance, sol)
+
+
+def num_edges_fn(sol: Solution) -> int:
+    return len(sol.edges)
+
+
+def build_operators(args):
+    destroys = [
+        ("D1_rm_k", partial(destroy_remove_k_global_edges, k=args.k)),
+        ("D2_disc_cluster", destroy_disconnect_cluster),
+    ]
+    repairs = [
+        ("R1_dijkstra", repair_r1_dijkstra),
+        ("R3_comp_mst", repair_r3_mst_components),
+        ("R4_steiner_hub", partial(repair_r4_steiner_hub, max_candidates=25)),
+    ]
+    if args.topL and args.topL > 0:
+        repairs.insert(0, ("R1_topL", partial(repair_r1_dijkstra_topL, L=args.topL)))
+    return destroys, repairs
+
+
 def main() -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("--instance", required=True)
     ap.add_argument("--time", type=float, default=2.0)
     ap.add_argument("--iters", type=int, default=500)
     ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--cache_dir", type=Path, default=None, help="Cache de instâncias (padrão: $TCC_CACHE_DIR ou ~/.cache/tcc)")
 
     # SA
     ap.add_argument("--t0", type=float, default=None)
@@ -50,70 +96,179 @@ def main() -> None:
     # Top-L
     ap.add_argument("--topL", type=int, default=5, help="Se >0, habilita R1_topL com L=topL")
 
-    args = ap.parse_args()
-
-    instance_path = Path(args.instance)
-    instance_id = instance_path.stem
+    # grafo de candidatos
+    ap.add_argument("--knn", type=int, default=0, help="Se >0, reparos usam listas dos knn vizinhos mais próximos")
 
-    repo_root = Path(__file__).resolve().parents[3]
-    out_dir = repo_root / "experiments" / "results" / "week3_logs"
-    out_dir.mkdir(parents=True, exist_ok=True)
-    log_path = out_dir / f"{instance_id}_seed{args.seed}.csv"
+    # seleção adaptativa de operadores
+    ap.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Pesos adaptativos por segmento (pontos por segundo) em vez de sorteio uniforme. "
+        "Pontuar por segundo usa tempo de parede: a mesma semente NÃO reproduz a execução (use --no_time_aware)",
+    )
+    ap.add_argument("--no_time_aware", action="store_true", help="Com --adaptive: pontos por chamada em vez de por segundo (reprodutível pela semente, retomada idêntica)")
+    ap.add_argument("--segment", type=int, default=100, help="Iterações por segmento (com --adaptive)")
+    ap.add_argument("--reaction", type=float, default=0.1, help="Fator de reação dos pesos (com --adaptive)")
 
-    inst = load_tsplib_clusteiner(instance_path)
+    # factibilidade
+    ap.add_argument("--full_verify", action="store_true", help="Verifica o candidato inteiro a cada iteração (sem a checagem incremental)")
 
-    def build_initial(instance):
-        cost, edges = solve_two_level_mst(instance)
-        return Solution(instance_name=instance.name, cost=cost, edges=edges)
+    # log por iteração
+    ap.add_argument("--log_backend", choices=["csv", "npz", "none"], default="csv", help="csv (texto), npz (colunar, gravado no fim) ou none")
+    ap.add_argument("--log_flush_every", type=int, default=1, help="csv: linhas entre flushes")
+    ap.add_argument("--log_every", type=int, default=1, help="Grava uma linha a cada N iterações")
+    ap.add_argument("--log_improvements", action="store_true", help="Grava só as iterações em que o best melhora")
+    ap.add_argument("--profile", action="store_true", help="Mede tempo e trabalho por operador (colunas no log + resumo no fim; só execução simples)")
 
-    def cost_fn(sol: Solution) -> float:
-        return float(sol.cost)
+    # checkpoint / retomada
+    ap.add_argument("--checkpoint", type=Path, default=None, help="Grava o estado da busca neste arquivo (.npz) periodicamente")
+    ap.add_argument("--checkpoint_every", type=int, default=500, help="Iterações entre checkpoints")
+    ap.add_argument("--resume", type=Path, default=None, help="Continua a busca a partir deste checkpoint")
 
-    def feasible_fn(instance, sol: Solution) -> bool:
-        return bool(verify_solution(instance, sol).feasible)
+    # parada
+    ap.add_argument("--target", type=float, default=None, help="Para quando o best chega neste custo (com --workers: todos param)")
+    ap.add_argument("--stop_at_bks", action="store_true", help="Sem --target, usa o BKS de bks_type1_small.csv como alvo")
+    ap.add_argument("--stagnation", type=int, default=None, help="Para após K iterações seguidas sem melhorar o best")
 
-    def num_edges_fn(sol: Solution) -> int:
-        return len(sol.edges)
+    # multi-start
+    ap.add_argument("--workers", type=int, default=1, help="Se >1, roda buscas independentes em paralelo (run_alns_parallel)")
+    ap.add_argument("--migrate_every", type=int, default=0, help="Com --workers: se >0, modelo de ilhas com migração a cada N iterações")
+    ap.add_argument("--topology", choices=["ring", "broadcast"], default="ring", help="Topologia da migração (com --migrate_every)")
+    ap.add_argument("--migration_policy", choices=["better", "sa", "always"], default="better", help="Quando o migrante vira a solução corrente")
+    ap.add_argument("--batch", type=int, default=1, help="Se >1, gera B candidatos por passo num pool de --workers (run_alns_batch)")
+    ap.add_argument("--executor", choices=["process", "thread"], default="process", help="Pool dos candidatos (com --batch)")
+    ap.add_argument("--select", choices=["best", "sa"], default="best", help="Candidato que avança: melhor do lote ou primeiro aceito pela SA")
 
-    bks = read_bks_for_instance(inst.name)
+    args = ap.parse_args()
+    if args.workers > 1 or args.batch > 1:
+        # checkpoint, retomada e profile são de uma busca só (run_alns_sa)
+        per_run = [flag for flag, on in (("--checkpoint", args.checkpoint), ("--resume", args.resume), ("--profile", args.profile)) if on]
+        if per_run:
+            mode = "--batch > 1" if args.batch > 1 else "--workers > 1"
+            ap.error(f"{', '.join(per_run)}: só na execução simples, não com {mode}")
 
-    def D1(instance, sol, rng):
-        return destroy_remove_k_global_edges(instance, sol, rng, k=args.k)
+    instance_path = Path(args.instance)
+    instance_id = instance_path.stem
 
-    def D2(instance, sol, rng):
-        return destroy_disconnect_cluster(instance, sol, rng)
+    repo_root = Path(__file__).resolve().parents[3]
+    out_dir = repo_root / "experiments" / "results" / "week3_logs"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    log_options = LogOptions(
+        backend=args.log_backend,
+        flush_every=args.log_flush_every,
+        every=args.log_every,
+        improvements_only=args.log_improvements,
+    )
+    suffix = ".npz" if log_options.backend == "npz" else ".csv"
+    log_path = out_dir / f"{instance_id}_seed{args.seed}{suffix}"
 
-    destroys = [("D1_rm_k", D1), ("D2_disc_cluster", D2)]
+    inst = load_instance(instance_path, cache_dir=args.cache_dir, trusted=True)
+    if args.knn and args.knn > 0:
+        inst.build_candidates(args.knn)
+    ctx = SolverContext.from_instance(inst)
 
-    repairs = [("R1_dijkstra", repair_r1_dijkstra), 
-               ("R3_comp_mst", repair_r3_mst_components),
-               ("R4_steiner_hub", lambda inst, ps, rng: repair_r4_steiner_hub(inst, ps, rng, max_candidates=25)),
-    ]
-    if args.topL and args.topL > 0:
-        def R1T(instance, partial, rng):
-            return repair_r1_dijkstra_topL(instance, partial, rng, L=args.topL)
-        repairs.insert(0, ("R1_topL", R1T))
+    bks = read_bks_for_instance(inst.name)
+    destroys, repairs = build_operators(args)
+    adaptive = AdaptiveConfig(segment=args.segment, reaction=args.reaction, time_aware=not args.no_time_aware) if args.adaptive else None
+    target = args.target if args.target is not None else (bks if args.stop_at_bks else None)
+    term = Termination(stagnation=args.stagnation, target_cost=target)
+    profile = OperatorProfile() if args.profile else None
 
-    best = run_alns_sa(
-        instance=inst,
-        instance_id=instance_id,
+    # mesma configuração, em forma picklável, para os modos com pool de processos
+    job = ParallelJob(
+        instance_path=instance_path,
         build_initial=build_initial,
         cost_fn=cost_fn,
         feasible_fn=feasible_fn,
         num_edges_fn=num_edges_fn,
         destroy_ops=destroys,
         repair_ops=repairs,
-        log_path=str(log_path),
+        log_dir=out_dir,
+        cache_dir=args.cache_dir,
+        knn=args.knn,
         bks_cost=bks,
-        time_limit_s=args.time,
-        max_iters=args.iters,
-        seed=args.seed,
-        t0=args.t0,
-        alpha=args.alpha,
+        run_kwargs=dict(
+            time_limit_s=args.time,
+            max_iters=args.iters,
+            t0=args.t0,
+            alpha=args.alpha,
+            incremental_feasibility=not args.full_verify,
+            adaptive=adaptive,
+            log_options=log_options,
+            termination=term,
+        ),
     )
 
-    ok = verify_solution(inst, best).feasible
-    print(f"[OK] log={log_path} best_cost={best.cost:.6f} feasible={ok} bks={bks}", flush=True)
+    if args.batch > 1:
+        with term.catch_signals():
+            best = run_alns_batch(
+                job,
+                log_path=str(log_path),
+                batch=args.batch,
+                workers=args.workers,
+                executor=args.executor,
+                select=args.select,
+                seed=args.seed,
+                log_options=log_options,
+            )
+        stop_reason = term.reason
+    elif args.workers > 1:
+        # Ctrl-C chega a todos os processos: cada worker para limpo (catch_signals
+        # no _run_worker) e o pai só espera os resultados
+        with term.catch_signals():
+            if args.migrate_every > 0:
+                cfg = IslandConfig(interval=args.migrate_every, topology=args.topology, policy=args.migration_policy)
+                result = run_alns_islands(job, islands=args.workers, cfg=cfg, seed=args.seed, target_cost=target)
+            else:
+                result = run_alns_parallel(job, workers=args.workers, seed=args.seed, target_cost=target)
+        for w in result.workers:
+            print(
+                f"[W{w.worker}] seed={w.seed} best_cost={w.best_cost:.6f} iters={w.iters} "
+                f"accepted={w.accepted} migrations={w.migrations} time_s={w.elapsed_s:.3f} stop={w.stop_reason} log={w.log_path or '-'}",
+                flush=True,
+            )
+        best = result.best
+        log_path = result.workers[result.best_worker].log_path
+        stop_reason = result.workers[result.best_worker].stop_reason
+    else:
+        with term.catch_signals():
+            best = run_alns_sa(
+                instance=inst,
+                instance_id=instance_id,
+                build_initial=build_initial,
+                cost_fn=cost_fn,
+                feasible_fn=feasible_fn,
+                num_edges_fn=num_edges_fn,
+                destroy_ops=destroys,
+                repair_ops=repairs,
+                log_path=str(log_path),
+                bks_cost=bks,
+                time_limit_s=args.time,
+                max_iters=args.iters,
+                seed=args.seed,
+                t0=args.t0,
+                alpha=args.alpha,
+                ctx=ctx,
+                incremental_feasibility=not args.full_verify,
+                adaptive=adaptive,
+                checkpoint_path=args.checkpoint,
+                checkpoint_every=args.checkpoint_every,
+                resume_from=args.resume,
+                log_options=log_options,
+                termination=term,
+                profile=profile,
+            )
+        stop_reason = term.reason
+
+    res = verify_solution(inst, best)
+    ok = res.feasible
+    if not res.cost_matches():
+        print(f"[WARN] custo do best ({best.cost}) difere do recalculado ({res.cost})", flush=True)
+    stop = f" stop={stop_reason}" if stop_reason else ""
+    shown_log = "-" if log_options.backend == "none" or log_path is None else log_path
+    print(f"[OK] log={shown_log} best_cost={best.cost:.6f} feasible={ok} bks={bks}{stop}", flush=True)
+    if profile is not None:
+        print(profile.format_table(), flush=True)
 
 
 if __name__ == "__main__":
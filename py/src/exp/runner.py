@@ -1,15 +1,18 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Set
+import heapq
+import random
 import time
 import csv
 
+import numpy as np
 import typer
 
 from tcc.solution import Solution
 from tcc.verify import verify_solution
-from tcc.tsplib_loader import load_tsplib_clusteiner
+from tcc.instance_cache import load_instance
 from exp.metrics import avg_cost, best_found, rpd, pi
 
 
@@ -18,13 +21,9 @@ app = typer.Typer(help="Runner de experimentos (Type1 Small)")
 Edge = Tuple[int, int]
 
 
-def _weight_lookup(inst) -> Dict[Tuple[int, int], float]:
-    # cria map (u,v)->w para acesso rápido
-    w = {}
-    for u, v, c in inst.edges:
-        w[(u, v)] = c
-        w[(v, u)] = c
-    return w
+def _weight_lookup(inst):
+    # oráculo de pesos da instância: w[(u, v)] sem montar dicionário
+    return inst.weights
 
 
 def _mst_prim(nodes: List[int], w) -> List[Edge]:
@@ -55,6 +54,136 @@ def _mst_prim(nodes: List[int], w) -> List[Edge]:
     return edges
 
 
+def _nearest_path(
+    adj: List[List[Tuple[int, float]]],
+    sources: Set[int],
+    targets: Set[int],
+    blocked: Set[int] = frozenset(),
+    penalty: Optional[Dict[int, float]] = None,
+) -> Optional[List[int]]:
+    """
+    Dijkstra multi-source de `sources` até o alvo mais próximo, sem passar
+    por `blocked` (`penalty[v]` soma ao custo de entrar em v). Devolve os
+    vértices do caminho (fonte ... alvo) ou None se nenhum alvo é alcançável.
+    """
+    penalty = penalty or {}
+    dist = {s: 0.0 for s in sources}
+    parent: Dict[int, int] = {}
+    pq = [(0.0, s) for s in sources]
+    heapq.heapify(pq)
+    while pq:
+        d, u = heapq.heappop(pq)
+        if d != dist[u]:
+            continue
+        if u in targets:
+            path = [u]
+            while path[-1] in parent:
+                path.append(parent[path[-1]])
+            path.reverse()
+            return path
+        for v, w_uv in adj[u]:
+            if v in blocked:
+                continue
+            nd = d + w_uv + penalty.get(v, 0.0)
+            if nd < dist.get(v, float("inf")):
+                dist[v] = nd
+                parent[v] = u
+                heapq.heappush(pq, (nd, v))
+    return None
+
+
+def _solve_two_level_sparse(inst) -> Tuple[float, List[Edge]]:
+    """
+    Versão do baseline para grafo não-completo (CSR / lista de arestas),
+    onde dois terminais podem não ter aresta direta:
+
+      1) árvore local de cada cluster crescida por caminhos mínimos (pode
+         usar vértices Steiner), sem passar por terminais de outros
+         clusters nem por vértices das árvores locais já montadas;
+      2) Prim no nível de clusters: a cada passo, o caminho mínimo da parte
+         já conectada até a árvore local mais próxima ainda não conectada.
+
+    Lança ValueError se não conseguir montar as árvores locais disjuntas
+    (dentro do número de tentativas) ou se o grafo for desconexo.
+    """
+    w = _weight_lookup(inst)
+    adj = []
+    for u in range(inst.n):
+        idx, ws = w.neighbors(u)
+        adj.append(list(zip(idx.tolist(), ws.tolist())))
+
+    edges: List[Edge] = []
+
+    def add_path(path: List[int]) -> None:
+        edges.extend(zip(path, path[1:]))
+
+    # 1) árvores locais disjuntas. Um cluster bloqueado pelas árvores já
+    #    montadas vai para o começo da ordem (o resto é reembaralhado), e os
+    #    vértices que ele precisaria ficam mais caros para os outros na
+    #    próxima tentativa (penalidade com sorteio, semente fixa).
+    terminals = {v for ck in inst.clusters for v in ck}
+    h = len(inst.clusters)
+    order = list(range(h))
+    penalty: Dict[int, float] = {}
+    step = max((c for nb in adj for _, c in nb), default=1.0)
+    rng = random.Random(0)
+    for _ in range(200 * h):
+        edges.clear()
+        used: Set[int] = set()
+        trees: List[Set[int]] = [set() for _ in range(h)]
+        failed = None
+        for k in order:
+            ck = inst.clusters[k]
+            blocked = used | (terminals - set(ck))
+            tree = {ck[0]}
+            remaining = set(ck[1:])
+            while remaining:
+                path = _nearest_path(adj, tree, remaining, blocked, penalty)
+                if path is None:
+                    break
+                add_path(path)
+                tree.update(path)
+                remaining.difference_update(path)
+            if remaining:
+                failed = k
+                break
+            used |= tree
+            trees[k] = tree
+        if failed is None:
+            break
+        ck = inst.clusters[failed]
+        free = {ck[0]}
+        for t in ck[1:]:
+            path = _nearest_path(adj, free, {t}, terminals - set(ck))
+            if path is None:
+                raise ValueError(f"{inst.name}: terminais do cluster {failed} não se ligam sem passar por outro cluster")
+            free.update(path)
+        for v in free & used:
+            penalty[v] = penalty.get(v, 0.0) + 2.0 * step * rng.random()
+        rng.shuffle(order)
+        order.remove(failed)
+        order.insert(0, failed)
+    else:
+        raise ValueError(f"{inst.name}: terminais do cluster {failed} não se ligam sem passar por outro cluster")
+
+    # 2) liga as árvores locais por caminhos mínimos (Prim nos clusters)
+    owner = {v: k for k, tree in enumerate(trees) for v in tree}
+    connected = set(trees[0])
+    pending = set(range(1, len(trees)))
+    while pending:
+        targets = {v for k in pending for v in trees[k]}
+        path = _nearest_path(adj, connected, targets)
+        if path is None:
+            raise ValueError(f"{inst.name}: grafo desconexo, clusters {sorted(pending)} inalcançáveis")
+        add_path(path)
+        k = owner[path[-1]]
+        connected.update(path)
+        connected |= trees[k]
+        pending.discard(k)
+
+    return w.total(edges), edges
+
+
 def solve_two_level_mst(inst) -> Tuple[float, List[Edge]]:
     """
     Baseline factível (bem simples):
@@ -62,8 +191,12 @@ def solve_two_level_mst(inst) -> Tuple[float, List[Edge]]:
       2) Conecta clusters com MST entre clusters usando a menor aresta entre clusters
 
     Resultado: árvore sobre os terminais (cobre R e mantém clusters disjuntos).
+    Em grafo não-completo as arestas diretas podem não existir: aí os dois
+    passos usam caminhos mínimos (ver _solve_two_level_sparse).
     """
     w = _weight_lookup(inst)
+    if not w.complete:
+        return _solve_two_level_sparse(inst)
 
     # 1) local trees: MST em cada cluster
     all_edges: List[Edge] = []
@@ -73,22 +206,21 @@ def solve_two_level_mst(inst) -> Tuple[float, List[Edge]]:
     # 2) MST entre clusters (nós = clusters)
     h = len(inst.clusters)
     if h <= 1:
-        cost = sum(w[(u, v)] for (u, v) in all_edges)
+        cost = w.total(all_edges)
         return cost, all_edges
 
     # peso entre clusters i,j = min_{u in Ci, v in Cj} w(u,v)
     best_pair: Dict[Tuple[int, int], Tuple[float, int, int]] = {}
     for i in range(h):
+        Ci = inst.clusters[i]
+        # linhas de Ci contra todos os vértices, uma consulta em lote só
+        rows_i = w.rows(Ci)
         for j in range(i + 1, h):
-            best = None
-            bu = bv = None
-            for u in inst.clusters[i]:
-                for v in inst.clusters[j]:
-                    c = w[(u, v)]
-                    if best is None or c < best:
-                        best = c
-                        bu, bv = u, v
-            best_pair[(i, j)] = (best, bu, bv)
+            Cj = inst.clusters[j]
+            # submatriz Ci x Cj; argmin pega o primeiro mínimo (mesma ordem do laço u, v)
+            sub = rows_i[:, Cj]
+            a, b = np.unravel_index(int(np.argmin(sub)), sub.shape)
+            best_pair[(i, j)] = (float(sub[a, b]), Ci[a], Cj[b])
 
     # Prim em clusters
     in_tree = {0}
@@ -111,7 +243,7 @@ def solve_two_level_mst(inst) -> Tuple[float, List[Edge]]:
         in_tree.add(best_j)
         remaining.remove(best_j)
 
-    cost = sum(w[(u, v)] for (u, v) in all_edges)
+    cost = w.total(all_edges)
     return cost, all_edges
 
 
@@ -145,6 +277,7 @@ def run(
     bks_csv: Path = typer.Option(Path("exp/bks_type1_small.csv"), help="CSV com best-known solutions"),
     runs: int = typer.Option(1, help="Número de execuções por instância"),
     limit: int = typer.Option(1, help="Quantas instâncias rodar (1 pra testar hoje)"),
+    cache_dir: Optional[Path] = typer.Option(None, help="Cache de instâncias (padrão: $TCC_CACHE_DIR ou ~/.cache/tcc)"),
 ):
     """
     Roda o baseline em algumas instâncias e gera CSV com AVG/BF/RPD/PI.
@@ -157,7 +290,7 @@ def run(
 
     rows = []
     for p in paths:
-        inst = load_tsplib_clusteiner(p)
+        inst = load_instance(p, cache_dir=cache_dir, trusted=True)
 
         costs: List[float] = []
         times: List[float] = []
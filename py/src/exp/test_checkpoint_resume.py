@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from tcc.alns.checkpoint import load_checkpoint
+from tcc.alns.iterlog import read_iteration_log
+
+# colunas que dependem de relógio (não se repetem entre execuções)
+TIMING = ("time_s",)
+
+
+def run_cmd(args, extra):
+    return [sys.executable, "-m", "exp.run_alns_sa", *args, *extra]
+
+
+def kill_after_checkpoint(cmd, ck_path: Path, kill_at: int, timeout: float) -> int:
+    """Roda `cmd` e manda SIGKILL assim que o checkpoint passar da iteração `kill_at`."""
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    t_end = time.monotonic() + timeout
+    try:
+        while proc.poll() is None and time.monotonic() < t_end:
+            if ck_path.exists():
+                try:
+                    it = load_checkpoint(ck_path).it
+                except (OSError, ValueError, KeyError):
+                    it = -1  # lido no meio de uma troca; tenta de novo
+                if it >= kill_at:
+                    proc.send_signal(signal.SIGKILL)
+                    proc.wait()
+                    return it
+            time.sleep(0.005)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+    raise RuntimeError(f"[FAIL] execução terminou (ou estourou {timeout}s) antes do checkpoint da iteração {kill_at}; aumente --iters")
+
+
+def compare_logs(ref, got, label: str) -> None:
+    iters = got["iter"].tolist()
+    if iters != list(range(len(iters))):
+        missing = sorted(set(range(int(max(iters)) + 1)) - set(iters))
+        dup = len(iters) - len(set(iters))
+        raise RuntimeError(f"[FAIL] {label}: log não contínuo (faltam {len(missing)} iterações, ex. {missing[:5]}; {dup} repetidas)")
+    cols = [c for c in ref.columns if c not in TIMING]
+    a = ref[cols].reset_index(drop=True)
+    b = got[cols].reset_index(drop=True)
+    if len(a) != len(b):
+        raise RuntimeError(f"[FAIL] {label}: log retomado tem {len(b)} linhas, a execução sem parada {len(a)}")
+    if not a.equals(b):
+        first = int((a != b).any(axis=1).idxmax())
+        raise RuntimeError(f"[FAIL] {label}: log retomado difere da execução sem parada (primeira linha diferente: {first})")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Mata run_alns_sa com SIGKILL, retoma do checkpoint e confere o log")
+    ap.add_argument("--instance", required=True)
+    ap.add_argument("--iters", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--checkpoint_every", type=int, default=40)
+    ap.add_argument("--kill_at", type=int, default=300, help="Mata a execução no primeiro checkpoint com iteração >= este valor")
+    ap.add_argument("--backends", nargs="+", default=["csv", "npz"], choices=["csv", "npz"])
+    ap.add_argument("--log_flush_every", type=int, default=200, help="csv: linhas entre flushes (alto, para exercitar o flush do checkpoint)")
+    ap.add_argument("--stagnation", type=int, default=None, help="Repassa --stagnation: a retomada tem de parar na mesma iteração")
+    ap.add_argument("--timeout", type=float, default=300.0)
+    ap.add_argument("--cache_dir", type=Path, default=None)
+    args = ap.parse_args()
+    if args.kill_at >= args.iters:
+        raise ValueError("kill_at deve ser menor que iters")
+
+    instance_id = Path(args.instance).stem
+    repo_root = Path(__file__).resolve().parents[3]
+    out_dir = repo_root / "experiments" / "results" / "week3_logs"
+    base = ["--instance", args.instance, "--iters", str(args.iters), "--time", "1e9", "--seed", str(args.seed)]
+    if args.cache_dir is not None:
+        base += ["--cache_dir", str(args.cache_dir)]
+    if args.stagnation is not None:
+        base += ["--stagnation", str(args.stagnation)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for backend in args.backends:
+            log_path = out_dir / f"{instance_id}_seed{args.seed}.{backend}"
+            log_args = ["--log_backend", backend, "--log_flush_every", str(args.log_flush_every)]
+
+            # referência: execução sem parada
+            subprocess.run(run_cmd(base, log_args), check=True, stdout=subprocess.DEVNULL)
+            ref_path = tmp / f"ref.{backend}"
+            shutil.copyfile(log_path, ref_path)
+            ref = read_iteration_log(ref_path)
+            os.remove(log_path)
+
+            # interrompida com SIGKILL depois de um checkpoint e retomada
+            ck_path = tmp / f"ck_{backend}.npz"
+            ck_args = ["--checkpoint", str(ck_path), "--checkpoint_every", str(args.checkpoint_every)]
+            killed_at = kill_after_checkpoint(run_cmd(base, log_args + ck_args), ck_path, args.kill_at, args.timeout)
+            subprocess.run(run_cmd(base, log_args + ck_args + ["--resume", str(ck_path)]), check=True, stdout=subprocess.DEVNULL)
+            got = read_iteration_log(log_path)
+
+            compare_logs(ref, got, f"{backend} (morta no checkpoint {killed_at})")
+            print(f"[{backend}] morta no checkpoint it={killed_at}, retomada: {len(got)} linhas, contínuo e igual à execução sem parada")
+
+    print("\n[OK] checkpoint + SIGKILL + retomada preservam o log\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,8 @@ import random
 from pathlib import Path
 
 from tcc.solution import Solution
-from tcc.tsplib_loader import load_tsplib_clusteiner
+from tcc.instance_cache import load_instance
+from tcc.alns.context import SolverContext
 from tcc.alns.operators_destroy import (
     split_local_global_edges,
     destroy_remove_k_global_edges,
@@ -25,11 +26,13 @@ def main():
     ap.add_argument("--trials", type=int, default=100)
     ap.add_argument("--k", type=int, default=2)
     ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--cache_dir", type=Path, default=None, help="Cache de instâncias (padrão: $TCC_CACHE_DIR ou ~/.cache/tcc)")
     ap.add_argument("--verbose", action="store_true")
     args = ap.parse_args()
 
     inst_path = Path(args.instance)
-    inst = load_tsplib_clusteiner(inst_path)
+    inst = load_instance(inst_path, cache_dir=args.cache_dir)
+    ctx = SolverContext.from_instance(inst)
 
     cost, edges = solve_two_level_mst(inst)
     base_sol = Solution(instance_name=inst.name, cost=cost, edges=edges)
@@ -69,11 +72,11 @@ def main():
     for t in range(args.trials):
         rng = random.Random(args.seed + t)
 
-        ps1 = destroy_remove_k_global_edges(inst, base_sol, rng, k=args.k)
+        ps1 = destroy_remove_k_global_edges(ctx, base_sol, rng, k=args.k)
         check_partial(ps1, "D1")
         comps_d1.append(ps1.num_components)
 
-        ps2 = destroy_disconnect_cluster(inst, base_sol, rng)
+        ps2 = destroy_disconnect_cluster(ctx, base_sol, rng)
         check_partial(ps2, "D2")
         comps_d2.append(ps2.num_components)
 
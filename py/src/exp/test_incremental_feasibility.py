@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import argparse
+import random
+
+import numpy as np
+
+from tcc.instance import Instance
+from tcc.solution import Solution
+from tcc.verify import is_feasible, verify_solution
+
+from tcc.alns.context import SolverContext
+from tcc.alns.feasibility import IncrementalFeasibility
+from tcc.alns.tree_state import TreeState
+
+
+def random_instance(rng: random.Random, max_n: int, max_h: int) -> Instance:
+    """Instância euclidiana pequena: terminais em h clusters, o resto Steiner."""
+    n = rng.randint(5, max_n)
+    h = rng.randint(1, max_h)
+    coords = np.array([[rng.random() * 100, rng.random() * 100] for _ in range(n)])
+    verts = list(range(n))
+    rng.shuffle(verts)
+    nt = rng.randint(h, max(h, n - 2))
+    clusters = [[] for _ in range(h)]
+    for i, v in enumerate(verts[:nt]):
+        clusters[i % h].append(v)
+    cluster_of = [-1] * n
+    for k, Ck in enumerate(clusters):
+        for v in Ck:
+            cluster_of[v] = k
+    D = np.floor(np.hypot(coords[:, None, 0] - coords[None, :, 0], coords[:, None, 1] - coords[None, :, 1])) + 1
+    np.fill_diagonal(D, 0)
+    terminals = sorted(v for Ck in clusters for v in Ck)
+    return Instance(f"fuzz_{n}n{h}c", n, n * (n - 1) // 2, None, terminals, clusters, cluster_of, dist=D)
+
+
+def random_feasible_tree(rng: random.Random, inst: Instance, tries: int = 50):
+    """Árvore aleatória com todos os terminais + alguns Steiner, até achar uma factível."""
+    terms = list(inst.terminals)
+    steiner = [v for v in range(inst.n) if inst.cluster_of[v] == -1]
+    for _ in range(tries):
+        sub = terms + [v for v in steiner if rng.random() < 0.5]
+        rng.shuffle(sub)
+        edges = [(sub[i], sub[rng.randrange(i)]) for i in range(1, len(sub))]
+        if is_feasible(inst, Solution(inst.name, 0.0, edges)):
+            return edges
+    return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fuzz de IncrementalFeasibility.check contra verify_solution")
+    ap.add_argument("--trials", type=int, default=900, help="Instâncias aleatórias")
+    ap.add_argument("--steps", type=int, default=40, help="Edições da árvore por instância")
+    ap.add_argument("--max_n", type=int, default=14)
+    ap.add_argument("--max_h", type=int, default=4)
+    ap.add_argument("--accept_prob", type=float, default=0.7, help="Chance de aceitar um candidato factível")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    checked = 0
+    feasible = 0
+    accepted = 0
+    mismatches = 0
+
+    for t in range(args.trials):
+        inst = random_instance(rng, args.max_n, args.max_h)
+        edges = random_feasible_tree(rng, inst)
+        if edges is None:
+            continue
+        ctx = SolverContext.from_instance(inst)
+        state = TreeState.from_solution(ctx, Solution(inst.name, 0.0, edges))
+        feas = IncrementalFeasibility(ctx, state)
+
+        for step in range(args.steps):
+            mark = state.checkpoint()
+            before = state.edges
+            # edição aleatória: tira 0-2 arestas, põe 0-3 quaisquer (pode gerar ciclo,
+            # desconectar, tirar terminal ou cruzar local trees)
+            for e in rng.sample(before, min(len(before), rng.randint(0, 2))):
+                state.remove_edge(*e)
+            for _ in range(rng.randint(0, 3)):
+                u, v = rng.sample(range(inst.n), 2)
+                state.add_edge(u, v)
+
+            got = feas.check(mark)
+            vr = verify_solution(inst, state)
+            expected = bool(vr.feasible)
+            checked += 1
+            feasible += expected
+            if got != expected:
+                mismatches += 1
+                if args.verbose or mismatches <= 5:
+                    print(
+                        f"[MISMATCH] trial={t} step={step} incremental={got} verify={expected}\n"
+                        f"  clusters={inst.clusters}\n  antes={before}\n  depois={state.edges}\n"
+                        f"  violations={vr.violations[:5]}"
+                    )
+
+            if expected and rng.random() < args.accept_prob:
+                state.commit()
+                feas.accept()
+                accepted += 1
+            else:
+                state.rollback(mark)
+                feas.reject()
+
+    print(f"\n[SUMMARY] candidatos={checked}  factíveis={feasible}  aceitos={accepted}  divergências={mismatches}")
+    if mismatches:
+        raise RuntimeError(f"[FAIL] IncrementalFeasibility divergiu de verify_solution em {mismatches} candidato(s)")
+    print("[OK] IncrementalFeasibility == verify_solution em todos os candidatos\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,11 @@ import random
 import csv
 from pathlib import Path
 
-from tcc.tsplib_loader import load_tsplib_clusteiner
+from tcc.instance_cache import load_instance
 from tcc.solution import Solution
 from tcc.verify import verify_solution
 
+from tcc.alns.context import SolverContext
 from tcc.alns.operators_destroy import (
     destroy_remove_k_global_edges,
     destroy_disconnect_cluster,
@@ -48,11 +49,13 @@ def main():
     ap.add_argument("--trials", type=int, default=100)
     ap.add_argument("--k", type=int, default=2)
     ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--cache_dir", type=Path, default=None, help="Cache de instâncias (padrão: $TCC_CACHE_DIR ou ~/.cache/tcc)")
     ap.add_argument("--verbose", action="store_true")
     args = ap.parse_args()
 
     inst_path = Path(args.instance)
-    inst = load_tsplib_clusteiner(inst_path)
+    inst = load_instance(inst_path, cache_dir=args.cache_dir)
+    ctx = SolverContext.from_instance(inst)
 
     # baseline
     base_cost, base_edges = solve_two_level_mst(inst)
@@ -98,16 +101,16 @@ def main():
         rng = random.Random(args.seed + t)
 
         # D1 -> R1
-        ps1 = destroy_remove_k_global_edges(inst, base_sol, rng, k=args.k)
-        sol1 = repair_r1_dijkstra(inst, ps1, rng)
+        ps1 = destroy_remove_k_global_edges(ctx, base_sol, rng, k=args.k)
+        sol1 = repair_r1_dijkstra(ctx, ps1, rng)
         check_solution(sol1, f"D1+R1 trial={t}")
         costs_d1.append(sol1.cost)
         if sol1.cost < base_cost:
             improved_d1 += 1
 
         # D2 -> R1
-        ps2 = destroy_disconnect_cluster(inst, base_sol, rng)
-        sol2 = repair_r1_dijkstra(inst, ps2, rng)
+        ps2 = destroy_disconnect_cluster(ctx, base_sol, rng)
+        sol2 = repair_r1_dijkstra(ctx, ps2, rng)
         check_solution(sol2, f"D2+R1 trial={t}")
         costs_d2.append(sol2.cost)
         if sol2.cost < base_cost:
@@ -4,10 +4,11 @@ import argparse
 import random
 from pathlib import Path
 
-from tcc.tsplib_loader import load_tsplib_clusteiner
+from tcc.instance_cache import load_instance
 from tcc.solution import Solution
 from tcc.verify import verify_solution
 
+from tcc.alns.context import SolverContext
 from tcc.alns.operators_destroy import (
     destroy_remove_k_global_edges,
     destroy_disconnect_cluster,
@@ -28,11 +29,13 @@ def main():
     ap.add_argument("--trials", type=int, default=100)
     ap.add_argument("--k", type=int, default=2)
     ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--cache_dir", type=Path, default=None, help="Cache de instâncias (padrão: $TCC_CACHE_DIR ou ~/.cache/tcc)")
     ap.add_argument("--verbose", action="store_true")
     args = ap.parse_args()
 
     inst_path = Path(args.instance)
-    inst = load_tsplib_clusteiner(inst_path)
+    inst = load_instance(inst_path, cache_dir=args.cache_dir)
+    ctx = SolverContext.from_instance(inst)
 
     # baseline 
     base_cost, base_edges = solve_two_level_mst(inst)
@@ -66,13 +69,13 @@ def main():
     for t in range(args.trials):
         rng = random.Random(args.seed + t)
 
-        ps1 = destroy_remove_k_global_edges(inst, base_sol, rng, k=args.k)
-        sol1 = repair_r3_mst_components(inst, ps1, rng)
+        ps1 = destroy_remove_k_global_edges(ctx, base_sol, rng, k=args.k)
+        sol1 = repair_r3_mst_components(ctx, ps1, rng)
         check_solution(sol1, f"D1+R3 trial={t}")
         best1 = min(best1, sol1.cost)
 
-        ps2 = destroy_disconnect_cluster(inst, base_sol, rng)
-        sol2 = repair_r3_mst_components(inst, ps2, rng)
+        ps2 = destroy_disconnect_cluster(ctx, base_sol, rng)
+        sol2 = repair_r3_mst_components(ctx, ps2, rng)
         check_solution(sol2, f"D2+R3 trial={t}")
         best2 = min(best2, sol2.cost)
 
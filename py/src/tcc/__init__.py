@@ -1,10 +1,12 @@
 from .instance import Instance
-from .solution import Solution
-from .verify import verify_solution, VerificationResult
+from .solution import ArraySolution, Solution
+from .verify import is_feasible, verify_solution, VerificationResult
 
 __all__ = [
     "Instance",
     "Solution",
+    "ArraySolution",
     "verify_solution",
+    "is_feasible",
     "VerificationResult",
 ]
@@ -1,5 +1,20 @@
+from .adaptive import AdaptiveConfig, OperatorWeights
+from .context import SolverContext
 from .partial_state import PartialState
-from .iterlog import IterationLogger
+from .tree_state import TreeState
+from .feasibility import IncrementalFeasibility
+from .iterlog import (
+    IterationLogger,
+    LogOptions,
+    NullIterationLogger,
+    NumpyIterationLogger,
+    SampledIterationLogger,
+    open_logger,
+    read_iteration_log,
+)
+from .termination import Termination
+from .instrument import COUNTERS, OperatorProfile
+from .checkpoint import SearchCheckpoint, load_checkpoint, save_checkpoint
 
 from .operators_destroy import (
     split_local_global_edges,
@@ -17,3 +32,6 @@ from .operators_repair import (
 from .operators_repair_steiner import repair_r4_steiner_hub
 
 from .alns_sa import run_alns_sa
+from .parallel import ParallelJob, ParallelResult, WorkerResult, run_alns_parallel
+from .islands import IslandConfig, MigrationBoard, run_alns_islands
+from .batch import CandidateEvaluator, run_alns_batch
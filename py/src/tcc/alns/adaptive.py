@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from typing import List, Sequence
+
+
+@dataclass
+class AdaptiveConfig:
+    """
+    Parâmetros da seleção adaptativa de operadores (ALNS clássico, Ropke & Pisinger):
+
+      - segment: iterações por segmento; os pesos só mudam no fim de cada um
+      - reaction: fator de reação r em w <- (1 - r) w + r * desempenho
+      - score_best / score_better / score_accepted: pontos da iteração quando o
+        candidato vira novo best / melhora a corrente / só é aceito (pior)
+      - time_aware: divide o desempenho pelo tempo médio por chamada do
+        operador (relativo à média do segmento), ou seja, pontos por segundo
+        (usa tempo de parede: a mesma seed deixa de reproduzir a execução e
+        a retomada de checkpoint não é idêntica; desligue para isso)
+      - min_weight: piso dos pesos (nenhum operador some de vez)
+    """
+
+    segment: int = 100
+    reaction: float = 0.1
+    score_best: float = 33.0
+    score_better: float = 9.0
+    score_accepted: float = 13.0
+    time_aware: bool = True
+    min_weight: float = 0.01
+
+    def __post_init__(self) -> None:
+        if self.segment < 1:
+            raise ValueError(f"segment deve ser >= 1 (recebido {self.segment})")
+        if not 0.0 <= self.reaction <= 1.0:
+            raise ValueError(f"reaction deve estar em [0, 1] (recebido {self.reaction})")
+
+
+class OperatorWeights:
+    """
+    Roleta adaptativa de um grupo de operadores (destroy ou repair).
+
+    Em cada segmento acumula, por operador, pontos, número de usos e tempo
+    de parede; no fim do segmento (end_segment) atualiza os pesos dos
+    operadores usados e zera os acumuladores. Operador não usado no
+    segmento mantém o peso.
+    """
+
+    def __init__(self, names: Sequence[str], cfg: AdaptiveConfig) -> None:
+        self.names = list(names)
+        self.cfg = cfg
+        k = len(self.names)
+        self.weights: List[float] = [1.0] * k
+        self._score = [0.0] * k
+        self._uses = [0] * k
+        self._time = [0.0] * k
+
+    def choose(self, rng: random.Random) -> int:
+        """Índice sorteado com probabilidade proporcional ao peso."""
+        x = rng.random() * sum(self.weights)
+        acc = 0.0
+        for i, w in enumerate(self.weights):
+            acc += w
+            if x < acc:
+                return i
+        return len(self.weights) - 1
+
+    def record(self, i: int, score: float, seconds: float) -> None:
+        self._score[i] += score
+        self._uses[i] += 1
+        self._time[i] += seconds
+
+    def end_segment(self) -> None:
+        cfg = self.cfg
+        used = [i for i, u in enumerate(self._uses) if u > 0]
+        if used:
+            mean_t = sum(self._time[i] for i in used) / sum(self._uses[i] for i in used)
+            for i in used:
+                perf = self._score[i] / self._uses[i]
+                t_i = self._time[i] / self._uses[i]
+                if cfg.time_aware and t_i > 0.0 and mean_t > 0.0:
+                    perf *= mean_t / t_i
+                w = (1.0 - cfg.reaction) * self.weights[i] + cfg.reaction * perf
+                self.weights[i] = max(cfg.min_weight, w)
+        k = len(self.names)
+        self._score = [0.0] * k
+        self._uses = [0] * k
+        self._time = [0.0] * k
+
+    def state(self) -> dict:
+        """Pesos e acumuladores do segmento (para checkpoint)."""
+        return {"weights": list(self.weights), "score": list(self._score), "uses": list(self._uses), "time": list(self._time)}
+
+    def load_state(self, state: dict) -> None:
+        k = len(self.names)
+        if any(len(state[key]) != k for key in ("weights", "score", "uses", "time")):
+            raise ValueError(f"estado dos pesos tem tamanho diferente de {k} operadores")
+        self.weights = [float(x) for x in state["weights"]]
+        self._score = [float(x) for x in state["score"]]
+        self._uses = [int(x) for x in state["uses"]]
+        self._time = [float(x) for x in state["time"]]
+
+    def log_fields(self, prefix: str) -> List[str]:
+        return [f"{prefix}{name}" for name in self.names]
+
+    def log_values(self, prefix: str) -> dict:
+        return {f"{prefix}{name}": w for name, w in zip(self.names, self.weights)}
@@ -2,9 +2,20 @@ from __future__ import annotations
 
 import math
 import random
-from typing import Any, Callable, List, Tuple, Optional
+import time
+from typing import Any, Callable, Dict, List, Tuple, Optional
 
-from .iterlog import IterationLogger
+from tcc.solution import ArraySolution
+
+from .adaptive import AdaptiveConfig, OperatorWeights
+from .checkpoint import SearchCheckpoint, load_checkpoint, save_checkpoint, truncate_log
+from .context import SolverContext
+from .feasibility import IncrementalFeasibility
+from . import instrument
+from .instrument import COUNTERS, OperatorProfile
+from .iterlog import LogOptions, open_logger
+from .termination import CANCELLED, Termination
+from .tree_state import TreeState
 
 
 def rpd_percent(cost: float, bks: float) -> float:
@@ -37,8 +48,8 @@ def run_alns_sa(
     cost_fn: Callable[[Any], float],
     feasible_fn: Callable[[Any, Any], bool],
     num_edges_fn: Callable[[Any], int],
-    destroy_ops: List[Tuple[str, Callable[[Any, Any, random.Random], Any]]],  # (name, fn(inst, sol, rng)->PartialState)
-    repair_ops: List[Tuple[str, Callable[[Any, Any, random.Random], Any]]],   # (name, fn(inst, partial, rng)->Solution)
+    destroy_ops: List[Tuple[str, Callable[[SolverContext, Any, random.Random], Any]]],  # (name, fn(ctx, sol, rng)->PartialState)
+    repair_ops: List[Tuple[str, Callable[[SolverContext, Any, random.Random], Any]]],   # (name, fn(ctx, partial, rng)->Solution)
     log_path: str,
     bks_cost: Optional[float] = None,
     time_limit_s: float = 2.0,
@@ -46,93 +57,324 @@ def run_alns_sa(
     seed: int = 0,
     t0: Optional[float] = None,    # temperatura inicial
     alpha: float = 0.995,          # resfriamento (0.99~0.999)
+    ctx: Optional[SolverContext] = None,  # contexto da instância (montado aqui se não vier)
+    in_place: bool = True,         # solução corrente num TreeState (undo log) em vez de copiar
+    incremental_feasibility: bool = False,  # com in_place: checa só o delta do candidato (ver IncrementalFeasibility)
+    adaptive: Optional[AdaptiveConfig] = None,  # pesos adaptativos dos operadores (None = sorteio uniforme)
+    on_best: Optional[Callable[[float, Any], None]] = None,  # chamado a cada novo best (custo, solução)
+    should_stop: Optional[Callable[[], bool]] = None,        # consultado a cada iteração; True encerra
+    stats: Optional[Dict[str, Any]] = None,                  # preenchido no fim (iters, accepted, elapsed_s, best_cost, migrations)
+    migrate: Optional[Callable[[int, float, float], Optional[Any]]] = None,  # (iter, custo corrente, temp) -> Solution a adotar ou None
+    checkpoint_path: Optional[str] = None,  # grava o estado da busca aqui a cada checkpoint_every iterações e no fim
+    checkpoint_every: int = 500,
+    resume_from: Optional[str] = None,      # checkpoint de onde continuar (em vez de build_initial)
+    log_options: Optional[LogOptions] = None,  # backend/amostragem do log (padrão: CSV, flush a cada linha)
+    termination: Optional[Termination] = None,  # critérios de parada extras (estagnação, alvo, cancelamento)
+    profile: Optional[OperatorProfile] = None,  # tempos e contadores por operador (None = sem instrumentação)
 ) -> Any:
     """
     ALNS com SA:
-      - começa com S0 (baseline factível)
+      - começa com S0 (baseline factível; ValueError se não for, ou se o custo for infinito)
       - a cada iteração:
         1) escolhe destroy e repair aleatoriamente
         2) gera candidato
         3) aceita por SA
         4) atualiza best
         5) loga tudo (cost, best_cost, rpd, delta_rpd, accepted, temp, ops...)
+
+    Os operadores recebem o SolverContext (montado uma vez por instância).
+
+    Com in_place=True a solução corrente é um TreeState: destroy/repair
+    alteram ele no lugar e um candidato rejeitado é desfeito pelo undo log
+    (custo proporcional ao tamanho da mudança). O best é guardado como
+    Solution (cópia só quando melhora). Um repair que devolva uma Solution
+    nova em vez do state também funciona (o state é recarregado dela).
+
+    Com incremental_feasibility=True (e in_place), a factibilidade do
+    candidato vem de IncrementalFeasibility.check a partir do delta do undo
+    log, no lugar de feasible_fn; isso pressupõe que feasible_fn é
+    is_feasible/verify_solution. O log reaproveita a factibilidade já
+    calculada da solução corrente em vez de verificá-la de novo.
+
+    Com `adaptive`, destroy e repair são sorteados por roleta com pesos
+    adaptativos por segmento (ver OperatorWeights), pontuados por novo best /
+    melhora / aceitação e, com time_aware, divididos pelo tempo medido de
+    cada operador. O log ganha destroy_s, repair_s e os pesos correntes
+    (wd_<destroy>, wr_<repair>).
+
+    `on_best` / `should_stop` são os ganchos usados pelo multi-start
+    (run_alns_parallel) para publicar o best e parar cedo. `migrate` é o do
+    modelo de ilhas (run_alns_islands): chamado antes de cada iteração,
+    pode devolver uma solução (já aprovada pela política de aceitação da
+    ilha) que vira a corrente se for factível.
+
+    Com `checkpoint_path`, o estado completo (soluções corrente e best,
+    temperatura, iteração, estado do rng, pesos adaptativos) é gravado
+    atomicamente a cada `checkpoint_every` iterações e ao terminar.
+    O log é descarregado no disco (logger.flush()) antes de cada checkpoint.
+    `resume_from` continua de um checkpoint: o log é cortado na iteração
+    dele e segue em append, max_iters / time_limit_s contam desde o início
+    da busca original, a estagnação conta desde a última melhora gravada
+    no checkpoint, e a trajetória é a mesma da execução sem parada
+    (exceto com adaptive time_aware, que depende de tempos medidos).
+
+    A parada é decidida por um Termination: max_iters e time_limit_s
+    preenchem os campos que `termination` não definir, e ele acrescenta
+    estagnação, custo-alvo e cancelamento. O motivo fica em
+    termination.reason e em stats["stop_reason"].
+
+    Com `profile`, cada iteração mede destroy, repair e a checagem de
+    factibilidade ("verify") e coleta os contadores de trabalho dos
+    operadores (instrument.COUNTERS: pops de Dijkstra, componentes, arestas
+    de caminho, ...). Vão para o log (destroy_s, repair_s, verify_s,
+    n_<contador>, somados na iteração) e para o profile, que resume
+    média / p50 / p99 por operador. Sem profile, os operadores só testam
+    um global em instrument.count().
     """
     rng = random.Random(seed)
+    if ctx is None:
+        ctx = SolverContext.from_instance(instance)
 
-    logger = IterationLogger(log_path)
+    dsel = rsel = None
+    extra_fields = []
+    if adaptive is not None or profile is not None:
+        extra_fields = ["destroy_s", "repair_s"]
+    if profile is not None:
+        extra_fields += ["verify_s"] + [f"n_{c}" for c in COUNTERS]
+    if adaptive is not None:
+        dsel = OperatorWeights([name for name, _ in destroy_ops], adaptive)
+        rsel = OperatorWeights([name for name, _ in repair_ops], adaptive)
+        extra_fields += dsel.log_fields("wd_") + rsel.log_fields("wr_")
+
+    ck = load_checkpoint(resume_from) if resume_from is not None else None
+    if ck is not None:
+        if ck.current.instance_name != instance.name:
+            raise ValueError(f"checkpoint é da instância {ck.current.instance_name!r}, não de {instance.name!r}")
+        truncate_log(log_path, ck.it)
+    logger = open_logger(log_path, extra_fields, log_options, append=ck is not None, start_s=ck.elapsed_s if ck else 0.0)
     logger.open()
 
-    # solução inicial
-    S = build_initial(instance)
-    best = S
-
-    curr_cost = cost_fn(S)
-    best_cost = curr_cost
-
-    # se não passar bks, usamos o best_cost inicial como referência (pra ao menos ter um rpd "interno")
-    if bks_cost is None:
-        bks_cost = best_cost
-
-    # se não passar T0, escolhemos algo proporcional ao custo (regra prática)
-    # ideia: aceitar pioras pequenas no começo
-    if t0 is None:
-        t0 = 0.05 * curr_cost  # ajuste depois se quiser
-
-    temp = float(t0)
-
-    feasible0 = feasible_fn(instance, S)
-    rpd0 = rpd_percent(curr_cost, bks_cost)
-
-    logger.log({
-        "iter": 0,
-        "time_s": logger.elapsed_s(),
-        "cost": curr_cost,
-        "best_cost": best_cost,
-        "rpd": rpd0,
-        "delta_rpd": 0.0,
-        "accepted": 1,
-        "temp": temp,
-        "destroy_op": "none",
-        "repair_op": "none",
-        "feasible": int(feasible0),
-        "num_edges": num_edges_fn(S),
-    })
-
-    prev_rpd = rpd0
-
-    it = 0
-    while it < max_iters and logger.elapsed_s() < time_limit_s:
+    term = termination if termination is not None else Termination()
+    if term.max_iters is None:
+        term.max_iters = max_iters
+    if term.time_limit_s is None:
+        term.time_limit_s = time_limit_s
+    if ck is None:
+        term.start()
+    else:
+        term.start(elapsed_s=ck.elapsed_s, it=ck.last_improve, best_cost=ck.best_cost)
+
+    if ck is None:
+        # solução inicial
+        S = build_initial(instance)
+        best = S
+        if in_place:
+            S = TreeState.from_solution(ctx, S)
+
+        curr_cost = cost_fn(S)
+        best_cost = curr_cost
+
+        # se não passar bks, usamos o best_cost inicial como referência (pra ao menos ter um rpd "interno")
+        if bks_cost is None:
+            bks_cost = best_cost
+
+        # se não passar T0, escolhemos algo proporcional ao custo (regra prática)
+        # ideia: aceitar pioras pequenas no começo
+        if t0 is None:
+            t0 = 0.05 * curr_cost  # ajuste depois se quiser
+
+        temp = float(t0)
+        if on_best is not None:
+            on_best(best_cost, best)
+
+        feasible0 = feasible_fn(instance, S)
+        if not feasible0 or not math.isfinite(curr_cost):
+            raise ValueError(f"solução inicial de {instance.name!r} inválida (custo={curr_cost}, factível={bool(feasible0)})")
+        curr_feasible = bool(feasible0)
+        feas = IncrementalFeasibility(ctx, S) if (in_place and incremental_feasibility) else None
+        rpd0 = rpd_percent(curr_cost, bks_cost)
+
+        logger.log({
+            "iter": 0,
+            "time_s": logger.elapsed_s(),
+            "cost": curr_cost,
+            "best_cost": best_cost,
+            "rpd": rpd0,
+            "delta_rpd": 0.0,
+            "accepted": 1,
+            "temp": temp,
+            "destroy_op": "none",
+            "repair_op": "none",
+            "feasible": int(feasible0),
+            "num_edges": S.num_edges if in_place else num_edges_fn(S),
+        })
+
+        prev_rpd = rpd0
+
+        it = 0
+        n_accepted = 0
+        n_migrations = 0
+    else:
+        # retomada: tudo vem do checkpoint, inclusive os custos exatos
+        best = ck.best.to_solution()
+        S = ck.current.to_solution()
+        if in_place:
+            S = TreeState.from_solution(ctx, S)
+            S.cost = ck.current.cost
+        curr_cost, best_cost, bks_cost = ck.curr_cost, ck.best_cost, ck.bks_cost
+        temp = ck.temp
+        if on_best is not None:
+            on_best(best_cost, best)
+        curr_feasible = ck.curr_feasible
+        feas = IncrementalFeasibility(ctx, S) if (in_place and incremental_feasibility) else None
+        prev_rpd = ck.prev_rpd
+        it, n_accepted, n_migrations = ck.it, ck.n_accepted, ck.n_migrations
+        rng.setstate(ck.rng_state)
+        if dsel is not None:
+            if ck.destroy_weights is None or ck.repair_weights is None:
+                raise ValueError("checkpoint sem pesos adaptativos, mas adaptive foi passado")
+            dsel.load_state(ck.destroy_weights)
+            rsel.load_state(ck.repair_weights)
+
+    def checkpoint() -> None:
+        # log antes do checkpoint: o que o checkpoint cobre já está no disco
+        # (o que vier depois dele é cortado por truncate_log na retomada)
+        logger.flush()
+        save_checkpoint(checkpoint_path, SearchCheckpoint(
+            it=it,
+            temp=temp,
+            curr_cost=curr_cost,
+            best_cost=best_cost,
+            bks_cost=bks_cost,
+            prev_rpd=prev_rpd,
+            curr_feasible=curr_feasible,
+            n_accepted=n_accepted,
+            n_migrations=n_migrations,
+            elapsed_s=logger.elapsed_s(),
+            last_improve=term.last_improve,
+            rng_state=rng.getstate(),
+            current=ArraySolution.from_solution(S),
+            best=ArraySolution.from_solution(best),
+            destroy_weights=dsel.state() if dsel is not None else None,
+            repair_weights=rsel.state() if rsel is not None else None,
+        ))
+
+    term.update(it, best_cost)
+    while not term.should_stop(it):
+        if should_stop is not None and should_stop():
+            term.reason = CANCELLED
+            break
+
+        # migração: solução vinda de outra ilha substitui a corrente
+        if migrate is not None:
+            incoming = migrate(it, curr_cost, temp)
+            if incoming is not None and feasible_fn(instance, incoming):
+                n_migrations += 1
+                if in_place:
+                    S.reset(incoming)
+                    if feas is not None:
+                        feas.verify()
+                else:
+                    S = incoming
+                curr_cost = cost_fn(S)
+                curr_feasible = True
+                if curr_cost < best_cost:
+                    best = S.to_solution() if in_place else S
+                    best_cost = curr_cost
+                    if on_best is not None:
+                        on_best(best_cost, best)
+
         it += 1
 
-        # 1) escolhe operadores (simples: uniforme)
-        dname, destroy = rng.choice(destroy_ops)
-        rname, repair = rng.choice(repair_ops)
+        # 1) escolhe operadores (uniforme, ou roleta com pesos adaptativos)
+        if dsel is None:
+            dname, destroy = rng.choice(destroy_ops)
+            rname, repair = rng.choice(repair_ops)
+        else:
+            di = dsel.choose(rng)
+            ri = rsel.choose(rng)
+            dname, destroy = destroy_ops[di]
+            rname, repair = repair_ops[ri]
 
         # 2) gera candidato
-        partial = destroy(instance, S, rng)
-        S_cand = repair(instance, partial, rng)
+        mark = S.checkpoint() if in_place else 0
+        if profile is not None:
+            instrument.start_call()
+        t_a = time.perf_counter()
+        partial = destroy(ctx, S, rng)
+        t_b = time.perf_counter()
+        if profile is not None:
+            d_counts = instrument.stop_call()
+            instrument.start_call()
+        S_cand = repair(ctx, partial, rng)
+        t_c = time.perf_counter()
+        if profile is not None:
+            r_counts = instrument.stop_call()
 
         cand_cost = cost_fn(S_cand)
-        cand_feasible = feasible_fn(instance, S_cand)
+        if feas is not None and S_cand is S:
+            cand_feasible = feas.check(mark)
+        else:
+            cand_feasible = feasible_fn(instance, S_cand)
+        if profile is not None:
+            t_d = time.perf_counter()
+            profile.record(dname, t_b - t_a, d_counts)
+            profile.record(rname, t_c - t_b, r_counts)
+            profile.record("verify", t_d - t_c, {})
 
         # 3) aceitação SA
         accepted = 0
+        prev_cost = curr_cost
         if cand_feasible and sa_accept(rng, curr_cost, cand_cost, temp):
-            S = S_cand
-            curr_cost = cand_cost
             accepted = 1
+            n_accepted += 1
+            curr_cost = cand_cost
+            curr_feasible = bool(cand_feasible)
+            if not in_place:
+                S = S_cand
+            elif S_cand is S:
+                S.commit()
+                if feas is not None:
+                    feas.accept()
+            else:
+                S.reset(S_cand)
+                if feas is not None:
+                    feas.verify()
+        elif in_place:
+            S.rollback(mark)
+            if feas is not None:
+                feas.reject()
 
         # 4) atualiza best
-        if curr_cost < best_cost:
-            best = S
+        new_best = curr_cost < best_cost
+        if new_best:
+            best = S.to_solution() if in_place else S
             best_cost = curr_cost
+            if on_best is not None:
+                on_best(best_cost, best)
+
+        # pontuação dos operadores (pesos mudam no fim de cada segmento)
+        if dsel is not None:
+            if not accepted:
+                score = 0.0
+            elif new_best:
+                score = adaptive.score_best
+            elif cand_cost < prev_cost:
+                score = adaptive.score_better
+            else:
+                score = adaptive.score_accepted
+            dsel.record(di, score, t_b - t_a)
+            rsel.record(ri, score, t_c - t_b)
+            if it % adaptive.segment == 0:
+                dsel.end_segment()
+                rsel.end_segment()
 
         # 5) métricas e log
         rpd = rpd_percent(curr_cost, bks_cost)
         delta_rpd = rpd - prev_rpd
         prev_rpd = rpd
 
-        logger.log({
+        row = {
             "iter": it,
             "time_s": logger.elapsed_s(),
             "cost": curr_cost,
@@ -143,12 +385,32 @@ def run_alns_sa(
             "temp": temp,
             "destroy_op": dname,
             "repair_op": rname,
-            "feasible": int(feasible_fn(instance, S)),
-            "num_edges": num_edges_fn(S),
-        })
+            "feasible": int(curr_feasible),
+            "num_edges": S.num_edges if in_place else num_edges_fn(S),
+        }
+        if dsel is not None or profile is not None:
+            row["destroy_s"] = t_b - t_a
+            row["repair_s"] = t_c - t_b
+        if profile is not None:
+            row["verify_s"] = t_d - t_c
+            for c in COUNTERS:
+                row[f"n_{c}"] = d_counts.get(c, 0) + r_counts.get(c, 0)
+        if dsel is not None:
+            row.update(dsel.log_values("wd_"))
+            row.update(rsel.log_values("wr_"))
+        logger.log(row)
 
         # resfriamento
         temp *= alpha
+        term.update(it, best_cost)
+
+        if checkpoint_path is not None and it % checkpoint_every == 0:
+            checkpoint()
+
+    if checkpoint_path is not None:
+        checkpoint()
 
+    if stats is not None:
+        stats.update(iters=it, accepted=n_accepted, elapsed_s=logger.elapsed_s(), best_cost=best_cost, migrations=n_migrations, stop_reason=term.reason)
     logger.close()
     return best
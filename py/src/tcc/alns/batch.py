@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import math
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from tcc.instance_cache import load_instance
+from tcc.solution import ArraySolution, Solution
+
+from .adaptive import OperatorWeights
+from .alns_sa import rpd_percent, sa_accept
+from .context import SolverContext
+from .feasibility import IncrementalFeasibility
+from .iterlog import LogOptions, open_logger
+from .parallel import ParallelJob
+from .termination import Termination
+from .tree_state import TreeState
+
+EXECUTORS = ("process", "thread")
+SELECTIONS = ("best", "sa")
+
+
+@dataclass
+class Candidate:
+    """Resultado de um destroy+repair sobre a solução corrente (arestas como int32 m x 2)."""
+
+    edge_array: np.ndarray
+    cost: float
+    feasible: bool
+    destroy_s: float
+    repair_s: float
+
+
+class CandidateEvaluator:
+    """
+    Gera candidatos a partir de uma solução corrente versionada.
+
+    Cada thread/processo guarda um TreeState (+ IncrementalFeasibility) da
+    última versão vista: enquanto a corrente não muda, um candidato custa só
+    destroy + repair + checagem do delta + rollback; quando muda, o state é
+    recarregado uma vez.
+    """
+
+    def __init__(self, ctx: SolverContext, job: ParallelJob, incremental_feasibility: bool) -> None:
+        self.ctx = ctx
+        self.job = job
+        self.incremental = incremental_feasibility
+        self._local = threading.local()
+
+    def _state(self, version: int, edges: np.ndarray) -> Tuple[TreeState, Optional[IncrementalFeasibility]]:
+        loc = self._local
+        if getattr(loc, "version", None) != version:
+            sol = Solution(instance_name=self.ctx.name, cost=0.0, edges=[tuple(e) for e in edges.tolist()])
+            if getattr(loc, "state", None) is None:
+                loc.state = TreeState.from_solution(self.ctx, sol)
+            else:
+                loc.state.reset(sol)
+            loc.feas = IncrementalFeasibility(self.ctx, loc.state) if self.incremental else None
+            loc.version = version
+        return loc.state, loc.feas
+
+    def evaluate(self, version: int, edges: np.ndarray, di: int, ri: int, seed: int) -> Candidate:
+        S, feas = self._state(version, edges)
+        rng = random.Random(seed)
+        mark = S.checkpoint()
+        t_a = time.perf_counter()
+        partial = self.job.destroy_ops[di][1](self.ctx, S, rng)
+        t_b = time.perf_counter()
+        cand = self.job.repair_ops[ri][1](self.ctx, partial, rng)
+        t_c = time.perf_counter()
+
+        if cand is S:
+            ok = feas.check(mark) if feas is not None else self.job.feasible_fn(self.ctx.instance, S)
+            out = Candidate(ArraySolution.from_solution(S).edge_array, float(self.job.cost_fn(S)), bool(ok), t_b - t_a, t_c - t_b)
+            S.rollback(mark)
+            if feas is not None:
+                feas.reject()
+        else:
+            ok = self.job.feasible_fn(self.ctx.instance, cand)
+            out = Candidate(ArraySolution.from_solution(cand).edge_array, float(self.job.cost_fn(cand)), bool(ok), t_b - t_a, t_c - t_b)
+            S.rollback(mark)
+        return out
+
+
+# ---------- avaliador por processo (executor="process") ----------
+
+_EVALUATOR: Optional[CandidateEvaluator] = None
+
+
+def _init_evaluator(job: ParallelJob, incremental_feasibility: bool) -> None:
+    global _EVALUATOR
+    inst = load_instance(job.instance_path, cache_dir=job.cache_dir, trusted=True)
+    if job.knn and job.knn > 0:
+        inst.build_candidates(job.knn)
+    _EVALUATOR = CandidateEvaluator(SolverContext.from_instance(inst), job, incremental_feasibility)
+
+
+def _evaluate(version: int, edges: np.ndarray, di: int, ri: int, seed: int) -> Candidate:
+    return _EVALUATOR.evaluate(version, edges, di, ri, seed)
+
+
+def run_alns_batch(
+    job: ParallelJob,
+    log_path: str,
+    batch: int = 4,
+    workers: int = 4,
+    executor: str = "process",
+    select: str = "best",
+    seed: int = 0,
+    log_options: Optional[LogOptions] = None,
+) -> Any:
+    """
+    ALNS com SA gerando `batch` candidatos por passo num pool de workers.
+
+    A cada passo o processo principal sorteia B pares (destroy, repair) e B
+    sementes com o próprio rng; cada candidato é gerado com random.Random
+    da sua semente a partir da MESMA solução corrente, então o resultado
+    não depende do número de workers nem da ordem de término. Escolha:
+
+      - select="best": o candidato factível mais barato, submetido à regra SA;
+      - select="sa": os factíveis em ordem aleatória, o primeiro que a regra
+        SA aceitar.
+
+    Como em run_alns_sa, a solução inicial (job.build_initial) tem de ser
+    factível e de custo finito (ValueError se não for).
+
+    Para manter o log comparável com run_alns_sa, `iter` conta candidatos
+    avaliados (avança B por passo, max_iters limita candidatos), a
+    temperatura esfria alpha^B por passo e cada passo gera uma linha.
+
+    executor="process" (padrão) monta o contexto da instância em cada
+    processo do pool (job vai por pickle, como em run_alns_parallel);
+    "thread" compartilha o contexto, mas os operadores são Python puro e só
+    escalam onde o trabalho cai em NumPy (linhas densas do Dijkstra).
+    Opções de job.run_kwargs usadas: time_limit_s, max_iters, t0, alpha,
+    incremental_feasibility, adaptive e termination (estagnação e alvo
+    contados em candidatos). Não há checkpoint, retomada nem profile.
+    """
+    if batch < 1:
+        raise ValueError(f"batch deve ser >= 1 (recebido {batch})")
+    if executor not in EXECUTORS:
+        raise ValueError(f"executor deve ser um de {EXECUTORS} (recebido {executor!r})")
+    if select not in SELECTIONS:
+        raise ValueError(f"select deve ser um de {SELECTIONS} (recebido {select!r})")
+
+    opts = dict(time_limit_s=2.0, max_iters=200, t0=None, alpha=0.995, incremental_feasibility=False, adaptive=None, termination=None)
+    opts.update(job.run_kwargs)
+    adaptive = opts["adaptive"]
+    term = opts["termination"] or Termination()
+    if term.max_iters is None:
+        term.max_iters = opts["max_iters"]
+    if term.time_limit_s is None:
+        term.time_limit_s = opts["time_limit_s"]
+
+    instance = load_instance(job.instance_path, cache_dir=job.cache_dir, trusted=True)
+    if job.knn and job.knn > 0:
+        instance.build_candidates(job.knn)
+    ctx = SolverContext.from_instance(instance)
+
+    rng = random.Random(seed)
+    destroy_ops: Sequence = job.destroy_ops
+    repair_ops: Sequence = job.repair_ops
+
+    dsel = rsel = None
+    extra_fields: List[str] = []
+    if adaptive is not None:
+        dsel = OperatorWeights([name for name, _ in destroy_ops], adaptive)
+        rsel = OperatorWeights([name for name, _ in repair_ops], adaptive)
+        extra_fields = dsel.log_fields("wd_") + rsel.log_fields("wr_")
+
+    if executor == "process":
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_evaluator, initargs=(job, opts["incremental_feasibility"]))
+        submit = lambda *a: pool.submit(_evaluate, *a)
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+        local_eval = CandidateEvaluator(ctx, job, opts["incremental_feasibility"])
+        submit = lambda *a: pool.submit(local_eval.evaluate, *a)
+
+    logger = open_logger(log_path, extra_fields, log_options)
+    logger.open()
+    term.start()
+    try:
+        S = job.build_initial(instance)
+        best = S
+        curr = ArraySolution.from_solution(S).edge_array
+        version = 0
+        curr_cost = job.cost_fn(S)
+        best_cost = curr_cost
+        bks_cost = job.bks_cost if job.bks_cost is not None else best_cost
+        temp = float(opts["t0"] if opts["t0"] is not None else 0.05 * curr_cost)
+        alpha = opts["alpha"]
+
+        curr_feasible = bool(job.feasible_fn(instance, S))
+        if not curr_feasible or not math.isfinite(curr_cost):
+            raise ValueError(f"solução inicial de {instance.name!r} inválida (custo={curr_cost}, factível={curr_feasible})")
+        rpd0 = rpd_percent(curr_cost, bks_cost)
+        logger.log({
+            "iter": 0,
+            "time_s": logger.elapsed_s(),
+            "cost": curr_cost,
+            "best_cost": best_cost,
+            "rpd": rpd0,
+            "delta_rpd": 0.0,
+            "accepted": 1,
+            "temp": temp,
+            "destroy_op": "none",
+            "repair_op": "none",
+            "feasible": int(curr_feasible),
+            "num_edges": int(curr.shape[0]),
+        })
+        prev_rpd = rpd0
+
+        it = 0
+        term.update(it, best_cost)
+        while not term.should_stop(it):
+            b = min(batch, term.max_iters - it)
+            picks = []
+            for _ in range(b):
+                if dsel is None:
+                    di = rng.randrange(len(destroy_ops))
+                    ri = rng.randrange(len(repair_ops))
+                else:
+                    di = dsel.choose(rng)
+                    ri = rsel.choose(rng)
+                picks.append((di, ri, rng.getrandbits(63)))
+            futures = [submit(version, curr, di, ri, s) for di, ri, s in picks]
+            cands = [f.result() for f in futures]
+            it += b
+
+            # escolha do candidato que avança a busca
+            ok = [i for i, c in enumerate(cands) if c.feasible]
+            if select == "best":
+                order = sorted(ok, key=lambda i: (cands[i].cost, i))[:1]
+            else:
+                order = ok[:]
+                rng.shuffle(order)
+            chosen = -1
+            for i in order:
+                if sa_accept(rng, curr_cost, cands[i].cost, temp):
+                    chosen = i
+                    break
+
+            prev_cost = curr_cost
+            new_best = False
+            if chosen >= 0:
+                c = cands[chosen]
+                curr, curr_cost, curr_feasible = c.edge_array, c.cost, True
+                version += 1
+                if curr_cost < best_cost:
+                    new_best = True
+                    best_cost = curr_cost
+                    best = ArraySolution(instance.name, curr_cost, curr).to_solution()
+
+            if dsel is not None:
+                for i, (di, ri, _) in enumerate(picks):
+                    if i != chosen:
+                        score = 0.0
+                    elif new_best:
+                        score = adaptive.score_best
+                    elif curr_cost < prev_cost:
+                        score = adaptive.score_better
+                    else:
+                        score = adaptive.score_accepted
+                    dsel.record(di, score, cands[i].destroy_s)
+                    rsel.record(ri, score, cands[i].repair_s)
+                if it // adaptive.segment != (it - b) // adaptive.segment:
+                    dsel.end_segment()
+                    rsel.end_segment()
+
+            rpd = rpd_percent(curr_cost, bks_cost)
+            shown = picks[chosen if chosen >= 0 else 0]
+            row = {
+                "iter": it,
+                "time_s": logger.elapsed_s(),
+                "cost": curr_cost,
+                "best_cost": best_cost,
+                "rpd": rpd,
+                "delta_rpd": rpd - prev_rpd,
+                "accepted": int(chosen >= 0),
+                "temp": temp,
+                "destroy_op": destroy_ops[shown[0]][0],
+                "repair_op": repair_ops[shown[1]][0],
+                "feasible": int(curr_feasible),
+                "num_edges": int(curr.shape[0]),
+            }
+            if dsel is not None:
+                row.update(dsel.log_values("wd_"))
+                row.update(rsel.log_values("wr_"))
+            logger.log(row)
+            prev_rpd = rpd
+
+            temp *= alpha ** b
+            term.update(it, best_cost)
+    finally:
+        pool.shutdown(cancel_futures=True)
+        logger.close()
+    return best
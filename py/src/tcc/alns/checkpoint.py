@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from tcc.solution import ArraySolution
+
+CHECKPOINT_VERSION = 2
+
+
+@dataclass
+class SearchCheckpoint:
+    """
+    Estado completo de run_alns_sa no fim da iteração `it`.
+
+    `current.cost` é o custo guardado no TreeState (acumulado aresta a
+    aresta) e `curr_cost` o custo corrente da busca; os dois são restaurados
+    exatamente, assim como o estado do random.Random, os pesos adaptativos
+    (OperatorWeights.state()) e `last_improve` (iteração da última melhora
+    do best, de onde o Termination conta a estagnação), para a continuação
+    ser idêntica.
+    """
+
+    it: int
+    temp: float
+    curr_cost: float
+    best_cost: float
+    bks_cost: float
+    prev_rpd: float
+    curr_feasible: bool
+    n_accepted: int
+    n_migrations: int
+    elapsed_s: float
+    last_improve: int
+    rng_state: tuple
+    current: ArraySolution
+    best: ArraySolution
+    destroy_weights: Optional[Dict[str, Any]] = None
+    repair_weights: Optional[Dict[str, Any]] = None
+
+
+def save_checkpoint(path: Path, ck: SearchCheckpoint) -> None:
+    """
+    Grava o checkpoint (.npz comprimido: arestas em int32, estado do rng em
+    uint64, resto em JSON). Atômico: escreve num temporário ao lado e troca
+    com os.replace, então um processo morto no meio deixa o anterior intacto.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    version, mt, gauss = ck.rng_state
+    meta = {
+        "format": CHECKPOINT_VERSION,
+        "instance_name": ck.current.instance_name,
+        "it": ck.it,
+        "temp": ck.temp,
+        "curr_cost": ck.curr_cost,
+        "best_cost": ck.best_cost,
+        "bks_cost": ck.bks_cost,
+        "prev_rpd": ck.prev_rpd,
+        "curr_feasible": ck.curr_feasible,
+        "n_accepted": ck.n_accepted,
+        "n_migrations": ck.n_migrations,
+        "elapsed_s": ck.elapsed_s,
+        "last_improve": ck.last_improve,
+        "current_cost": ck.current.cost,
+        "best_solution_cost": ck.best.cost,
+        "rng_version": version,
+        "rng_gauss": gauss,
+        "destroy_weights": ck.destroy_weights,
+        "repair_weights": ck.repair_weights,
+    }
+    tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    try:
+        with tmp.open("wb") as f:
+            np.savez_compressed(
+                f,
+                meta=np.array(json.dumps(meta)),
+                current=ck.current.edge_array,
+                best=ck.best.edge_array,
+                rng=np.asarray(mt, dtype=np.uint64),
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def load_checkpoint(path: Path) -> SearchCheckpoint:
+    path = Path(path)
+    with np.load(path, allow_pickle=False) as z:
+        meta = json.loads(str(z["meta"]))
+        current_edges = z["current"]
+        best_edges = z["best"]
+        mt = tuple(int(x) for x in z["rng"].tolist())
+    if meta.get("format") not in (1, CHECKPOINT_VERSION):
+        raise ValueError(f"{path}: versão {meta.get('format')} do checkpoint não suportada (esperava {CHECKPOINT_VERSION})")
+    name = meta["instance_name"]
+    return SearchCheckpoint(
+        it=int(meta["it"]),
+        temp=float(meta["temp"]),
+        curr_cost=float(meta["curr_cost"]),
+        best_cost=float(meta["best_cost"]),
+        bks_cost=float(meta["bks_cost"]),
+        prev_rpd=float(meta["prev_rpd"]),
+        curr_feasible=bool(meta["curr_feasible"]),
+        n_accepted=int(meta["n_accepted"]),
+        n_migrations=int(meta["n_migrations"]),
+        elapsed_s=float(meta["elapsed_s"]),
+        # formato 1 não guardava: a estagnação recomeça na iteração do checkpoint
+        last_improve=int(meta.get("last_improve", meta["it"])),
+        rng_state=(meta["rng_version"], mt, meta["rng_gauss"]),
+        current=ArraySolution(name, meta["current_cost"], current_edges),
+        best=ArraySolution(name, meta["best_solution_cost"], best_edges),
+        destroy_weights=meta["destroy_weights"],
+        repair_weights=meta["repair_weights"],
+    )
+
+
+def truncate_log(log_path: Path, it: int) -> None:
+    """Descarta as linhas do log (.csv ou .npz) depois da iteração `it` (escritas após o checkpoint)."""
+    log_path = Path(log_path)
+    if not log_path.exists():
+        return
+    if log_path.suffix == ".npz":
+        with np.load(log_path, allow_pickle=False) as z:
+            keep = z["iter"] <= it
+            arrays = {k: (z[k] if k == "__fields__" or k.endswith("__labels") else z[k][keep]) for k in z.files}
+        tmp = log_path.with_name(f".{log_path.name}.tmp-{os.getpid()}")
+        with tmp.open("wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, log_path)
+        return
+    with log_path.open("r", newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    if not rows:
+        return
+    keep = [rows[0]] + [r for r in rows[1:] if r and int(r[0]) <= it]
+    tmp = log_path.with_name(f".{log_path.name}.tmp-{os.getpid()}")
+    with tmp.open("w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(keep)
+    os.replace(tmp, log_path)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import FrozenSet, Optional, Tuple
+
+import numpy as np
+
+from tcc.instance import Instance
+from tcc.knn import KNNGraph
+from tcc.weights import WeightOracle
+
+
+# adjacência imutável: adj[u] = ((v, w(u, v)), ...)
+Adjacency = Tuple[Tuple[Tuple[int, float], ...], ...]
+
+
+@dataclass(frozen=True)
+class SolverContext:
+    """
+    Tudo que os operadores precisam da instância, montado UMA vez por instância:
+
+      - weights: oráculo de pesos (w[(u, v)], row, gather, ...)
+      - adj: adjacência para o Dijkstra com heap; None em grafo completo sem
+        listas KNN (aí o Dijkstra denso lê as linhas do oráculo)
+      - clusters / cluster_of / cluster_sets / terminal_set: em tuplas e frozensets
+      - steiner: vértices não-requeridos, em ordem crescente
+
+    É somente-leitura (dataclass congelada, tuplas, arrays com write=False),
+    então pode ser compartilhado entre threads. Tem `name`, `n`, `clusters` e
+    `cluster_of` como a Instance, então os helpers que só leem esses campos
+    aceitam os dois.
+
+    Se for usar listas KNN, chame `inst.build_candidates(k)` ANTES de montar o contexto.
+    """
+
+    instance: Instance
+    weights: WeightOracle
+    adj: Optional[Adjacency]
+    knn: Optional[KNNGraph]
+    clusters: Tuple[Tuple[int, ...], ...]
+    cluster_of: Tuple[int, ...]
+    cluster_of_arr: np.ndarray
+    cluster_sets: Tuple[FrozenSet[int], ...]
+    terminal_set: FrozenSet[int]
+    steiner: Tuple[int, ...]
+
+    @property
+    def name(self) -> str:
+        return self.instance.name
+
+    @property
+    def n(self) -> int:
+        return self.instance.n
+
+    @property
+    def num_clusters(self) -> int:
+        return len(self.clusters)
+
+    @classmethod
+    def from_instance(cls, inst: Instance) -> "SolverContext":
+        # import local: operators_repair importa este módulo
+        from .operators_repair import build_adj, build_weight_lookup
+
+        adj_lists = build_adj(inst)
+        adj = None if adj_lists is None else tuple(tuple(nb) for nb in adj_lists)
+
+        cluster_of_arr = np.asarray(inst.cluster_of, dtype=np.int32).copy()
+        cluster_of_arr.setflags(write=False)
+
+        clusters = tuple(tuple(int(v) for v in c) for c in inst.clusters)
+        return cls(
+            instance=inst,
+            weights=build_weight_lookup(inst),
+            adj=adj,
+            knn=inst.knn,
+            clusters=clusters,
+            cluster_of=tuple(cluster_of_arr.tolist()),
+            cluster_of_arr=cluster_of_arr,
+            cluster_sets=tuple(frozenset(c) for c in clusters),
+            terminal_set=frozenset(v for c in clusters for v in c),
+            steiner=tuple(np.flatnonzero(cluster_of_arr == -1).tolist()),
+        )
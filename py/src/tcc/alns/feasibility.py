@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+from tcc.solution import TreeEdge
+from tcc.verify import VerificationResult, _local_tree_indices, _root_forest, is_feasible, verify_solution
+
+from .context import SolverContext
+from .tree_state import TreeState
+
+
+class IncrementalFeasibility:
+    """
+    Factibilidade de um TreeState checada pelo delta (removidas, inseridas)
+    de cada candidato, em vez de verificar a árvore inteira.
+
+    Guarda, para a última árvore ACEITA e factível T:
+      - um enraizamento (tin/tout em pré-ordem), pra dizer em qual pedaço
+        de T \\ removidas cada vértice ficou;
+      - owner[v]: cluster cujo local tree contém v (-1 se nenhum) e a lista
+        de vértices de cada local tree.
+
+    check(mark) olha só a região afetada:
+      - árvore: contagem |E| = |V| - 1 e union-find sobre os pedaços de
+        T \\ removidas ligados pelas arestas inseridas;
+      - terminais: só os extremos das arestas removidas podem sumir;
+      - disjunção: só os clusters com aresta removida dentro do local tree
+        mudam de V_k; cada um é refeito por uma busca que não atravessa
+        vértices de outros local trees.
+
+    Mesma resposta que verify_solution(...).feasible. Uso numa iteração:
+
+        mark = state.checkpoint()
+        ... destroy/repair ...
+        ok = feas.check(mark)
+        if aceito: state.commit(); feas.accept()
+        else:      state.rollback(mark); feas.reject()
+
+    Custo: candidatos rejeitados custam só o tamanho do delta + região
+    afetada, mas accept() re-enraíza a árvore nova inteira (O(n), uma DFS
+    sobre state.adj): tin/tout de pré-ordem não têm atualização local
+    barata quando cortes e ligações mudam a raiz dos pedaços. Só paga quem
+    é aceito; exp/bench.py mede as duas partes (feasibility/check e
+    feasibility/accept, ao lado de verify). Se a base não é factível (ou o
+    state foi recarregado por fora), cai na verificação completa;
+    verify() força essa verificação sob demanda.
+    """
+
+    def __init__(self, ctx: SolverContext, state: TreeState) -> None:
+        self.ctx = ctx
+        self.state = state
+        n = ctx.n
+        self.owner: List[int] = [-1] * n
+        self.members: List[List[int]] = [[] for _ in range(ctx.num_clusters)]
+        self.tin: List[int] = [-1] * n
+        self.tout: List[int] = [-1] * n
+        self.root = -1
+        self.num_vertices = 0
+        self.feasible = False  # da última árvore aceita
+        self._pending: Optional[Dict[int, List[int]]] = None  # novos V_k do candidato checado
+        self._changed = False
+        self.verify()
+
+    # ---------- verificação completa ----------
+
+    def verify(self) -> VerificationResult:
+        """Verificação completa do state atual; refaz enraizamento e donos."""
+        res = verify_solution(self.ctx.instance, self.state)
+        self.feasible = bool(res.feasible)
+        self._pending = None
+        if self.feasible:
+            self._rebuild(owners=True)
+        return res
+
+    def _rebuild(self, owners: bool) -> None:
+        n = self.ctx.n
+        adj = {u: list(nb) for u, nb in enumerate(self.state.adj) if nb}
+        forest = _root_forest(adj, set(adj))
+        verts, par = forest.vertices, forest.parent
+        N = len(verts)
+
+        sz = [1] * N
+        for i in range(N - 1, 0, -1):
+            if par[i] >= 0:
+                sz[par[i]] += sz[i]
+
+        tin = [-1] * n
+        tout = [-1] * n
+        for i, v in enumerate(verts):
+            tin[v] = i
+            tout[v] = i + sz[i] - 1
+        self.tin, self.tout = tin, tout
+        self.root = verts[0] if N else -1
+        self.num_vertices = N
+
+        if owners:
+            owner = [-1] * n
+            stamp = [-1] * N
+            for k, Ck in enumerate(self.ctx.clusters):
+                vs = [verts[i] for i in _local_tree_indices(forest, Ck, stamp, k)]
+                self.members[k] = vs
+                for v in vs:
+                    owner[v] = k
+            self.owner = owner
+
+    # ---------- checagem incremental ----------
+
+    def check(self, mark: int) -> bool:
+        """O candidato (state atual) é factível? Usa as mudanças desde `mark`."""
+        removed, added = self.state.changes_since(mark)
+        self._pending = None
+        self._changed = bool(removed or added)
+        if not self.feasible:
+            return is_feasible(self.ctx.instance, self.state)
+        if not removed and not added:
+            self._pending = {}
+            return True
+        new_members = self._check_delta(removed, added)
+        if new_members is None:
+            return False
+        self._pending = new_members
+        return True
+
+    def accept(self) -> None:
+        """O candidato checado virou a solução corrente. O(n): re-enraíza a árvore."""
+        new_members = self._pending
+        self._pending = None
+        if new_members is None:
+            # sem checagem incremental válida pra este candidato
+            self.verify()
+            return
+        owner = self.owner
+        for k in new_members:
+            for v in self.members[k]:
+                if owner[v] == k:
+                    owner[v] = -1
+        for k, vs in new_members.items():
+            self.members[k] = vs
+            for v in vs:
+                owner[v] = k
+        if self._changed:
+            self._rebuild(owners=False)  # re-enraíza a árvore aceita
+
+    def reject(self) -> None:
+        """Candidato descartado (o state já voltou para a árvore aceita)."""
+        self._pending = None
+
+    def _check_delta(self, removed: List[TreeEdge], added: List[TreeEdge]) -> Optional[Dict[int, List[int]]]:
+        ctx = self.ctx
+        adj = self.state.adj
+        cluster_of = ctx.cluster_of
+
+        # arestas inseridas existem no grafo
+        W = ctx.weights
+        if added and not W.complete:
+            us, vs = zip(*added)
+            if any(w == float("inf") for w in W.gather(us, vs).tolist()):
+                return None
+
+        # |V| do candidato: só extremos do delta mudam de grau
+        ddeg: Dict[int, int] = {}
+        for a, b in removed:
+            ddeg[a] = ddeg.get(a, 0) + 1
+            ddeg[b] = ddeg.get(b, 0) + 1
+        for a, b in added:
+            ddeg[a] = ddeg.get(a, 0) - 1
+            ddeg[b] = ddeg.get(b, 0) - 1
+        nv = self.num_vertices
+        for x, d in ddeg.items():
+            now = len(adj[x])
+            before = now + d
+            if before > 0 and now == 0:
+                if cluster_of[x] != -1:
+                    return None  # terminal saiu da solução
+                nv -= 1
+            elif before == 0 and now > 0:
+                nv += 1
+        if nv == 0 or self.state.num_edges != nv - 1:
+            return None
+
+        if not self._connected(removed, added):
+            return None
+        return self._local_trees(removed)
+
+    def _connected(self, removed: List[TreeEdge], added: List[TreeEdge]) -> bool:
+        """
+        Cada aresta removida (p, c) de T solta a subárvore de c, que em
+        pré-ordem é o intervalo [tin[c], tout[c]]. O pedaço de um vértice é
+        o corte mais profundo cujo intervalo o contém (ou a raiz). Os
+        pedaços que continuam na solução, mais os vértices novos, têm de
+        ficar num só conjunto do union-find das arestas inseridas.
+        """
+        tin, tout = self.tin, self.tout
+        cuts = sorted((a if tin[a] > tin[b] else b for a, b in removed), key=tin.__getitem__)
+        r = len(cuts)
+        ROOT = r
+
+        def piece(x: int, skip: int = -1) -> int:
+            t = tin[x]
+            if t < 0:
+                return r + 1 + x  # vértice que não estava em T
+            best = ROOT
+            for i, c in enumerate(cuts):
+                if tin[c] > t:
+                    break
+                if i != skip and t <= tout[c]:
+                    best = i
+            return best
+
+        uf: Dict[int, int] = {}
+
+        def find(a: int) -> int:
+            while uf.get(a, a) != a:
+                nxt = uf[a]
+                uf[a] = uf.get(nxt, nxt)
+                a = nxt
+            return a
+
+        alive = set()
+        for a, b in added:
+            pa, pb = piece(a), piece(b)
+            alive.add(pa)
+            alive.add(pb)
+            ra, rb = find(pa), find(pb)
+            if ra == rb:
+                return False  # ciclo
+            uf[ra] = rb
+
+        # tamanho de cada pedaço = subárvore menos os cortes logo abaixo dela
+        size = [tout[c] - tin[c] + 1 for c in cuts] + [self.num_vertices]
+        for j, c in enumerate(cuts):
+            size[piece(c, skip=j)] -= tout[c] - tin[c] + 1
+        adj = self.state.adj
+        reps = cuts + [self.root]
+        for i in range(r + 1):
+            if size[i] >= 2 or adj[reps[i]]:
+                alive.add(i)
+
+        roots = {find(p) for p in alive}
+        return len(roots) == 1
+
+    def _local_trees(self, removed: List[TreeEdge]) -> Optional[Dict[int, List[int]]]:
+        """
+        Refaz V_k dos clusters com aresta removida dentro do local tree.
+        Os outros não mudam: a subárvore deles continua inteira no candidato.
+        A busca parte de um terminal e não atravessa terminais de outro
+        cluster nem vértices de local trees intocados (ou já refeitos nesta
+        checagem); se algum terminal não é alcançado, o caminho único até
+        ele passa por um desses vértices -> interseção.
+        """
+        ctx = self.ctx
+        owner = self.owner
+        affected = sorted({owner[a] for a, b in removed if owner[a] != -1 and owner[a] == owner[b]})
+        if not affected:
+            return {}
+
+        adj = self.state.adj
+        cluster_of = ctx.cluster_of
+        freed = set()
+        for k in affected:
+            freed.update(self.members[k])
+
+        claimed: Dict[int, int] = {}
+        new_members: Dict[int, List[int]] = {}
+        for k in affected:
+            terms = ctx.clusters[k]
+            root = terms[0]
+            need = len(terms) - 1
+            par = {root: -1}
+            stack = [root]
+            found = 0
+            while stack and found < need:
+                u = stack.pop()
+                for v in adj[u]:
+                    if v in par:
+                        continue
+                    c = cluster_of[v]
+                    if c == -1:
+                        if v in claimed or (owner[v] != -1 and v not in freed):
+                            continue
+                    elif c != k:
+                        continue
+                    else:
+                        found += 1
+                    par[v] = u
+                    stack.append(v)
+            if found < need:
+                return None
+
+            Vk: List[int] = []
+            for t in terms:
+                x = t
+                while x != -1 and claimed.get(x) != k:
+                    claimed[x] = k
+                    Vk.append(x)
+                    x = par[x]
+            new_members[k] = Vk
+        return new_members
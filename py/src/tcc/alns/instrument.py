@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# contadores de trabalho reportados pelos operadores (colunas n_<nome> do log)
+COUNTERS = (
+    "removed_edges",       # destroy: arestas globais removidas
+    "components",          # repair: junções de componentes (nível de clusters) feitas
+    "dijkstra_runs",       # repair: execuções de Dijkstra (inclui o fallback fora do KNN)
+    "dijkstra_pops",       # repair: vértices fixados pelos Dijkstras
+    "path_edges",          # repair: arestas dos caminhos reconstruídos
+    "added_edges",         # repair: arestas novas inseridas na solução
+    "steiner_candidates",  # repair R4: vértices Steiner avaliados
+)
+
+# Contadores da chamada sendo medida. None = instrumentação desligada: aí
+# count() é só um teste e os operadores não pagam nada além disso.
+# Um por processo; não é para ser usado por várias threads ao mesmo tempo.
+_active: Optional[Dict[str, int]] = None
+
+
+def count(name: str, n: int = 1) -> None:
+    """Soma `n` ao contador `name` da chamada corrente (nada se desligado)."""
+    if _active is not None:
+        _active[name] = _active.get(name, 0) + n
+
+
+def start_call() -> None:
+    global _active
+    _active = {}
+
+
+def stop_call() -> Dict[str, int]:
+    """Encerra a chamada corrente e devolve os contadores dela."""
+    global _active
+    out, _active = _active or {}, None
+    return out
+
+
+class OperatorProfile:
+    """
+    Tempos e contadores por operador (destroy, repair e "verify") ao longo
+    de uma execução; summary() resume em média / p50 / p99 por operador.
+    """
+
+    def __init__(self) -> None:
+        self._times: Dict[str, List[float]] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, op: str, seconds: float, counters: Dict[str, int]) -> None:
+        self._times.setdefault(op, []).append(seconds)
+        acc = self._counts.setdefault(op, {})
+        for name, n in counters.items():
+            acc[name] = acc.get(name, 0) + n
+
+    def summary(self) -> List[dict]:
+        rows = []
+        for op in sorted(self._times, key=lambda op: (op == "verify", op)):
+            ts = self._times[op]
+            t = np.asarray(ts)
+            row = {
+                "op": op,
+                "calls": len(ts),
+                "total_s": float(t.sum()),
+                "mean_s": float(t.mean()),
+                "p50_s": float(np.percentile(t, 50)),
+                "p99_s": float(np.percentile(t, 99)),
+            }
+            for name in COUNTERS:
+                if name in self._counts[op]:
+                    row[f"mean_{name}"] = self._counts[op][name] / len(ts)
+            rows.append(row)
+        return rows
+
+    def format_table(self) -> str:
+        rows = self.summary()
+        if not rows:
+            return "(sem chamadas)"
+        counters = [f"mean_{c}" for c in COUNTERS if any(f"mean_{c}" in r for r in rows)]
+        head = ["op", "calls", "total_s", "mean_ms", "p50_ms", "p99_ms"] + [c[len("mean_"):] for c in counters]
+        body = []
+        for r in rows:
+            body.append(
+                [r["op"], str(r["calls"]), f"{r['total_s']:.3f}"]
+                + [f"{1e3 * r[k]:.3f}" for k in ("mean_s", "p50_s", "p99_s")]
+                + [f"{r[c]:.1f}" if c in r else "-" for c in counters]
+            )
+        widths = [max(len(x) for x in col) for col in zip(head, *body)]
+        fmt = lambda cells: "  ".join(c.ljust(w) if i == 0 else c.rjust(w) for i, (c, w) in enumerate(zip(cells, widths)))
+        return "\n".join([fmt(head)] + [fmt(b) for b in body])
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import math
+import multiprocessing as mp
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+from tcc.instance_cache import load_instance
+from tcc.solution import ArraySolution, Solution
+
+from . import parallel
+from .alns_sa import sa_accept
+from .parallel import ParallelJob, ParallelResult, worker_seeds
+
+TOPOLOGIES = ("ring", "broadcast")
+POLICIES = ("better", "sa", "always")
+
+
+@dataclass
+class IslandConfig:
+    """
+    Migração entre ilhas (uma busca run_alns_sa por processo):
+
+      - interval: a cada `interval` iterações a ilha publica o best (se
+        melhorou desde a última publicação) e lê as dos vizinhos
+      - topology: "ring" (ilha i lê só a i-1) ou "broadcast" (lê todas)
+      - policy: quando o melhor migrante recebido vira a solução corrente:
+        "better" (só se for melhor que a corrente), "sa" (regra SA com a
+        temperatura da ilha) ou "always"
+    """
+
+    interval: int = 50
+    topology: str = "ring"
+    policy: str = "better"
+
+    def __post_init__(self) -> None:
+        if self.interval < 1:
+            raise ValueError(f"interval deve ser >= 1 (recebido {self.interval})")
+        if self.topology not in TOPOLOGIES:
+            raise ValueError(f"topology deve ser uma de {TOPOLOGIES} (recebido {self.topology!r})")
+        if self.policy not in POLICIES:
+            raise ValueError(f"policy deve ser uma de {POLICIES} (recebido {self.policy!r})")
+
+
+class MigrationBoard:
+    """
+    Quadro de migração em memória compartilhada: um slot por ilha.
+
+    Slot i: version[i] (incrementa a cada publicação), cost[i], count[i] e
+    as arestas em edges[i] (int32, até n - 1 pares; mesma codificação do
+    ArraySolution). Só a ilha i escreve no slot i; leitores comparam a
+    versão sem lock e só copiam (com o lock do slot) quando ela mudou.
+    Nada bloqueia além da cópia de um slot.
+    """
+
+    def __init__(self, islands: int, n: int) -> None:
+        self.islands = islands
+        self.capacity = max(1, n - 1)
+        self.version = mp.RawArray("q", islands)
+        self.cost = mp.RawArray("d", islands)
+        self.count = mp.RawArray("i", islands)
+        self.edges = mp.RawArray("i", islands * 2 * self.capacity)
+        self.locks = [mp.Lock() for _ in range(islands)]
+
+    def _slot(self, i: int) -> np.ndarray:
+        return np.frombuffer(self.edges, dtype=np.int32).reshape(self.islands, self.capacity, 2)[i]
+
+    def publish(self, i: int, sol: Any) -> bool:
+        arr = ArraySolution.from_solution(sol).edge_array
+        m = arr.shape[0]
+        if m > self.capacity:
+            return False  # não é árvore; não migra
+        with self.locks[i]:
+            self._slot(i)[:m] = arr
+            self.count[i] = m
+            self.cost[i] = float(sol.cost)
+            self.version[i] += 1
+        return True
+
+    def read(self, i: int, instance_name: str) -> ArraySolution:
+        with self.locks[i]:
+            m = self.count[i]
+            return ArraySolution(instance_name, self.cost[i], self._slot(i)[:m].copy())
+
+
+_BOARD: Optional[MigrationBoard] = None
+
+
+def _init_island(board: MigrationBoard, shared_best, lock) -> None:
+    global _BOARD
+    _BOARD = board
+    parallel._init_worker(shared_best, lock)
+
+
+class _Island:
+    """Ganchos on_best / migrate de run_alns_sa para a ilha `index`."""
+
+    def __init__(self, board: MigrationBoard, index: int, cfg: IslandConfig, seed: int) -> None:
+        self.board = board
+        self.index = index
+        self.cfg = cfg
+        self.rng = random.Random(seed ^ 0x5EED)  # separado do rng da busca
+        k = board.islands
+        if cfg.topology == "ring":
+            self.sources = [(index - 1) % k] if k > 1 else []
+        else:
+            self.sources = [j for j in range(k) if j != index]
+        self.seen = [0] * k
+        self.best: Any = None
+        self.dirty = False
+
+    def on_best(self, cost: float, sol: Any) -> None:
+        parallel._publish_best(cost)
+        self.best = sol
+        self.dirty = True
+
+    def migrate(self, it: int, curr_cost: float, temp: float) -> Optional[Solution]:
+        if it == 0 or it % self.cfg.interval != 0:
+            return None
+        board = self.board
+        if self.dirty and self.best is not None:
+            board.publish(self.index, self.best)
+            self.dirty = False
+
+        # melhor migrante novo entre as fontes
+        pick = -1
+        for j in self.sources:
+            v = board.version[j]
+            if v > self.seen[j]:
+                self.seen[j] = v
+                if pick < 0 or board.cost[j] < board.cost[pick]:
+                    pick = j
+        if pick < 0:
+            return None
+        mig = board.read(pick, self.best.instance_name)
+
+        policy = self.cfg.policy
+        if policy == "better":
+            ok = mig.cost < curr_cost
+        elif policy == "sa":
+            ok = sa_accept(self.rng, curr_cost, mig.cost, temp)
+        else:
+            ok = True
+        return mig.to_solution() if ok else None
+
+
+def _run_island(job: ParallelJob, worker: int, seed: int, target_cost: Optional[float], cfg: IslandConfig):
+    island = _Island(_BOARD, worker, cfg, seed)
+    return parallel._run_worker(job, worker, seed, target_cost, island=island)
+
+
+def run_alns_islands(
+    job: ParallelJob,
+    islands: int,
+    cfg: Optional[IslandConfig] = None,
+    seed: int = 0,
+    target_cost: Optional[float] = None,
+) -> ParallelResult:
+    """
+    Modelo de ilhas: `islands` buscas run_alns_sa em processos, trocando
+    soluções de elite por um MigrationBoard a cada cfg.interval iterações.
+
+    Mesmas sementes, logs, target e resultado de run_alns_parallel
+    (WorkerResult.migrations conta os migrantes adotados). A migração
+    depende do ritmo relativo dos processos, então, ao contrário do
+    multi-start, duas execuções com a mesma seed não são idênticas.
+    """
+    if islands < 1:
+        raise ValueError(f"islands deve ser >= 1 (recebido {islands})")
+    cfg = cfg or IslandConfig()
+    Path(job.log_dir).mkdir(parents=True, exist_ok=True)
+
+    inst = load_instance(job.instance_path, cache_dir=job.cache_dir, trusted=True)
+    board = MigrationBoard(islands, inst.n)
+    del inst
+
+    seeds = worker_seeds(seed, islands)
+    shared_best = mp.RawValue("d", math.inf)
+    lock = mp.Lock()
+
+    if islands == 1:
+        _init_island(board, shared_best, lock)
+        results = [_run_island(job, 0, seeds[0], target_cost, cfg)]
+    else:
+        with ProcessPoolExecutor(max_workers=islands, initializer=_init_island, initargs=(board, shared_best, lock)) as pool:
+            futures = [pool.submit(_run_island, job, i, s, target_cost, cfg) for i, s in enumerate(seeds)]
+            results = [f.result() for f in futures]
+
+    winner = min(results, key=lambda r: (r.best_cost, r.worker))
+    return ParallelResult(best=winner.best, best_worker=winner.worker, workers=results)
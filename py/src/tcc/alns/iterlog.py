@@ -1,18 +1,83 @@
 from __future__ import annotations
 import csv
+import os
 import time
-from dataclasses import dataclass
-from typing import Any, Dict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# colunas fixas do log (extra_fields vêm depois delas)
+FIELDS = [
+    "iter",
+    "time_s",
+    "cost",
+    "best_cost",
+    "rpd",
+    "delta_rpd",
+    "accepted",
+    "temp",
+    "destroy_op",
+    "repair_op",
+    "feasible",
+    "num_edges",
+]
+
+BACKENDS = ("csv", "npz", "none")
+
+
+@dataclass
+class LogOptions:
+    """
+    Como o log por iteração é gravado (o esquema é sempre FIELDS + extras):
+
+      - backend: "csv" (IterationLogger), "npz" (NumpyIterationLogger,
+        colunar, gravado no close e a cada flush()) ou "none" (NullIterationLogger)
+      - flush_every: csv: linhas entre flushes (1 = a cada linha)
+      - every: amostragem, uma linha a cada `every` iterações
+      - improvements_only: só as linhas em que best_cost melhora (com
+        every > 1, também as múltiplas de every)
+
+    Com amostragem, a iteração 0 e a última linha sempre entram no log.
+    """
+
+    backend: str = "csv"
+    flush_every: int = 1
+    every: int = 1
+    improvements_only: bool = False
+
+    def __post_init__(self) -> None:
+        if self.backend not in BACKENDS:
+            raise ValueError(f"backend deve ser um de {BACKENDS} (recebido {self.backend!r})")
+        if self.flush_every < 1:
+            raise ValueError(f"flush_every deve ser >= 1 (recebido {self.flush_every})")
+        if self.every < 1:
+            raise ValueError(f"every deve ser >= 1 (recebido {self.every})")
+
+    @property
+    def sampled(self) -> bool:
+        return self.every > 1 or self.improvements_only
+
 
 @dataclass
 class IterationLogger:
     csv_path: str
+    extra_fields: List[str] = field(default_factory=list)
+    append: bool = False     # continua um log existente (sem reescrever o cabeçalho)
+    start_s: float = 0.0     # tempo já decorrido antes desta execução (retomada)
+    flush_every: int = 1     # linhas entre flushes do arquivo
     _t0: float = None
     _f: Any = None
     _w: Any = None
+    _unflushed: int = 0
 
     def __post_init__(self) -> None:
-        self._t0 = time.perf_counter()
+        self._t0 = time.perf_counter() - self.start_s
+
+    @property
+    def fields(self) -> List[str]:
+        return FIELDS + list(self.extra_fields)
 
     def elapsed_s(self) -> float:
         return time.perf_counter() - self._t0
@@ -20,32 +85,235 @@ class IterationLogger:
     def open(self) -> None:
         if self._f is not None:
             return
-        self._f = open(self.csv_path, "w", newline="", encoding="utf-8")
-        self._w = csv.DictWriter(self._f, fieldnames=[
-            "iter",
-            "time_s",
-            "cost",
-            "best_cost",
-            "rpd",
-            "delta_rpd",
-            "accepted",
-            "temp",
-            "destroy_op",
-            "repair_op",
-            "feasible",
-            "num_edges",
-        ])
-        self._w.writeheader()
+        exists = self.append and os.path.exists(self.csv_path) and os.path.getsize(self.csv_path) > 0
+        self._f = open(self.csv_path, "a" if exists else "w", newline="", encoding="utf-8")
+        self._w = csv.DictWriter(self._f, fieldnames=self.fields)
+        if not exists:
+            self._w.writeheader()
         self._f.flush()
 
     def log(self, row: Dict[str, Any]) -> None:
         if self._f is None:
             self.open()
         self._w.writerow(row)
-        self._f.flush()
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self._f.flush()
+            self._unflushed = 0
+
+    def flush(self) -> None:
+        """Manda ao arquivo as linhas pendentes (chamado antes de cada checkpoint)."""
+        if self._f is not None:
+            self._f.flush()
+            self._unflushed = 0
 
     def close(self) -> None:
         if self._f is not None:
             self._f.close()
             self._f = None
             self._w = None
+            self._unflushed = 0
+
+
+@dataclass
+class NullIterationLogger(IterationLogger):
+    """Não grava nada; só mantém o relógio (elapsed_s) usado pelo limite de tempo."""
+
+    def open(self) -> None:
+        pass
+
+    def log(self, row: Dict[str, Any]) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+@dataclass
+class NumpyIterationLogger(IterationLogger):
+    """
+    Log colunar: um array NumPy por coluna (capacidade dobra quando enche),
+    gravado num .npz no close e a cada flush() (atômico: temporário +
+    os.replace). O flush regrava todas as colunas (O(linhas)); run_alns_sa
+    só o chama nos checkpoints, para a retomada achar o histórico no disco.
+
+    Colunas de texto (destroy_op, repair_op, ...) viram códigos int32 com
+    os rótulos em "<coluna>__labels". Linhas sem a coluna (ou com NaN) são
+    marcadas em "<coluna>__mask" (gravado só se faltar alguma), e
+    read_iteration_log põe NaN nelas: devolve o mesmo DataFrame que o do
+    CSV, inclusive nos dtypes.
+    """
+
+    _cols: Dict[str, np.ndarray] = None
+    _mask: Dict[str, np.ndarray] = None
+    _labels: Dict[str, Dict[str, int]] = None
+    _n: int = 0
+
+    def open(self) -> None:
+        if self._cols is not None:
+            return
+        self._cols = {}
+        self._mask = {}
+        self._labels = {}
+        self._n = 0
+        if self.append and os.path.exists(self.csv_path):
+            df = read_iteration_log(self.csv_path)
+            for row in df.to_dict("records"):
+                self.log(row)
+
+    def _new_column(self, name: str, value: Any, cap: int) -> None:
+        self._mask[name] = np.zeros(cap, dtype=bool)
+        if isinstance(value, str):
+            self._labels[name] = {}
+            self._cols[name] = np.zeros(cap, dtype=np.int32)
+        elif isinstance(value, (bool, int, np.integer)):
+            self._cols[name] = np.zeros(cap, dtype=np.int64)
+        else:
+            self._cols[name] = np.full(cap, np.nan, dtype=np.float64)
+
+    def log(self, row: Dict[str, Any]) -> None:
+        if self._cols is None:
+            self.open()
+        n = self._n
+        cap = len(next(iter(self._cols.values()))) if self._cols else 0
+        if n == cap:
+            cap = max(1024, 2 * cap)
+            for name, arr in self._cols.items():
+                grown = np.zeros(cap, dtype=arr.dtype) if arr.dtype.kind != "f" else np.full(cap, np.nan)
+                grown[:n] = arr[:n]
+                self._cols[name] = grown
+                mask = np.zeros(cap, dtype=bool)
+                mask[:n] = self._mask[name][:n]
+                self._mask[name] = mask
+        for name in self.fields:
+            value = row.get(name)
+            if value is None or (isinstance(value, float) and value != value):
+                continue  # ausente: fica fora da máscara (NaN na leitura)
+            if name not in self._cols:
+                self._new_column(name, value, cap)
+            labels = self._labels.get(name)
+            if labels is not None:
+                value = labels.setdefault(str(value), len(labels))
+            self._cols[name][n] = value
+            self._mask[name][n] = True
+        self._n = n + 1
+
+    def flush(self) -> None:
+        if self._cols is None:
+            return
+        n = self._n
+        out: Dict[str, np.ndarray] = {"__fields__": np.array(self.fields)}
+        for name, arr in self._cols.items():
+            out[name] = arr[:n]
+            if not self._mask[name][:n].all():
+                out[f"{name}__mask"] = self._mask[name][:n]
+            if name in self._labels:
+                out[f"{name}__labels"] = np.array(list(self._labels[name]) or [""])
+        path = Path(self.csv_path)
+        tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+        with tmp.open("wb") as f:
+            np.savez(f, **out)
+        os.replace(tmp, path)
+
+    def close(self) -> None:
+        if self._cols is None:
+            return
+        self.flush()
+        self._cols = None
+        self._mask = None
+        self._labels = None
+
+
+class SampledIterationLogger:
+    """
+    Filtra as linhas antes de repassar a outro logger (ver LogOptions.every
+    e improvements_only). A última linha recebida é gravada no close se
+    ainda não tiver entrado.
+    """
+
+    def __init__(self, inner: IterationLogger, every: int = 1, improvements_only: bool = False) -> None:
+        self.inner = inner
+        self.every = every
+        self.improvements_only = improvements_only
+        self._best = float("inf")
+        self._last: Optional[Dict[str, Any]] = None
+
+    @property
+    def fields(self) -> List[str]:
+        return self.inner.fields
+
+    def elapsed_s(self) -> float:
+        return self.inner.elapsed_s()
+
+    def open(self) -> None:
+        self.inner.open()
+
+    def flush(self) -> None:
+        # a linha retida (_last) não entra: ela só é gravada se for a última
+        self.inner.flush()
+
+    def log(self, row: Dict[str, Any]) -> None:
+        it = int(row["iter"])
+        improved = row["best_cost"] < self._best
+        self._best = min(self._best, row["best_cost"])
+        if it == 0:
+            keep = True
+        elif self.improvements_only:
+            keep = improved or (self.every > 1 and it % self.every == 0)
+        else:
+            keep = it % self.every == 0
+        if keep:
+            self.inner.log(row)
+            self._last = None
+        else:
+            self._last = row
+
+    def close(self) -> None:
+        if self._last is not None:
+            self.inner.log(self._last)
+            self._last = None
+        self.inner.close()
+
+
+def open_logger(
+    path: str,
+    extra_fields: Optional[List[str]] = None,
+    options: Optional[LogOptions] = None,
+    append: bool = False,
+    start_s: float = 0.0,
+):
+    """Logger (ainda não aberto) do backend pedido em `options` (padrão: CSV linha a linha)."""
+    options = options or LogOptions()
+    cls = {"csv": IterationLogger, "npz": NumpyIterationLogger, "none": NullIterationLogger}[options.backend]
+    logger = cls(path, extra_fields=list(extra_fields or []), append=append, start_s=start_s, flush_every=options.flush_every)
+    if options.sampled:
+        return SampledIterationLogger(logger, every=options.every, improvements_only=options.improvements_only)
+    return logger
+
+
+def read_iteration_log(path: str):
+    """Log .csv ou .npz -> pandas.DataFrame com as colunas na ordem do esquema."""
+    import pandas as pd
+
+    path = str(path)
+    if not path.endswith(".npz"):
+        return pd.read_csv(path, float_precision="round_trip")
+    with np.load(path, allow_pickle=False) as z:
+        names = [str(x) for x in z["__fields__"]]
+        data = {}
+        n = len(z["iter"]) if "iter" in z.files else 0
+        for name in names:
+            if name not in z.files:
+                data[name] = np.full(n, np.nan)  # coluna nunca preenchida (vazia no CSV)
+                continue
+            col = z[name]
+            if f"{name}__labels" in z.files:
+                col = z[f"{name}__labels"][col]
+            if f"{name}__mask" in z.files:
+                col = col.astype(object if col.dtype.kind in "US" else np.float64)
+                col[~z[f"{name}__mask"]] = np.nan
+            data[name] = col
+    return pd.DataFrame(data, columns=names)
@@ -1,20 +1,23 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import List, Optional, Tuple, Union
 import random
 
 from tcc.instance import Instance
 from tcc.solution import Solution, TreeEdge
 
+from . import instrument
+from .context import SolverContext
 from .partial_state import PartialState
+from .tree_state import TreeState
 
 
 def _norm_edge(u: int, v: int) -> TreeEdge:
     return (u, v) if u < v else (v, u)
 
 
-def split_local_global_edges(instance: Instance, edges: List[TreeEdge]) -> Tuple[List[TreeEdge], List[TreeEdge]]:
+def split_local_global_edges(instance: Union[Instance, SolverContext], edges: List[TreeEdge]) -> Tuple[List[TreeEdge], List[TreeEdge]]:
     """
     Definição usada a partir daqui:
 
@@ -65,7 +68,7 @@ class DSU:
             self.r[ra] += 1
 
 
-def compute_cluster_components(instance: Instance, global_edges: List[TreeEdge]) -> List[List[int]]:
+def compute_cluster_components(instance: Union[Instance, SolverContext], global_edges: List[TreeEdge]) -> List[List[int]]:
     """
     Componentes no nível de CLUSTERS, mas levando em conta caminhos que passam por Steiner.
 
@@ -106,12 +109,34 @@ def _build_cluster_to_component(num_clusters: int, components: list[list[int]])
     return out
 
 
-def destroy_d1_remove_k_global_edges(instance, solution, rng: random.Random, k: int = 2) -> PartialState:
-    local_edges, global_edges = split_local_global_edges(instance, solution.edges)
+def _split(ctx: SolverContext, solution: Union[Solution, TreeState]) -> Tuple[List[TreeEdge], List[TreeEdge]]:
+    # o TreeState já guarda local/global separados: não precisa re-dividir,
+    # mas as listas ainda são copiadas (O(|árvore|), ver TreeState)
+    if isinstance(solution, TreeState):
+        return solution.local_edges(), solution.global_edges()
+    return split_local_global_edges(ctx, solution.edges)
+
+
+def _remove_from_state(solution: Union[Solution, TreeState], removed: List[TreeEdge]) -> Optional[TreeState]:
+    if not isinstance(solution, TreeState):
+        return None
+    for (u, v) in removed:
+        solution.remove_edge(u, v)
+    return solution
+
+
+def destroy_d1_remove_k_global_edges(ctx: SolverContext, solution: Union[Solution, TreeState], rng: random.Random, k: int = 2) -> PartialState:
+    """
+    D1: remove k arestas globais sorteadas.
+    Com TreeState, remove no lugar (o undo log permite desfazer) e o repair continua nele.
+    Custo O(n + |árvore|) nos dois modos: cópia das listas em _split e
+    compute_cluster_components sobre as globais restantes.
+    """
+    local_edges, global_edges = _split(ctx, solution)
 
     if len(global_edges) == 0:
-        components = compute_cluster_components(instance, global_edges)
-        cluster_to_component = _build_cluster_to_component(len(instance.clusters), components)
+        components = compute_cluster_components(ctx, global_edges)
+        cluster_to_component = _build_cluster_to_component(ctx.num_clusters, components)
         return PartialState(
             base_solution=solution,
             local_edges=local_edges,
@@ -121,15 +146,17 @@ def destroy_d1_remove_k_global_edges(instance, solution, rng: random.Random, k:
             cluster_to_component=cluster_to_component,
             destroyed_cluster=None,
             meta={"destroy_op": "D1_remove_k_global_edges", "k": 0},
+            state=_remove_from_state(solution, []),
         )
 
     kk = min(k, len(global_edges))
     removed = rng.sample(global_edges, kk)
+    instrument.count("removed_edges", kk)
     removed_set = set(removed)
     remaining = [e for e in global_edges if e not in removed_set]
 
-    components = compute_cluster_components(instance, remaining)
-    cluster_to_component = _build_cluster_to_component(len(instance.clusters), components)
+    components = compute_cluster_components(ctx, remaining)
+    cluster_to_component = _build_cluster_to_component(ctx.num_clusters, components)
 
     return PartialState(
         base_solution=solution,
@@ -140,20 +167,29 @@ def destroy_d1_remove_k_global_edges(instance, solution, rng: random.Random, k:
         cluster_to_component=cluster_to_component,
         destroyed_cluster=None,
         meta={"destroy_op": "D1_remove_k_global_edges", "k": kk},
+        state=_remove_from_state(solution, removed),
     )
 
 
-def destroy_d2_disconnect_cluster(instance, solution, rng: random.Random) -> PartialState:
-    local_edges, global_edges = split_local_global_edges(instance, solution.edges)
+def destroy_d2_disconnect_cluster(ctx: SolverContext, solution: Union[Solution, TreeState], rng: random.Random) -> PartialState:
+    """
+    D2: escolhe um cluster e remove uma aresta global incidente a ele.
+    Com TreeState, as incidentes vêm da adjacência (só os terminais do cluster),
+    mas o resto é O(n + |árvore|) como no D1 (_split + compute_cluster_components).
+    """
+    local_edges, global_edges = _split(ctx, solution)
 
-    num_clusters = len(instance.clusters)
+    num_clusters = ctx.num_clusters
     c = rng.randrange(num_clusters)
-    terminals = set(instance.clusters[c])
+    terminals = ctx.cluster_sets[c]
 
-    incident = [e for e in global_edges if (e[0] in terminals) or (e[1] in terminals)]
+    if isinstance(solution, TreeState):
+        incident = solution.global_edges_at(ctx.clusters[c])
+    else:
+        incident = [e for e in global_edges if (e[0] in terminals) or (e[1] in terminals)]
 
     if not incident:
-        components = compute_cluster_components(instance, global_edges)
+        components = compute_cluster_components(ctx, global_edges)
         cluster_to_component = _build_cluster_to_component(num_clusters, components)
         return PartialState(
             base_solution=solution,
@@ -164,12 +200,14 @@ def destroy_d2_disconnect_cluster(instance, solution, rng: random.Random) -> Par
             cluster_to_component=cluster_to_component,
             destroyed_cluster=c,
             meta={"destroy_op": "D2_disconnect_cluster", "note": "no incident global edge"},
+            state=_remove_from_state(solution, []),
         )
 
     removed_edge = rng.choice(incident)
+    instrument.count("removed_edges")
     remaining = [e for e in global_edges if e != removed_edge]
 
-    components = compute_cluster_components(instance, remaining)
+    components = compute_cluster_components(ctx, remaining)
     cluster_to_component = _build_cluster_to_component(num_clusters, components)
 
     return PartialState(
@@ -181,6 +219,7 @@ def destroy_d2_disconnect_cluster(instance, solution, rng: random.Random) -> Par
         cluster_to_component=cluster_to_component,
         destroyed_cluster=c,
         meta={"destroy_op": "D2_disconnect_cluster"},
+        state=_remove_from_state(solution, [removed_edge]),
     )
 
 
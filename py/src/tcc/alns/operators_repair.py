@@ -2,12 +2,18 @@ from __future__ import annotations
 
 import heapq
 import random
-from typing import Dict, List, Tuple, Optional
+from typing import List, Tuple, Optional, Union
+
+import numpy as np
 
 from tcc.instance import Instance
 from tcc.solution import Solution, TreeEdge
+from tcc.weights import WeightOracle
 
+from . import instrument
+from .context import SolverContext
 from .partial_state import PartialState
+from .tree_state import TreeState
 from .operators_destroy import compute_cluster_components  # DSU do Dia 02
 
 
@@ -16,38 +22,60 @@ def _norm_edge(e: TreeEdge) -> TreeEdge:
     return (u, v) if u < v else (v, u)
 
 
-def build_weight_lookup(inst: Instance) -> Dict[Tuple[int, int], float]:
-    """Mapa rápido w(u,v). Coloca as duas direções pra facilitar."""
-    w: Dict[Tuple[int, int], float] = {}
-    for u, v, c in inst.edges:
-        cc = float(c)
-        w[(u, v)] = cc
-        w[(v, u)] = cc
-    return w
+def build_weight_lookup(inst: Instance) -> WeightOracle:
+    """
+    Lookup w(u,v) nas duas direções: `w[(u, v)]`.
+
+    Devolve o oráculo de pesos da instância (matriz densa, coordenadas ou
+    lista de arestas), então não precisa montar dicionário nenhum.
+    Usado ao montar o SolverContext; os operadores leem `ctx.weights`.
+    """
+    return inst.weights
+
+
+def build_adj(inst: Instance) -> Optional[List[List[Tuple[int, float]]]]:
+    """
+    Adjacência (lista) para Dijkstra.
 
+    Chamado uma vez, ao montar o SolverContext (`ctx.adj`).
 
-def build_adj(inst: Instance) -> List[List[Tuple[int, float]]]:
-    """Adjacência (lista) para Dijkstra."""
-    adj: List[List[Tuple[int, float]]] = [[] for _ in range(inst.n)]
-    for u, v, c in inst.edges:
-        cc = float(c)
-        adj[u].append((v, cc))
-        adj[v].append((u, cc))
+    Em grafo completo (matriz/coordenadas):
+      - com listas KNN (`inst.knn`), devolve o grafo esparso de candidatos;
+      - senão devolve None: o Dijkstra lê as linhas do oráculo direto,
+        sem materializar n² pares.
+    """
+    if inst.weights.complete:
+        return inst.knn.adjacency if inst.knn is not None else None
+
+    W = inst.weights
+    adj: List[List[Tuple[int, float]]] = []
+    for u in range(inst.n):
+        idx, ws = W.neighbors(u)
+        adj.append(list(zip(idx.tolist(), ws.tolist())))
     return adj
 
 # Dijkstra multi-source
 
 def dijkstra_all(
-    inst: Instance,
-    adj: List[List[Tuple[int, float]]],
+    ctx: SolverContext,
     sources: List[int],
+    full_graph: bool = False,
 ) -> Tuple[List[float], List[int]]:
     """
     Dijkstra multi-source completo:
       - retorna dist[] e parent[] pra reconstruir caminho até alguma fonte
+
+    Usa `ctx.adj` com heap. Com ctx.adj=None (ou full_graph=True num grafo
+    completo) usa a versão densa O(n²) sobre `ctx.weights`: cada passo fixa o
+    vértice de menor dist (empate -> menor índice, igual à ordem da heap) e
+    relaxa a linha inteira de uma vez.
     """
+    adj = ctx.adj
+    if adj is None or (full_graph and ctx.weights.complete):
+        return _dijkstra_dense(ctx, sources)
+
     INF = 10**30
-    n = inst.n
+    n = ctx.n
     dist = [INF] * n
     parent = [-1] * n
     pq: List[Tuple[float, int]] = []
@@ -57,10 +85,12 @@ def dijkstra_all(
         parent[s] = -1
         heapq.heappush(pq, (0.0, s))
 
+    pops = 0
     while pq:
         d, u = heapq.heappop(pq)
         if d != dist[u]:
             continue
+        pops += 1
         for v, w_uv in adj[u]:
             nd = d + w_uv
             if nd < dist[v]:
@@ -68,8 +98,62 @@ def dijkstra_all(
                 parent[v] = u
                 heapq.heappush(pq, (nd, v))
 
+    instrument.count("dijkstra_runs")
+    instrument.count("dijkstra_pops", pops)
     return dist, parent
 
+
+def dijkstra_reaching(
+    ctx: SolverContext,
+    sources: List[int],
+    target_groups: List[List[int]],
+) -> Tuple[List[float], List[int]]:
+    """
+    Dijkstra multi-source que garante alcançar cada grupo de alvos.
+
+    Se `ctx.adj` é o grafo de candidatos (KNN) e algum grupo ficou sem
+    nenhum alvo alcançável, roda de novo no grafo completo (fallback).
+    """
+    dist, parent = dijkstra_all(ctx, sources)
+    if ctx.adj is not None and ctx.knn is not None and ctx.weights.complete:
+        for group in target_groups:
+            if min((dist[v] for v in group), default=0.0) >= 10**29:
+                return dijkstra_all(ctx, sources, full_graph=True)
+    return dist, parent
+
+
+def _dijkstra_dense(ctx: SolverContext, sources: List[int]) -> Tuple[List[float], List[int]]:
+    W = ctx.weights
+    n = ctx.n
+    dist = np.full(n, np.inf)
+    parent = np.full(n, -1, dtype=np.int64)
+    done = np.zeros(n, dtype=bool)
+    dist[sources] = 0.0
+
+    # key = dist dos vértices ainda não fixados (inf nos fixados)
+    key = dist.copy()
+    pops = 0
+    for _ in range(n):
+        u = int(np.argmin(key))
+        d = key[u]
+        if d == np.inf:
+            break
+        pops += 1
+        done[u] = True
+        key[u] = np.inf
+
+        nd = d + W.row(u)
+        better = nd < dist
+        better &= ~done
+        if better.any():
+            dist[better] = nd[better]
+            parent[better] = u
+            key[better] = nd[better]
+
+    instrument.count("dijkstra_runs")
+    instrument.count("dijkstra_pops", pops)
+    return dist.tolist(), parent.tolist()
+
 def _build_cluster_to_component(num_clusters: int, components: List[List[int]]) -> List[int]:
     out = [-1] * num_clusters
     for comp_id, comp in enumerate(components):
@@ -77,6 +161,31 @@ def _build_cluster_to_component(num_clusters: int, components: List[List[int]])
             out[c] = comp_id
     return out
 
+def _finish(
+    ctx: SolverContext,
+    ps: PartialState,
+    local_edges: List[TreeEdge],
+    global_edges: List[TreeEdge],
+    n_kept: int,
+) -> Union[Solution, TreeState]:
+    """
+    Fecha o reparo. global_edges[n_kept:] são as arestas novas.
+
+      - modo no lugar (ps.state): insere só as novas no TreeState (custo
+        atualizado incrementalmente) e devolve o próprio state;
+      - modo antigo: monta uma Solution nova; o custo sai de um gather só
+        (weights.total, o mesmo caminho do verify_solution).
+    """
+    instrument.count("added_edges", len(global_edges) - n_kept)
+    if ps.state is not None:
+        for (u, v) in global_edges[n_kept:]:
+            ps.state.add_edge(u, v)
+        return ps.state
+
+    final_edges = list(local_edges) + list(global_edges)
+    return Solution(instance_name=ctx.name, cost=ctx.weights.total(final_edges), edges=final_edges)
+
+
 def reconstruct_path_edges(parent: List[int], target: int) -> List[TreeEdge]:
     """
     Reconstrói o caminho (lista de arestas) voltando do target até alguma fonte (parent=-1).
@@ -88,12 +197,13 @@ def reconstruct_path_edges(parent: List[int], target: int) -> List[TreeEdge]:
         edges.append(_norm_edge((p, cur)))
         cur = p
     edges.reverse()
+    instrument.count("path_edges", len(edges))
     return edges
 
 
 # Repair R1 — reconecta ganancioso com Dijkstra
 
-def repair_r1_dijkstra(inst: Instance, ps: PartialState, rng: random.Random) -> Solution:
+def repair_r1_dijkstra(ctx: SolverContext, ps: PartialState, rng: random.Random) -> Union[Solution, TreeState]:
     """
     R1: reconectar componentes usando Dijkstra multi-source repetidamente.
 
@@ -103,18 +213,17 @@ def repair_r1_dijkstra(inst: Instance, ps: PartialState, rng: random.Random) ->
       ps.components: componentes no nível de clusters
 
     Saída:
-      Solution com local_edges intactas + global_edges reparadas.
+      Solution com local_edges intactas + global_edges reparadas
+      (ou ps.state, com as arestas novas inseridas no lugar).
     """
-    adj = build_adj(inst)
-    w = build_weight_lookup(inst)
-
     local_edges = [_norm_edge(e) for e in ps.local_edges]
     global_edges = [_norm_edge(e) for e in ps.global_edges_remaining]
     global_set = set(global_edges)
+    n_kept = len(global_edges)
 
     while True:
-        components = compute_cluster_components(inst, global_edges)
-        cluster_to_component = _build_cluster_to_component(len(inst.clusters), components)
+        components = compute_cluster_components(ctx, global_edges)
+        cluster_to_component = _build_cluster_to_component(len(ctx.clusters), components)
         if len(components) <= 1:
             break
 
@@ -129,18 +238,24 @@ def repair_r1_dijkstra(inst: Instance, ps: PartialState, rng: random.Random) ->
         # fontes = todos os terminais desses clusters
         sources: List[int] = []
         for ck in base_clusters:
-            sources.extend(inst.clusters[ck])
+            sources.extend(ctx.clusters[ck])
 
-        dist, parent = dijkstra_all(inst, adj, sources)
+        outside = [
+            v
+            for k in range(len(ctx.clusters))
+            if cluster_to_component[k] != base_component_id
+            for v in ctx.clusters[k]
+        ]
+        dist, parent = dijkstra_reaching(ctx, sources, [outside])
 
         # alvo = terminal mais barato que esteja fora da componente base
         best_target = None
         best_cost = 10**30
 
-        for k in range(len(inst.clusters)):
+        for k in range(len(ctx.clusters)):
             if cluster_to_component[k] == base_component_id:
                 continue
-            for v in inst.clusters[k]:
+            for v in ctx.clusters[k]:
                 if dist[v] < best_cost:
                     best_cost = dist[v]
                     best_target = v
@@ -156,14 +271,9 @@ def repair_r1_dijkstra(inst: Instance, ps: PartialState, rng: random.Random) ->
             if e not in global_set:
                 global_set.add(e)
                 global_edges.append(e)
+        instrument.count("components")
 
-    final_edges = list(local_edges) + list(global_edges)
-
-    cost = 0.0
-    for (u, v) in final_edges:
-        cost += w[(u, v)]
-
-    return Solution(instance_name=inst.name, cost=cost, edges=final_edges)
+    return _finish(ctx, ps, local_edges, global_edges, n_kept)
 
 
 # Repair R3  — MST entre componentes + expandir caminhos
@@ -213,7 +323,7 @@ def prim_mst_components(weights: List[List[float]]) -> List[Tuple[int, int]]:
     return edges
 
 
-def repair_r3_mst_components(inst: Instance, ps: PartialState, rng: random.Random) -> Solution:
+def repair_r3_mst_components(ctx: SolverContext, ps: PartialState, rng: random.Random) -> Union[Solution, TreeState]:
     """
     R3:
       1) calcula os componentes (no nível de clusters) depois do destroy
@@ -224,28 +334,24 @@ def repair_r3_mst_components(inst: Instance, ps: PartialState, rng: random.Rando
       4) faz MST entre componentes (Prim)
       5) expande cada aresta da MST em caminho real e adiciona ao global
     """
-    adj = build_adj(inst)
-    wlookup = build_weight_lookup(inst)
-
     local_edges = [_norm_edge(e) for e in ps.local_edges]
     global_edges = [_norm_edge(e) for e in ps.global_edges_remaining]
     global_set = set(global_edges)
+    n_kept = len(global_edges)
 
-    components = compute_cluster_components(inst, global_edges)
-    cluster_to_component = _build_cluster_to_component(len(inst.clusters), components)
+    components = compute_cluster_components(ctx, global_edges)
+    cluster_to_component = _build_cluster_to_component(len(ctx.clusters), components)
     c = len(components)
 
     if c <= 1:
-        final_edges = list(local_edges) + list(global_edges)
-        cost = sum(wlookup[(u, v)] for (u, v) in final_edges)
-        return Solution(instance_name=inst.name, cost=cost, edges=final_edges)
+        return _finish(ctx, ps, local_edges, global_edges, n_kept)
 
     # comp_vertices[i] = todos os terminais que pertencem aos clusters daquela componente
     comp_vertices: List[List[int]] = []
     for comp in components:
         verts = []
         for ck in comp:
-            verts.extend(inst.clusters[ck])
+            verts.extend(ctx.clusters[ck])
         comp_vertices.append(verts)
 
     # Para cada componente i:
@@ -257,7 +363,8 @@ def repair_r3_mst_components(inst: Instance, ps: PartialState, rng: random.Rando
     best_dist: List[List[float]] = [[10**30] * c for _ in range(c)]
 
     for i in range(c):
-        dist, parent = dijkstra_all(inst, adj, comp_vertices[i])
+        others = [comp_vertices[j] for j in range(c) if j != i]
+        dist, parent = dijkstra_reaching(ctx, comp_vertices[i], others)
         parents.append(parent)
         dist_lists.append(dist)
 
@@ -289,6 +396,7 @@ def repair_r3_mst_components(inst: Instance, ps: PartialState, rng: random.Rando
 
     # MST no nível de componentes
     mst_edges = prim_mst_components(weights)
+    instrument.count("components", len(mst_edges))
 
     # expandir cada aresta da MST em caminho real
     for a, b in mst_edges:
@@ -311,12 +419,10 @@ def repair_r3_mst_components(inst: Instance, ps: PartialState, rng: random.Rando
                 global_set.add(e)
                 global_edges.append(e)
 
-    final_edges = list(local_edges) + list(global_edges)
-    cost = sum(wlookup[(u, v)] for (u, v) in final_edges)
-    return Solution(instance_name=inst.name, cost=cost, edges=final_edges)
+    return _finish(ctx, ps, local_edges, global_edges, n_kept)
 
 
-def repair_r1_dijkstra_topL(inst: Instance, ps: PartialState, rng: random.Random, L: int = 5) -> Solution:
+def repair_r1_dijkstra_topL(ctx: SolverContext, ps: PartialState, rng: random.Random, L: int = 5) -> Union[Solution, TreeState]:
     """
     R1-TopL:
       igual ao R1, mas ao conectar uma componente com outra,
@@ -324,16 +430,14 @@ def repair_r1_dijkstra_topL(inst: Instance, ps: PartialState, rng: random.Random
 
     Isso gera diversidade.
     """
-    adj = build_adj(inst)
-    w = build_weight_lookup(inst)
-
     local_edges = [_norm_edge(e) for e in ps.local_edges]
     global_edges = [_norm_edge(e) for e in ps.global_edges_remaining]
     global_set = set(global_edges)
+    n_kept = len(global_edges)
 
     while True:
-        components = compute_cluster_components(inst, global_edges)
-        cluster_to_component = _build_cluster_to_component(len(inst.clusters), components)
+        components = compute_cluster_components(ctx, global_edges)
+        cluster_to_component = _build_cluster_to_component(len(ctx.clusters), components)
 
         if len(components) <= 1:
             break
@@ -348,16 +452,22 @@ def repair_r1_dijkstra_topL(inst: Instance, ps: PartialState, rng: random.Random
 
         sources: List[int] = []
         for ck in base_clusters:
-            sources.extend(inst.clusters[ck])
+            sources.extend(ctx.clusters[ck])
 
-        dist, parent = dijkstra_all(inst, adj, sources)
+        outside = [
+            v
+            for k in range(len(ctx.clusters))
+            if cluster_to_component[k] != base_component_id
+            for v in ctx.clusters[k]
+        ]
+        dist, parent = dijkstra_reaching(ctx, sources, [outside])
 
         # candidatos: todos terminais fora da componente base
         cand: List[Tuple[float, int]] = []
-        for k in range(len(inst.clusters)):
+        for k in range(len(ctx.clusters)):
             if cluster_to_component[k] == base_component_id:
                 continue
-            for v in inst.clusters[k]:
+            for v in ctx.clusters[k]:
                 cand.append((dist[v], v))
 
         cand.sort(key=lambda x: x[0])
@@ -376,10 +486,6 @@ def repair_r1_dijkstra_topL(inst: Instance, ps: PartialState, rng: random.Random
             if e not in global_set:
                 global_set.add(e)
                 global_edges.append(e)
+        instrument.count("components")
 
-    final_edges = list(local_edges) + list(global_edges)
-    cost = 0.0
-    for (u, v) in final_edges:
-        cost += w[(u, v)]
-
-    return Solution(instance_name=inst.name, cost=cost, edges=final_edges)
+    return _finish(ctx, ps, local_edges, global_edges, n_kept)
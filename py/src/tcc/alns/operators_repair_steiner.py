@@ -1,12 +1,16 @@
 from __future__ import annotations
 
 import random
-from typing import Dict, List, Tuple
+from typing import List, Union
+
+import numpy as np
 
-from tcc.instance import Instance
 from tcc.solution import Solution, TreeEdge
 
+from . import instrument
+from .context import SolverContext
 from .partial_state import PartialState
+from .tree_state import TreeState
 from .operators_repair import repair_r3_mst_components
 
 
@@ -14,33 +18,7 @@ def _norm_edge(u: int, v: int) -> TreeEdge:
     return (u, v) if u < v else (v, u)
 
 
-def _weight_map(instance: Instance) -> Dict[Tuple[int, int], float]:
-    """
-    Cache simples de pesos para lookup O(1).
-    """
-    wm = getattr(instance, "_wm_cache", None)
-    if wm is not None:
-        return wm
-
-    wm2: Dict[Tuple[int, int], float] = {}
-    for (u, v, w) in instance.edges:
-        a, b = (u, v) if u < v else (v, u)
-        wm2[(a, b)] = float(w)
-
-    setattr(instance, "_wm_cache", wm2)
-    return wm2
-
-
-def _cost(instance: Instance, edges: List[TreeEdge]) -> float:
-    wm = _weight_map(instance)
-    total = 0.0
-    for (u, v) in edges:
-        a, b = (u, v) if u < v else (v, u)
-        total += wm[(a, b)]
-    return total
-
-
-def repair_r4_steiner_hub(instance: Instance, ps: PartialState, rng: random.Random, max_candidates: int = 25) -> Solution:
+def repair_r4_steiner_hub(ctx: SolverContext, ps: PartialState, rng: random.Random, max_candidates: int = 25) -> Union[Solution, TreeState]:
     """
     R4 (Steiner Hub):
     - Se temos C componentes de clusters, escolhemos 1 vértice Steiner s
@@ -48,62 +26,88 @@ def repair_r4_steiner_hub(instance: Instance, ps: PartialState, rng: random.Rand
     - Como s é novo, adicionamos C arestas e 1 vértice => volta a ser árvore (sem ciclo)
 
     Observação: se já estiver 1 componente, só retorna a solução reconstruída.
+    Sem candidato Steiner que tenha aresta para todas as componentes (grafo
+    não-completo), cai no R3.
+    Com ps.state (modo no lugar), insere as C arestas no TreeState e devolve ele.
     """
     # se já está tudo conectado no nível de clusters, não inventa coisa
     if len(ps.components) <= 1:
+        if ps.state is not None:
+            return ps.state
         edges = [_norm_edge(*e) for e in (ps.local_edges + ps.global_edges_remaining)]
-        return Solution(instance_name=instance.name, cost=_cost(instance, edges), edges=edges)
+        return Solution(instance_name=ctx.name, cost=ctx.weights.total(edges), edges=edges)
 
-    used_vertices = set()
-    for (u, v) in (ps.local_edges + ps.global_edges_remaining):
-        used_vertices.add(u)
-        used_vertices.add(v)
+    if ps.state is not None:
+        adj = ps.state.adj
+        used_vertices = {v for v in ctx.steiner if adj[v]}
+    else:
+        used_vertices = set()
+        for (u, v) in (ps.local_edges + ps.global_edges_remaining):
+            used_vertices.add(u)
+            used_vertices.add(v)
+
+    # pré-lista: terminais por componente
+    comp_terminals: List[List[int]] = []
+    for comp in ps.components:
+        terminals: List[int] = []
+        for cid in comp:
+            terminals.extend(ctx.clusters[cid])
+        comp_terminals.append(terminals)
 
-    # candidatos Steiner = vertices não-requeridos (-1) e ainda não usados
-    steiners = [v for v in range(instance.n) if instance.cluster_of[v] == -1 and v not in used_vertices]
+    # candidatos Steiner = vertices não-requeridos (-1) e ainda não usados;
+    # com listas KNN, só os vizinhos próximos de algum terminal das componentes
+    steiners: List[int] = []
+    if ctx.knn is not None:
+        near = ctx.knn.candidates([t for ts in comp_terminals for t in ts]).tolist()
+        steiners = [v for v in near if ctx.cluster_of[v] == -1 and v not in used_vertices]
+    if not steiners:
+        steiners = [v for v in ctx.steiner if v not in used_vertices]
     if not steiners:
         # fallback: reconecta “do jeito antigo”
-        return repair_r3_mst_components(instance, ps, rng)
+        return repair_r3_mst_components(ctx, ps, rng)
 
     cand = rng.sample(steiners, min(max_candidates, len(steiners)))
-    wm = _weight_map(instance)
+    instrument.count("steiner_candidates", len(cand))
+    wm = ctx.weights
 
     best_s = None
     best_sum = float("inf")
     best_attach: List[int] = []
 
-    # pré-lista: terminais por componente
-    comp_terminals: List[List[int]] = []
-    for comp in ps.components:
-        terminals: List[int] = []
-        for cid in comp:
-            terminals.extend(instance.clusters[cid])
-        comp_terminals.append(terminals)
+    # todos os terminais num array só; cada componente é uma fatia [off[c], off[c+1])
+    all_terms = np.asarray([t for ts in comp_terminals for t in ts], dtype=np.intp)
+    off = np.cumsum([0] + [len(ts) for ts in comp_terminals]).tolist()
 
     for s in cand:
         attach: List[int] = []
         total = 0.0
-        for terminals in comp_terminals:
-            # escolhe o terminal mais próximo de s
-            best_t = None
-            best_w = float("inf")
-            for t in terminals:
-                a, b = (s, t) if s < t else (t, s)
-                w = wm[(a, b)]
-                if w < best_w:
-                    best_w = w
-                    best_t = t
-            attach.append(best_t)  # type: ignore
+        row = wm.row(s, all_terms)  # w(s, terminais) de uma vez, sem ler a linha toda
+        for c, terminals in enumerate(comp_terminals):
+            # escolhe o terminal mais próximo de s (empate -> primeiro da lista)
+            ws = row[off[c]:off[c + 1]]
+            i = int(np.argmin(ws))
+            best_w = float(ws[i])
+            attach.append(terminals[i])
             total += best_w
 
+        # em grafo não-completo s pode não ter aresta para alguma componente (peso inf)
         if total < best_sum:
             best_sum = total
             best_s = s
             best_attach = attach
 
-    assert best_s is not None
+    if best_s is None:
+        # nenhum hub liga todas as componentes por arestas diretas
+        return repair_r3_mst_components(ctx, ps, rng)
 
     new_edges = [_norm_edge(best_s, t) for t in best_attach]
+    instrument.count("components", len(new_edges) - 1)
+    instrument.count("added_edges", len(new_edges))
+    if ps.state is not None:
+        for (u, v) in new_edges:
+            ps.state.add_edge(u, v)
+        return ps.state
+
     edges = [_norm_edge(*e) for e in (ps.local_edges + ps.global_edges_remaining)] + new_edges
 
-    return Solution(instance_name=instance.name, cost=_cost(instance, edges), edges=edges)
+    return Solution(instance_name=ctx.name, cost=ctx.weights.total(edges), edges=edges)
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import math
+import multiprocessing as mp
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tcc.instance_cache import load_instance
+from tcc.solution import Solution
+
+from .alns_sa import run_alns_sa
+from .context import SolverContext
+
+Operator = Tuple[str, Callable[..., Any]]
+
+
+@dataclass
+class ParallelJob:
+    """
+    Tudo que um worker precisa para rodar run_alns_sa sozinho.
+
+    Vai por pickle para cada processo: as funções (build_initial, cost_fn,
+    operadores, ...) têm de ser de nível de módulo ou functools.partial delas,
+    não closures/lambdas. Cada worker abre a instância pelo cache
+    (load_instance, memmap) e monta o próprio SolverContext.
+
+    `run_kwargs` vai direto para run_alns_sa (time_limit_s, max_iters, t0,
+    alpha, incremental_feasibility, adaptive, termination, ...). Cada worker
+    recebe a própria cópia do `termination` e instala catch_signals() dele:
+    um SIGINT/SIGTERM que chegue ao worker (Ctrl-C manda para o grupo todo)
+    encerra aquela busca com o best que ela tiver. checkpoint_path,
+    resume_from e profile são por busca e não se aplicam aqui.
+    """
+
+    instance_path: Path
+    build_initial: Callable[[Any], Any]
+    cost_fn: Callable[[Any], float]
+    feasible_fn: Callable[[Any, Any], bool]
+    num_edges_fn: Callable[[Any], int]
+    destroy_ops: List[Operator]
+    repair_ops: List[Operator]
+    log_dir: Path
+    cache_dir: Optional[Path] = None
+    knn: int = 0
+    bks_cost: Optional[float] = None
+    run_kwargs: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class WorkerResult:
+    worker: int
+    seed: int
+    best: Solution
+    best_cost: float
+    iters: int
+    accepted: int
+    elapsed_s: float
+    log_path: Optional[str]  # None com o backend "none" (nada gravado)
+    migrations: int = 0
+    stop_reason: Optional[str] = None  # Termination.reason da busca do worker
+
+
+@dataclass
+class ParallelResult:
+    best: Solution
+    best_worker: int
+    workers: List[WorkerResult]
+
+
+def worker_seeds(seed: int, workers: int) -> List[int]:
+    """Sementes independentes e reprodutíveis, uma por worker (SeedSequence.spawn)."""
+    return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(workers)]
+
+
+# ---------- estado por processo ----------
+#
+# _SHARED_BEST é um double em memória compartilhada (RawValue) com o menor
+# custo publicado por qualquer worker. Leitura sem lock (a cada iteração);
+# escrita com _SHARED_LOCK, só quando o best do worker melhora.
+
+_SHARED_BEST = None
+_SHARED_LOCK = None
+
+
+def _init_worker(shared_best, lock) -> None:
+    global _SHARED_BEST, _SHARED_LOCK
+    _SHARED_BEST = shared_best
+    _SHARED_LOCK = lock
+
+
+def _publish_best(cost: float) -> None:
+    """Baixa o custo compartilhado se `cost` for menor (só o custo: a solução fica no worker)."""
+    with _SHARED_LOCK:
+        if cost < _SHARED_BEST.value:
+            _SHARED_BEST.value = cost
+
+
+def _run_worker(job: ParallelJob, worker: int, seed: int, target_cost: Optional[float], island: Any = None) -> WorkerResult:
+    """Uma busca completa. `island` (opcional) dá on_best/migrate do modelo de ilhas."""
+    inst = load_instance(job.instance_path, cache_dir=job.cache_dir, trusted=True)
+    if job.knn and job.knn > 0:
+        inst.build_candidates(job.knn)
+    ctx = SolverContext.from_instance(inst)
+
+    instance_id = Path(job.instance_path).stem
+    log_options = job.run_kwargs.get("log_options")
+    suffix = ".npz" if log_options is not None and log_options.backend == "npz" else ".csv"
+    log_path = Path(job.log_dir) / f"{instance_id}_seed{seed}_w{worker}{suffix}"
+
+    should_stop = None
+    if target_cost is not None:
+        shared = _SHARED_BEST
+        should_stop = lambda: shared.value <= target_cost
+
+    term = job.run_kwargs.get("termination")
+    catch = term is not None and threading.current_thread() is threading.main_thread()
+    stats: Dict[str, Any] = {}
+    with term.catch_signals() if catch else nullcontext():
+        best = run_alns_sa(
+            instance=inst,
+            instance_id=instance_id,
+            build_initial=job.build_initial,
+            cost_fn=job.cost_fn,
+            feasible_fn=job.feasible_fn,
+            num_edges_fn=job.num_edges_fn,
+            destroy_ops=job.destroy_ops,
+            repair_ops=job.repair_ops,
+            log_path=str(log_path),
+            bks_cost=job.bks_cost,
+            seed=seed,
+            ctx=ctx,
+            on_best=(lambda cost, sol: _publish_best(cost)) if island is None else island.on_best,
+            should_stop=should_stop,
+            stats=stats,
+            migrate=None if island is None else island.migrate,
+            **job.run_kwargs,
+        )
+    return WorkerResult(
+        worker=worker,
+        seed=seed,
+        best=best,
+        best_cost=float(stats["best_cost"]),
+        iters=int(stats["iters"]),
+        accepted=int(stats["accepted"]),
+        elapsed_s=float(stats["elapsed_s"]),
+        log_path=None if log_options is not None and log_options.backend == "none" else str(log_path),
+        migrations=int(stats["migrations"]),
+        stop_reason=stats.get("stop_reason"),
+    )
+
+
+def run_alns_parallel(
+    job: ParallelJob,
+    workers: int,
+    seed: int = 0,
+    target_cost: Optional[float] = None,
+) -> ParallelResult:
+    """
+    Multi-start: `workers` buscas run_alns_sa independentes, uma por processo.
+
+    - sementes: worker_seeds(seed, workers) -> mesma `seed` dá as mesmas
+      buscas, com qualquer número de processos;
+    - o menor custo encontrado fica num RawValue compartilhado; com
+      `target_cost`, todo worker para assim que alguém chega nele;
+    - log de cada worker em log_dir/<instancia>_seed<semente>_w<i>.csv (.npz
+      com o backend npz; nenhum, e WorkerResult.log_path None, com "none").
+
+    Devolve o melhor best (empate: menor índice de worker) e as estatísticas
+    de cada worker. Com workers=1 roda no próprio processo.
+    """
+    if workers < 1:
+        raise ValueError(f"workers deve ser >= 1 (recebido {workers})")
+    Path(job.log_dir).mkdir(parents=True, exist_ok=True)
+
+    seeds = worker_seeds(seed, workers)
+    shared_best = mp.RawValue("d", math.inf)
+    lock = mp.Lock()
+
+    if workers == 1:
+        _init_worker(shared_best, lock)
+        results = [_run_worker(job, 0, seeds[0], target_cost)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared_best, lock)) as pool:
+            futures = [pool.submit(_run_worker, job, i, s, target_cost) for i, s in enumerate(seeds)]
+            results = [f.result() for f in futures]
+
+    winner = min(results, key=lambda r: (r.best_cost, r.worker))
+    return ParallelResult(best=winner.best, best_worker=winner.worker, workers=results)
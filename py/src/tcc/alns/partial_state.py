@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 from tcc.solution import Solution, TreeEdge
 
+if TYPE_CHECKING:
+    from .tree_state import TreeState
+
 
 @dataclass
 class PartialState:
@@ -41,6 +44,10 @@ class PartialState:
     # metadados livres (nome do operador, k, seed, etc.)
     meta: Dict[str, Any] = field(default_factory=dict)
 
+    # modo no lugar: o TreeState que o destroy já alterou; o repair insere
+    # as arestas novas nele e o devolve (None = modo antigo, com Solution)
+    state: Optional["TreeState"] = None
+
     @property
     def num_components(self) -> int:
         return len(self.components)
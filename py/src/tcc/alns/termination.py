@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import math
+import signal
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional, Sequence
+
+# motivos de parada (Termination.reason / stats["stop_reason"])
+MAX_ITERS = "max_iters"
+TIME_LIMIT = "time_limit"
+STAGNATION = "stagnation"
+TARGET = "target"
+CANCELLED = "cancelled"
+
+
+@dataclass
+class Termination:
+    """
+    Critérios de parada da busca; o primeiro que disparar encerra:
+
+      - max_iters: número de iterações
+      - time_limit_s: prazo de parede, fixado em start() como um instante
+        de time.monotonic() (checar é uma chamada ao relógio e uma comparação)
+      - stagnation: K iterações seguidas sem melhorar o best
+      - target_cost: best <= alvo (ex.: BKS de bks_type1_small.csv ou um
+        limite inferior); para na hora em vez de gastar o resto do orçamento
+      - cancel: qualquer objeto com is_set() (threading.Event,
+        multiprocessing.Event); ver também catch_signals()
+
+    Uso: term.start(); a cada iteração term.update(it, best_cost) e
+    `if term.should_stop(it): break`. O motivo fica em `reason`.
+    """
+
+    max_iters: Optional[int] = None
+    time_limit_s: Optional[float] = None
+    stagnation: Optional[int] = None
+    target_cost: Optional[float] = None
+    cancel: Any = None
+    reason: Optional[str] = field(default=None, init=False)
+    _deadline: float = field(default=math.inf, init=False, repr=False)
+    _best: float = field(default=math.inf, init=False, repr=False)
+    _last_improve: int = field(default=0, init=False, repr=False)
+    _signalled: bool = field(default=False, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.stagnation is not None and self.stagnation < 1:
+            raise ValueError(f"stagnation deve ser >= 1 (recebido {self.stagnation})")
+
+    def start(self, elapsed_s: float = 0.0, it: int = 0, best_cost: float = math.inf) -> None:
+        """
+        Fixa o prazo (descontando `elapsed_s` já gasto, na retomada) e o best
+        de partida; `it` é a iteração da última melhora dele (na retomada,
+        a do checkpoint, para a estagnação continuar de onde estava).
+        """
+        self.reason = None
+        self._deadline = math.inf if self.time_limit_s is None else time.monotonic() + self.time_limit_s - elapsed_s
+        self._best = best_cost
+        self._last_improve = it
+
+    @property
+    def last_improve(self) -> int:
+        """Iteração da última melhora do best (base da estagnação; vai no checkpoint)."""
+        return self._last_improve
+
+    def update(self, it: int, best_cost: float) -> None:
+        if best_cost < self._best:
+            self._best = best_cost
+            self._last_improve = it
+
+    def should_stop(self, it: int) -> bool:
+        if self.max_iters is not None and it >= self.max_iters:
+            self.reason = MAX_ITERS
+        elif self.target_cost is not None and self._best <= self.target_cost:
+            self.reason = TARGET
+        elif self.stagnation is not None and it - self._last_improve >= self.stagnation:
+            self.reason = STAGNATION
+        elif self._signalled or (self.cancel is not None and self.cancel.is_set()):
+            self.reason = CANCELLED
+        elif time.monotonic() >= self._deadline:
+            self.reason = TIME_LIMIT
+        else:
+            return False
+        return True
+
+    def cancel_now(self) -> None:
+        self._signalled = True
+
+    def _on_signal(self, signum, frame) -> None:
+        if self._signalled:
+            raise KeyboardInterrupt  # segundo sinal: interrompe de vez
+        self._signalled = True
+
+    @contextmanager
+    def catch_signals(self, signums: Sequence[int] = (signal.SIGINT, signal.SIGTERM)) -> Iterator["Termination"]:
+        """
+        Dentro do bloco, SIGINT/SIGTERM pedem parada limpa (a busca termina
+        a iteração corrente e devolve o best); um segundo sinal interrompe.
+        Só funciona na thread principal.
+        """
+        old = {s: signal.signal(s, self._on_signal) for s in signums}
+        try:
+            yield self
+        finally:
+            for s, h in old.items():
+                signal.signal(s, h)
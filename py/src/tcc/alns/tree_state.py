@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+from operator import itemgetter
+from typing import Dict, List, Set, Tuple
+
+from tcc.solution import Solution, TreeEdge
+
+from .context import SolverContext
+
+
+def _norm_edge(u: int, v: int) -> TreeEdge:
+    return (u, v) if u < v else (v, u)
+
+
+class TreeState:
+    """
+    Solução mutável do ALNS, alterada no lugar por destroy/repair.
+
+    Guarda:
+      - adj[u]: conjunto de vizinhos de u na árvore (deg[u] = len(adj[u]))
+      - arestas locais/globais separadas (mesma definição de
+        split_local_global_edges), cada uma com um número de sequência que
+        fixa a ordem das listas (igual à ordem de uma Solution equivalente).
+        Os dicts ficam na ordem de sequência; só o rollback (que devolve
+        arestas removidas com a sequência antiga) desarruma, e a próxima
+        consulta reordena uma vez (quase ordenado: o timsort é ~linear)
+      - local_count[k]: arestas locais do cluster k (a árvore local está
+        inteira quando local_count[k] == |C_k| - 1)
+      - cost: custo corrente, atualizado a cada inserção/remoção
+      - undo log: cada add/remove aplicado, pra desfazer um candidato rejeitado
+
+    Uso típico numa iteração:
+
+        mark = state.checkpoint()
+        ... destroy/repair mexem no state ...
+        if aceito: state.commit()
+        else:      state.rollback(mark)
+
+    Tem `edges` e `cost` como a Solution, então cost_fn / feasible_fn /
+    num_edges_fn continuam funcionando.
+
+    Custos: add_edge / remove_edge / cost / num_edges são O(1), rollback e
+    commit O(tamanho do delta). local_edges(), global_edges() e edges
+    copiam as listas: O(|árvore|). Os destroy (operators_destroy) chamam
+    essas cópias e refazem compute_cluster_components sobre as globais
+    restantes a cada iteração, então o passo destroy continua O(n +
+    |árvore|) mesmo no lugar; o ganho do TreeState é não copiar nem
+    reverificar a solução inteira para aceitar / rejeitar o candidato.
+    """
+
+    def __init__(self, ctx: SolverContext, instance_name: str) -> None:
+        self.ctx = ctx
+        self.instance_name = instance_name
+        self.adj: List[Set[int]] = [set() for _ in range(ctx.n)]
+        self.local_count: List[int] = [0] * ctx.num_clusters
+        self.cost: float = 0.0
+        self._local: Dict[TreeEdge, int] = {}
+        self._global: Dict[TreeEdge, int] = {}
+        self._next_seq = 0
+        self._unsorted = False  # algum rollback reinseriu aresta fora da ordem de sequência
+        self._log: List[Tuple[str, TreeEdge, int]] = []
+
+    @classmethod
+    def from_solution(cls, ctx: SolverContext, sol: Solution) -> "TreeState":
+        state = cls(ctx, sol.instance_name)
+        state.reset(sol)
+        return state
+
+    def reset(self, sol: Solution) -> None:
+        """Recarrega o estado a partir de uma Solution (zera o undo log)."""
+        for s in self.adj:
+            s.clear()
+        self.local_count = [0] * self.ctx.num_clusters
+        self.cost = 0.0
+        self._local.clear()
+        self._global.clear()
+        self._next_seq = 0
+        self._unsorted = False
+        for (u, v) in sol.edges:
+            self.add_edge(u, v)
+        self._log.clear()
+
+    # ---------- consultas ----------
+
+    def is_local(self, u: int, v: int) -> bool:
+        cu = self.ctx.cluster_of[u]
+        return cu != -1 and cu == self.ctx.cluster_of[v]
+
+    def has_edge(self, u: int, v: int) -> bool:
+        return v in self.adj[u]
+
+    def degree(self, u: int) -> int:
+        return len(self.adj[u])
+
+    def local_tree_complete(self, k: int) -> bool:
+        return self.local_count[k] == len(self.ctx.clusters[k]) - 1
+
+    @property
+    def num_edges(self) -> int:
+        return len(self._local) + len(self._global)
+
+    def _restore_order(self) -> None:
+        self._local = dict(sorted(self._local.items(), key=itemgetter(1)))
+        self._global = dict(sorted(self._global.items(), key=itemgetter(1)))
+        self._unsorted = False
+
+    def local_edges(self) -> List[TreeEdge]:
+        if self._unsorted:
+            self._restore_order()
+        return list(self._local)
+
+    def global_edges(self) -> List[TreeEdge]:
+        if self._unsorted:
+            self._restore_order()
+        return list(self._global)
+
+    def global_edges_at(self, vertices) -> List[TreeEdge]:
+        """Arestas globais incidentes a `vertices`, na ordem de global_edges()."""
+        found = set()
+        for a in vertices:
+            for b in self.adj[a]:
+                e = _norm_edge(a, b)
+                if e in self._global:
+                    found.add(e)
+        return sorted(found, key=self._global.__getitem__)
+
+    @property
+    def edges(self) -> List[TreeEdge]:
+        """Arestas na ordem de uma Solution: locais, depois globais."""
+        return self.local_edges() + self.global_edges()
+
+    def to_solution(self) -> Solution:
+        """Cópia imutável (para guardar o best / gravar em arquivo)."""
+        return Solution(instance_name=self.instance_name, cost=self.cost, edges=self.edges)
+
+    # ---------- alterações ----------
+
+    def add_edge(self, u: int, v: int) -> bool:
+        """Insere (u, v). Devolve False (e não faz nada) se a aresta já existe."""
+        e = _norm_edge(u, v)
+        if e[1] in self.adj[e[0]]:
+            return False
+        self._insert(e, self._next_seq)
+        self._next_seq += 1
+        self._log.append(("add", e, -1))
+        return True
+
+    def remove_edge(self, u: int, v: int) -> bool:
+        """Remove (u, v). Devolve False se a aresta não existe."""
+        e = _norm_edge(u, v)
+        if e[1] not in self.adj[e[0]]:
+            return False
+        seq = self._delete(e)
+        self._log.append(("rem", e, seq))
+        return True
+
+    def _insert(self, e: TreeEdge, seq: int) -> None:
+        a, b = e
+        self.adj[a].add(b)
+        self.adj[b].add(a)
+        if self.is_local(a, b):
+            self._local[e] = seq
+            self.local_count[self.ctx.cluster_of[a]] += 1
+        else:
+            self._global[e] = seq
+        self.cost += float(self.ctx.weights[e])
+
+    def _delete(self, e: TreeEdge) -> int:
+        a, b = e
+        self.adj[a].discard(b)
+        self.adj[b].discard(a)
+        if e in self._local:
+            seq = self._local.pop(e)
+            self.local_count[self.ctx.cluster_of[a]] -= 1
+        else:
+            seq = self._global.pop(e)
+        self.cost -= float(self.ctx.weights[e])
+        return seq
+
+    # ---------- undo log ----------
+
+    def checkpoint(self) -> int:
+        return len(self._log)
+
+    def rollback(self, mark: int) -> None:
+        """Desfaz, em ordem inversa, tudo que foi aplicado depois de `mark`."""
+        while len(self._log) > mark:
+            op, e, seq = self._log.pop()
+            if op == "add":
+                self._delete(e)
+            else:
+                self._insert(e, seq)
+                self._unsorted = True
+
+    def commit(self) -> None:
+        """Aceita as alterações: esquece o undo log."""
+        self._log.clear()
+
+    def changes_since(self, mark: int) -> Tuple[List[TreeEdge], List[TreeEdge]]:
+        """(removidas, inseridas) desde `mark`, já compensando add/remove da mesma aresta."""
+        removed: Dict[TreeEdge, None] = {}
+        added: Dict[TreeEdge, None] = {}
+        for op, e, _ in self._log[mark:]:
+            if op == "add":
+                if e in removed:
+                    del removed[e]
+                else:
+                    added[e] = None
+            else:
+                if e in added:
+                    del added[e]
+                else:
+                    removed[e] = None
+        return list(removed), list(added)
@@ -1,12 +1,52 @@
 from __future__ import annotations
 
+from collections.abc import Sequence
 from dataclasses import dataclass
-from typing import List, Tuple, Set
+from functools import cached_property
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .knn import DEFAULT_K, KNNGraph, build_knn
+from .weights import CSRGraph, WeightOracle, weights_from_instance_fields
 
 
 Edge = Tuple[int, int, float]
 
 
+class EdgeView(Sequence):
+    """
+    Visão "lista de arestas" (u, v, w), u < v, sobre um oráculo de pesos
+    (matriz densa, coordenadas ou CSR).
+
+    Serve para o código legado que itera `inst.edges`: iterar gera as tuplas
+    sob demanda, linha a linha, sem guardar n(n-1)/2 tuplas na memória.
+    Acesso por índice materializa a lista completa (uma vez só).
+    """
+
+    def __init__(self, weights: WeightOracle) -> None:
+        self._weights = weights
+        self._n = weights.n
+        self._list: Optional[List[Edge]] = None
+
+    def __len__(self) -> int:
+        return self._weights.num_edges
+
+    def __iter__(self) -> Iterator[Edge]:
+        if self._list is not None:
+            yield from self._list
+            return
+        yield from self._weights.iter_edges()
+
+    def __getitem__(self, idx):
+        if self._list is None:
+            self._list = list(iter(self))
+        return self._list[idx]
+
+    def __repr__(self) -> str:
+        return f"EdgeView(n={self._n}, m={len(self)})"
+
+
 @dataclass
 class Instance:
     """
@@ -18,11 +58,45 @@ class Instance:
     name: str                  # nome da instância, ex: "EUC_Type1_Small/10berlin52"
     n: int                     # número de vértices
     m: int                     # número de arestas
-    edges: List[Edge]          # lista de arestas (u, v, w), 0-based
+    edges: Optional[Sequence]  # lista de arestas (u, v, w), 0-based (ou EdgeView)
     terminals: List[int]       # lista de vértices requeridos (conjunto R)
     clusters: List[List[int]]  # clusters R_0, ..., R_{h-1}
     cluster_of: List[int]      # tamanho n; -1 para não-requeridos
     is_euclidean: bool = False # flag opcional
+    dist: Optional[np.ndarray] = None  # matriz n x n de pesos (float64/int32), opcional
+    coords: Optional[np.ndarray] = None  # coordenadas n x 2 (modo implícito), opcional
+    edge_weight_type: Optional[str] = None  # regra TSPLIB p/ coords (EUC_2D, CEIL_2D, ATT)
+    csr: Optional[CSRGraph] = None  # grafo esparso (pesos explícitos), opcional
+    knn: Optional[KNNGraph] = None  # listas de vizinhos candidatos (ver build_candidates)
+
+    def __post_init__(self) -> None:
+        # Com matriz densa, CSR ou coordenadas, `edges` vira uma visão preguiçosa.
+        if self.edges is None:
+            if self.dist is None and self.coords is None and self.csr is None:
+                raise ValueError("Instance precisa de edges, dist, csr ou coords")
+            self.edges = EdgeView(self.weights)
+
+    @cached_property
+    def weights(self) -> WeightOracle:
+        """
+        Oráculo de pesos w(u, v) / w(u, V). Matriz densa se houver; senão CSR;
+        senão coordenadas (calculado sob demanda); senão a lista de arestas.
+        """
+        return weights_from_instance_fields(
+            self.n, self.dist, self.coords, self.edge_weight_type, self.edges, self.csr
+        )
+
+    def build_candidates(self, k: int = DEFAULT_K) -> Optional[KNNGraph]:
+        """
+        Monta (uma vez) as listas dos k vizinhos mais próximos e guarda em
+        `self.knn`. Os reparos passam a usar esse grafo esparso de candidatos
+        (com fallback pro grafo completo). Em grafo esparso não faz nada.
+        """
+        if not self.weights.complete:
+            return None
+        if self.knn is None or self.knn.k != min(k, self.n - 1):
+            self.knn = build_knn(self.weights, k, coords=self.coords)
+        return self.knn
 
     def validate(self) -> None:
         """
@@ -37,13 +111,14 @@ class Instance:
             raise ValueError(f"m={self.m} mas len(edges)={len(self.edges)}")
 
         # 2) limites das arestas e pesos
-        for (u, v, w) in self.edges:
-            if not (0 <= u < self.n and 0 <= v < self.n):
-                raise ValueError(
-                    f"Aresta ({u}, {v}) fora do range [0, {self.n - 1}]"
-                )
-            if w <= 0:
-                raise ValueError(f"Peso não-positivo na aresta ({u}, {v}): w={w}")
+        if self.dist is not None:
+            self._validate_dist()
+        elif self.csr is not None:
+            self._validate_csr()
+        elif self.coords is not None:
+            self._validate_coords()
+        else:
+            self._validate_edge_list()
 
         # 3) tamanho de cluster_of
         if len(self.cluster_of) != self.n:
@@ -52,42 +127,174 @@ class Instance:
                 f"mas tem len={len(self.cluster_of)}"
             )
 
-        # 4) montar união dos clusters e checar disjunção
-        union_clusters: Set[int] = set()
-        for k, Ck in enumerate(self.clusters):
-            if not Ck:
-                raise ValueError(f"Cluster {k} está vazio")
-
-            for v in Ck:
-                if not (0 <= v < self.n):
-                    raise ValueError(f"Vértice {v} inválido no cluster {k}")
-
-                if v in union_clusters:
-                    raise ValueError(
-                        f"Vértice {v} aparece em mais de um cluster "
-                        f"(violação de disjunção)"
-                    )
-                union_clusters.add(v)
-
-                # coerência com cluster_of
-                if self.cluster_of[v] != k:
-                    raise ValueError(
-                        f"cluster_of[{v}]={self.cluster_of[v]}, "
-                        f"mas esperava {k} (cluster {k})"
-                    )
-
-        # 5) terminals bate com união dos clusters
-        if set(self.terminals) != union_clusters:
+        # 4)-6) clusters, terminals e cluster_of, tudo em arrays
+        self._validate_clusters()
+
+    def _validate_edge_list(self) -> None:
+        """Lista (u, v, w) explícita: índices no range e pesos positivos, em bloco."""
+        if self.m == 0:
+            return
+        E = np.asarray(self.edges, dtype=np.float64).reshape(-1, 3)
+        u, v, w = E[:, 0], E[:, 1], E[:, 2]
+
+        bad = np.flatnonzero((u < 0) | (u >= self.n) | (v < 0) | (v >= self.n))
+        if len(bad):
+            a, b, _ = self.edges[int(bad[0])]
+            raise ValueError(f"Aresta ({a}, {b}) fora do range [0, {self.n - 1}]")
+
+        bad = np.flatnonzero(w <= 0)
+        if len(bad):
+            a, b, c = self.edges[int(bad[0])]
+            raise ValueError(f"Peso não-positivo na aresta ({a}, {b}): w={c}")
+
+    def _validate_clusters(self) -> None:
+        """
+        Checagens de cluster em O(n + |R|) com NumPy:
+          - nenhum cluster vazio, vértices no range;
+          - disjunção (bincount dos vértices dos clusters);
+          - cluster_of coerente com os clusters e -1 fora deles;
+          - terminals == união dos clusters.
+
+        As mensagens de erro são as mesmas da versão laço-a-laço
+        (o primeiro problema encontrado na ordem dos clusters).
+        """
+        n = self.n
+        sizes = np.fromiter((len(c) for c in self.clusters), dtype=np.int64, count=len(self.clusters))
+        empty = np.flatnonzero(sizes == 0)
+        if len(empty):
+            raise ValueError(f"Cluster {int(empty[0])} está vazio")
+
+        total = int(sizes.sum())
+        idx = np.fromiter((v for c in self.clusters for v in c), dtype=np.int64, count=total)
+        label = np.repeat(np.arange(len(sizes), dtype=np.int64), sizes)
+
+        out = np.flatnonzero((idx < 0) | (idx >= n))
+        if len(out):
+            i = int(out[0])
+            raise ValueError(f"Vértice {int(idx[i])} inválido no cluster {int(label[i])}")
+
+        cof = np.asarray(self.cluster_of, dtype=np.int64)
+
+        # disjunção (2a ocorrência de um vértice) e coerência com cluster_of:
+        # vale o problema que aparecer primeiro na ordem dos clusters
+        counts = np.bincount(idx, minlength=n)
+        dup_pos = bad_pos = total
+        if (counts > 1).any():
+            _, first = np.unique(idx, return_index=True)
+            repeated = np.ones(total, dtype=bool)
+            repeated[first] = False
+            dup_pos = int(np.argmax(repeated))
+        wrong = np.flatnonzero(cof[idx] != label)
+        if len(wrong):
+            bad_pos = int(wrong[0])
+        if dup_pos < total and dup_pos <= bad_pos:
+            raise ValueError(
+                f"Vértice {int(idx[dup_pos])} aparece em mais de um cluster "
+                f"(violação de disjunção)"
+            )
+        if bad_pos < total:
+            v, k = int(idx[bad_pos]), int(label[bad_pos])
+            raise ValueError(f"cluster_of[{v}]={int(cof[v])}, mas esperava {k} (cluster {k})")
+
+        # terminals bate com a união dos clusters
+        in_union = counts > 0
+        terms = np.asarray(self.terminals, dtype=np.int64)
+        t_ok = (terms >= 0) & (terms < n)
+        t_mask = np.zeros(n, dtype=bool)
+        t_mask[terms[t_ok]] = True
+        if not t_ok.all() or not np.array_equal(t_mask, in_union):
             raise ValueError(
                 "terminals difere da união dos clusters: "
-                f"terminals={sorted(self.terminals)}, "
-                f"union={sorted(union_clusters)}"
+                f"terminals={sorted(set(self.terminals))}, "
+                f"union={np.flatnonzero(in_union).tolist()}"
+            )
+
+        # não-requeridos têm cluster_of = -1
+        bad = np.flatnonzero(~in_union & (cof != -1))
+        if len(bad):
+            v = int(bad[0])
+            raise ValueError(
+                f"Vértice {v} não é requerido, mas cluster_of[{v}]="
+                f"{int(cof[v])} (esperado -1)"
             )
 
-        # 6) não-requeridos têm cluster_of = -1
-        for v in range(self.n):
-            if v not in union_clusters and self.cluster_of[v] != -1:
-                raise ValueError(
-                    f"Vértice {v} não é requerido, mas cluster_of[{v}]="
-                    f"{self.cluster_of[v]} (esperado -1)"
-                )
+    def _validate_dist(self) -> None:
+        """Checagem vetorizada da matriz densa: forma n x n e pesos positivos fora da diagonal."""
+        D = self.dist
+        if D.shape != (self.n, self.n):
+            raise ValueError(f"dist deve ter forma ({self.n}, {self.n}), mas tem {D.shape}")
+
+        bad = D <= 0
+        np.fill_diagonal(bad, False)
+        if bad.any():
+            u, v = (int(x) for x in np.argwhere(bad)[0])
+            raise ValueError(f"Peso não-positivo na aresta ({u}, {v}): w={D[u, v]}")
+
+    def _validate_csr(self) -> None:
+        """Checagem vetorizada do CSR: tamanhos, índices no range e pesos positivos."""
+        g = self.csr
+        if g.n != self.n:
+            raise ValueError(f"csr.indptr deve ter tamanho n+1={self.n + 1}, mas tem {g.n + 1}")
+        if len(g.indices) != len(g.data) or int(g.indptr[-1]) != len(g.indices):
+            raise ValueError("csr inconsistente: indptr/indices/data com tamanhos diferentes")
+        if len(g.indices):
+            if int(g.indices.min()) < 0 or int(g.indices.max()) >= self.n:
+                raise ValueError(f"csr tem vértice fora do range [0, {self.n - 1}]")
+            bad = np.flatnonzero(np.asarray(g.data) <= 0)
+            if len(bad):
+                i = int(bad[0])
+                u = int(np.searchsorted(g.indptr, i, side="right")) - 1
+                raise ValueError(f"Peso não-positivo na aresta ({u}, {int(g.indices[i])}): w={g.data[i]}")
+
+    def _validate_coords(self) -> None:
+        """
+        Modo implícito: coordenadas n x 2 finitas e nenhum par com peso <= 0.
+
+        Nas regras TSPLIB o peso só zera para pontos a distância < 0.5
+        (EUC_2D arredonda; CEIL_2D/ATT só com pontos coincidentes). Então basta
+        olhar pares em células vizinhas de uma grade de lado 0.5: O(n log n)
+        em vez de varrer os n(n-1)/2 pares.
+        """
+        C = self.coords
+        if C.shape != (self.n, 2):
+            raise ValueError(f"coords deve ter forma ({self.n}, 2), mas tem {C.shape}")
+        if not np.isfinite(C).all():
+            raise ValueError("coords contém valores não finitos")
+        if self.n < 2:
+            return
+
+        cell = np.floor(np.asarray(C) / 0.5).astype(np.int64)
+        cell -= cell.min(axis=0)
+        cell[:, 1] += 1                      # folga p/ o vizinho y-1
+        K = int(cell[:, 1].max()) + 2        # folga p/ o vizinho y+1
+        key = cell[:, 0] * K + cell[:, 1]
+        order = np.argsort(key, kind="stable")
+        skey = key[order]
+
+        us, vs = [], []
+        # metade da vizinhança 3x3 (a outra metade é simétrica)
+        for dx, dy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+            nk = key + dx * K + dy
+            lo = np.searchsorted(skey, nk, side="left")
+            cnt = np.searchsorted(skey, nk, side="right") - lo
+            if not cnt.any():
+                continue
+            u = np.repeat(np.arange(self.n), cnt)
+            # posição dentro de cada faixa [lo, lo + cnt) de skey
+            start = np.repeat(lo - np.cumsum(cnt) + cnt, cnt)
+            v = order[start + np.arange(len(u))]
+            keep = u != v
+            us.append(u[keep])
+            vs.append(v[keep])
+
+        u = np.concatenate(us) if us else np.empty(0, dtype=np.int64)
+        v = np.concatenate(vs) if vs else np.empty(0, dtype=np.int64)
+        if not len(u):
+            return
+        w = self.weights.gather(u, v)
+        bad = np.flatnonzero(w <= 0)
+        if len(bad):
+            a = np.minimum(u[bad], v[bad])
+            b = np.maximum(u[bad], v[bad])
+            i = int(np.lexsort((b, a))[0])
+            raise ValueError(f"Peso não-positivo na aresta ({int(a[i])}, {int(b[i])}): w={w[bad[i]]}")
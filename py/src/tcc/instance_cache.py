@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import typer
+
+from .instance import Instance
+from .weights import CSRGraph
+from .tsplib_loader import LOADER_VERSION, load_tsplib_clusteiner
+
+app = typer.Typer(help="Cache binário de instâncias CluSteiner")
+
+
+# ---------- Funções auxiliares ----------
+
+
+def default_cache_dir() -> Path:
+    """Diretório do cache: $TCC_CACHE_DIR, ou ~/.cache/tcc se não estiver definido."""
+    env = os.environ.get("TCC_CACHE_DIR")
+    if env:
+        return Path(env)
+    return Path.home() / ".cache" / "tcc"
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(path: Path, weights: str, dtype, digest: Optional[str] = None) -> str:
+    """
+    Chave do artefato: nome do arquivo + hash do conteúdo + versão do loader
+    + modo de pesos. Se o arquivo ou o loader mudarem, a chave muda junto.
+    """
+    digest = digest or file_sha256(path)
+    return f"{path.stem}-{digest[:16]}-v{LOADER_VERSION}-{weights}-{np.dtype(dtype).name}"
+
+
+def _new_tmp_dir(art_dir: Path) -> Path:
+    art_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp = art_dir.parent / f".{art_dir.name}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    tmp.mkdir()
+    return tmp
+
+
+def _write_artifact(inst: Instance, out_dir: Path, meta: dict) -> None:
+    """
+    Grava os arrays da instância em out_dir (um diretório temporário).
+    Arquivos que o loader já escreveu via memmap (dist.npy, csr_*.npy) ficam como estão.
+    """
+    sizes = [len(c) for c in inst.clusters]
+    ptr = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=ptr[1:])
+    idx = np.fromiter((v for c in inst.clusters for v in c), dtype=np.int32, count=int(ptr[-1]))
+
+    np.save(out_dir / "cluster_ptr.npy", ptr)
+    np.save(out_dir / "cluster_idx.npy", idx)
+    np.save(out_dir / "cluster_of.npy", np.asarray(inst.cluster_of, dtype=np.int32))
+    if inst.coords is not None:
+        np.save(out_dir / "coords.npy", np.asarray(inst.coords, dtype=np.float64))
+    if inst.dist is not None:
+        if isinstance(inst.dist, np.memmap):
+            inst.dist.flush()
+        if not (out_dir / "dist.npy").exists():
+            np.save(out_dir / "dist.npy", inst.dist)
+    if inst.csr is not None:
+        for field in ("indptr", "indices", "data"):
+            fp = out_dir / f"csr_{field}.npy"
+            if not fp.exists():
+                np.save(fp, getattr(inst.csr, field))
+    # tamanhos dos arquivos: checagem barata de integridade no modo trusted
+    meta["arrays"] = {fp.name: fp.stat().st_size for fp in sorted(out_dir.glob("*.npy"))}
+    (out_dir / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+
+def _publish(tmp: Path, art_dir: Path) -> None:
+    """Renomeia o diretório temporário para o definitivo (atômico: ninguém vê artefato pela metade)."""
+    try:
+        tmp.rename(art_dir)
+    except OSError:
+        # outro processo gravou o mesmo artefato antes: fica o dele
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _artifact_intact(art_dir: Path, meta: dict, digest: str) -> bool:
+    """
+    O artefato é do mesmo arquivo-fonte (sha256 completo) e nenhum .npy
+    foi truncado/trocado (tamanhos gravados no meta.json)?
+    """
+    arrays = meta.get("arrays")
+    if meta.get("sha256") != digest or not arrays:
+        return False
+    try:
+        return all((art_dir / name).stat().st_size == size for name, size in arrays.items())
+    except OSError:
+        return False
+
+
+def _read_artifact(art_dir: Path, digest: Optional[str] = None) -> tuple[Instance, bool]:
+    """
+    Lê o artefato; arrays grandes (dist, coords, CSR) voltam como memmap somente-leitura.
+
+    Devolve também se o artefato passou na checagem de integridade
+    (só é feita quando `digest` é dado).
+    """
+    meta = json.loads((art_dir / "meta.json").read_text(encoding="utf-8"))
+    if meta.get("loader_version") != LOADER_VERSION:
+        raise ValueError(f"{art_dir}: versão do loader não confere")
+    intact = digest is not None and _artifact_intact(art_dir, meta, digest)
+
+    ptr = np.load(art_dir / "cluster_ptr.npy")
+    idx = np.load(art_dir / "cluster_idx.npy").tolist()
+    clusters = [idx[int(ptr[k]):int(ptr[k + 1])] for k in range(len(ptr) - 1)]
+    cluster_of = np.load(art_dir / "cluster_of.npy").tolist()
+
+    def _opt(fname: str) -> Optional[np.ndarray]:
+        fp = art_dir / fname
+        return np.load(fp, mmap_mode="r") if fp.exists() else None
+
+    coords = _opt("coords.npy")
+    dist = _opt("dist.npy")
+    csr = None
+    if (art_dir / "csr_indptr.npy").exists():
+        csr = CSRGraph(
+            indptr=_opt("csr_indptr.npy"),
+            indices=_opt("csr_indices.npy"),
+            data=_opt("csr_data.npy"),
+        )
+
+    n = int(meta["n"])
+    m = int(csr.indices.shape[0]) // 2 if csr is not None else n * (n - 1) // 2
+    inst = Instance(
+        name=meta["name"],
+        n=n,
+        m=m,
+        edges=None,
+        terminals=sorted(idx),
+        clusters=clusters,
+        cluster_of=cluster_of,
+        is_euclidean=bool(meta["is_euclidean"]),
+        dist=dist,
+        coords=coords,
+        edge_weight_type=meta.get("edge_weight_type"),
+        csr=csr,
+    )
+    return inst, intact
+
+
+def load_instance(
+    path: Path,
+    cache_dir: Optional[Path] = None,
+    weights: str = "auto",
+    dtype=np.float64,
+    trusted: bool = False,
+) -> Instance:
+    """
+    Cache na frente de load_tsplib_clusteiner.
+
+    - Primeira vez: faz o parse com a matriz/CSR escrita direto num memmap
+      dentro do artefato e grava o resto (coords, clusters, cluster_of).
+    - Próximas vezes: abre o artefato (memmap) em vez de reparsear o texto.
+
+    Nos dois casos a instância devolvida é apoiada nos arquivos do cache.
+    Artefato corrompido/incompatível é descartado e refeito.
+
+    `trusted=True` pula o `validate()` no cache quente quando o artefato
+    confere com o arquivo-fonte (sha256) e com os tamanhos gravados: ele já
+    foi validado quando foi criado. Sem a checagem, valida normalmente.
+    """
+    path = Path(path)
+    cache_dir = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+
+    digest = file_sha256(path)
+    art_dir = cache_dir / cache_key(path, weights, dtype, digest)
+
+    if art_dir.is_dir():
+        try:
+            inst, intact = _read_artifact(art_dir, digest)
+            if not (trusted and intact):
+                inst.validate()
+            return inst
+        except (OSError, ValueError, KeyError):
+            shutil.rmtree(art_dir, ignore_errors=True)
+
+    tmp = _new_tmp_dir(art_dir)
+    try:
+        inst = load_tsplib_clusteiner(path, dtype=dtype, weights=weights, mmap_dir=tmp)
+        meta = {
+            "name": inst.name,
+            "n": inst.n,
+            "is_euclidean": inst.is_euclidean,
+            "edge_weight_type": inst.edge_weight_type,
+            "source": str(path),
+            "sha256": digest,
+            "loader_version": LOADER_VERSION,
+            "weights": weights,
+            "dtype": np.dtype(dtype).name,
+        }
+        _write_artifact(inst, tmp, meta)
+        del inst  # solta os memmaps do diretório temporário
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    _publish(tmp, art_dir)
+
+    inst, _ = _read_artifact(art_dir)
+    return inst
+
+
+# ---------- Comando de linha de comando ----------
+
+
+@app.command()
+def warm(
+    data_dir: Path = typer.Argument(
+        ...,
+        exists=True,
+        file_okay=False,
+        dir_okay=True,
+        help="Diretório com as instâncias (ex.: ../data/raw/EUC_Type1_Small)",
+    ),
+    cache_dir: Optional[Path] = typer.Option(
+        None,
+        "--cache_dir",
+        "-c",
+        help="Diretório do cache (padrão: $TCC_CACHE_DIR ou ~/.cache/tcc)",
+    ),
+    weights: str = typer.Option("auto", help="Modo de pesos: auto, dense ou implicit"),
+    dtype: str = typer.Option("float64", help="Tipo da matriz densa: float64 ou int32"),
+):
+    """
+    Pré-aquece o cache: carrega (e grava) todas as instâncias .txt de data_dir.
+    """
+    paths = sorted(p for p in data_dir.rglob("*.txt") if p.is_file())
+    if not paths:
+        typer.echo("Nenhuma instância encontrada!")
+        raise typer.Exit(code=1)
+
+    target = cache_dir if cache_dir is not None else default_cache_dir()
+    typer.echo(f"Aquecendo cache em: {target}")
+
+    for p in paths:
+        try:
+            inst = load_instance(p, cache_dir=target, weights=weights, dtype=np.dtype(dtype))
+        except ValueError as e:
+            typer.echo(f"PULADA: {p} ({e})")
+            continue
+        typer.echo(f"OK: {inst.name} (n={inst.n}, h={len(inst.clusters)})")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from functools import cached_property
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .weights import WeightOracle
+
+
+# k padrão das listas de candidatos (vizinhos mais próximos por vértice)
+DEFAULT_K = 10
+
+
+@dataclass
+class KNNGraph:
+    """
+    Listas dos k vizinhos mais próximos de cada vértice (grafo de candidatos).
+
+    indices[u] vem em ordem crescente de distância (empate -> menor índice) e
+    weights[u] tem os pesos w(u, indices[u]) do oráculo da instância.
+    """
+
+    indices: np.ndarray  # n x k, int32
+    weights: np.ndarray  # n x k, float64
+
+    @property
+    def n(self) -> int:
+        return int(self.indices.shape[0])
+
+    @property
+    def k(self) -> int:
+        return int(self.indices.shape[1])
+
+    @cached_property
+    def adjacency(self) -> List[List[Tuple[int, float]]]:
+        """
+        Adjacência simétrica (u está na lista de v se v está na de u), no
+        formato de `build_adj`. Montada uma vez e reaproveitada.
+        """
+        n, k = self.n, self.k
+        us = np.repeat(np.arange(n, dtype=np.int64), k)
+        vs = self.indices.ravel().astype(np.int64)
+        ws = self.weights.ravel()
+
+        a = np.concatenate([us, vs])
+        b = np.concatenate([vs, us])
+        w = np.concatenate([ws, ws])
+        _, first = np.unique(a * n + b, return_index=True)  # ordena por (a, b) e tira repetidos
+        a, b, w = a[first], b[first], w[first]
+
+        adj: List[List[Tuple[int, float]]] = [[] for _ in range(n)]
+        for u, v, x in zip(a.tolist(), b.tolist(), w.tolist()):
+            adj[u].append((v, x))
+        return adj
+
+    def candidates(self, us) -> np.ndarray:
+        """União (ordenada) dos vizinhos candidatos dos vértices `us`."""
+        return np.unique(self.indices[np.asarray(us, dtype=np.intp)])
+
+
+def _knn_rows(W: WeightOracle, k: int, block: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Matriz/oráculo genérico: argpartition linha a linha, em blocos."""
+    n = W.n
+    idx = np.empty((n, k), dtype=np.int32)
+    for i0 in range(0, n, block):
+        i1 = min(n, i0 + block)
+        R = np.array(W.rows(np.arange(i0, i1)), dtype=np.float64)
+        R[np.arange(i1 - i0), np.arange(i0, i1)] = np.inf
+        part = np.argpartition(R, k - 1, axis=1)[:, :k]
+        vals = np.take_along_axis(R, part, axis=1)
+        order = np.lexsort((part, vals))
+        idx[i0:i1] = np.take_along_axis(part, order, axis=1)
+    return idx, _gather_rows(W, idx)
+
+
+def _knn_coords(coords: np.ndarray, k: int) -> np.ndarray:
+    """
+    Instâncias com coordenadas: grade uniforme com ~k pontos por célula.
+
+    Para cada célula, os candidatos são os pontos do anel de raio r (em
+    células) em volta dela; qualquer ponto fora do anel está a distância
+    >= r * lado, então se o k-ésimo vizinho de todos os pontos da célula
+    está estritamente mais perto que isso, a resposta é exata. Senão aumenta r.
+    A ordem é pela distância euclidiana (as regras TSPLIB são monótonas nela).
+    """
+    C = np.asarray(coords, dtype=np.float64)
+    n = C.shape[0]
+    lo = C.min(axis=0)
+    ext = C.max(axis=0) - lo
+    area = float(ext[0] * ext[1])
+    if area > 0:
+        side = math.sqrt(area * k / n)
+    else:
+        side = max(float(ext.max()) * k / n, 1e-12)  # pontos colineares
+
+    cell = np.floor((C - lo) / side).astype(np.int64)
+    nx, ny = (int(x) + 1 for x in cell.max(axis=0))
+    key = cell[:, 0] * ny + cell[:, 1]
+    order = np.argsort(key, kind="stable")
+    skey = key[order]
+    cells, starts = np.unique(skey, return_index=True)
+    ends = np.append(starts[1:], n)
+
+    idx = np.empty((n, k), dtype=np.int32)
+    for c, a, b in zip(cells.tolist(), starts.tolist(), ends.tolist()):
+        q = order[a:b]
+        cx, cy = divmod(c, ny)
+        r = 1
+        while True:
+            x0, x1 = max(0, cx - r), min(nx - 1, cx + r)
+            y0, y1 = max(0, cy - r), min(ny - 1, cy + r)
+            # com chave x*ny + y, cada coluna x do anel é uma fatia contígua de skey
+            cols = np.arange(x0, x1 + 1, dtype=np.int64) * ny
+            s0 = np.searchsorted(skey, cols + y0, side="left")
+            s1 = np.searchsorted(skey, cols + y1, side="right")
+            cand = np.concatenate([order[i:j] for i, j in zip(s0.tolist(), s1.tolist())])
+            covers = x0 == 0 and y0 == 0 and x1 == nx - 1 and y1 == ny - 1
+
+            if len(cand) > k or covers:
+                d = np.hypot(C[q, 0, None] - C[None, cand, 0], C[q, 1, None] - C[None, cand, 1])
+                d[q[:, None] == cand[None, :]] = np.inf
+                kth = np.partition(d, k - 1, axis=1)[:, k - 1]
+                if covers or bool((kth < r * side).all()):
+                    break
+            r += 1
+
+        sel = np.lexsort((np.broadcast_to(cand, d.shape), d))[:, :k]
+        idx[q] = cand[sel]
+    return idx
+
+
+def _gather_rows(W: WeightOracle, idx: np.ndarray) -> np.ndarray:
+    n, k = idx.shape
+    us = np.repeat(np.arange(n, dtype=np.intp), k)
+    return np.asarray(W.gather(us, idx.ravel()), dtype=np.float64).reshape(n, k)
+
+
+def build_knn(
+    W: WeightOracle,
+    k: int = DEFAULT_K,
+    coords: Optional[np.ndarray] = None,
+    block: int = 1024,
+) -> KNNGraph:
+    """
+    Monta as listas de k vizinhos mais próximos de um grafo completo.
+
+      - com coordenadas: grade espacial, ~O(n k) em vez de O(n²);
+      - só com pesos (matriz/EXPLICIT): argpartition parcial por linha,
+        em blocos de `block` linhas (memória O(block * n)).
+
+    Em grafo esparso (CSR / lista de arestas) não se aplica: os operadores
+    já usam as arestas reais.
+    """
+    if not W.complete:
+        raise ValueError("Listas KNN só se aplicam a grafo completo")
+    n = W.n
+    if n < 2:
+        raise ValueError("Listas KNN precisam de pelo menos 2 vértices")
+    k = min(int(k), n - 1)
+    if k < 1:
+        raise ValueError(f"k deve ser >= 1 (recebido {k})")
+
+    if coords is not None:
+        idx = _knn_coords(coords, k)
+        return KNNGraph(indices=idx, weights=_gather_rows(W, idx))
+
+    idx, ws = _knn_rows(W, k, block)
+    return KNNGraph(indices=idx, weights=ws)
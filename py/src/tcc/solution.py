@@ -2,7 +2,9 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
 
 
 TreeEdge = Tuple[int, int]
@@ -17,6 +19,58 @@ class Solution:
     edges: List[TreeEdge]       # lista de arestas (u, v), 0-based
 
 
+class ArraySolution:
+    """
+    Solução compacta: arestas num array int32 (m x 2) em vez de lista de tuplas.
+
+    Pensada para arquivar/carregar muitas soluções (ver tcc.solution_store).
+    `edges` devolve a lista de tuplas sob demanda, então verify_solution e
+    os demais consumidores de Solution funcionam igual.
+    """
+
+    __slots__ = ("instance_name", "cost", "edge_array")
+
+    def __init__(self, instance_name: str, cost: float, edge_array) -> None:
+        arr = np.asarray(edge_array, dtype=np.int32)
+        if arr.size == 0:
+            arr = arr.reshape(0, 2)
+        if arr.ndim != 2 or arr.shape[1] != 2:
+            raise ValueError(f"edge_array deve ter forma (m, 2), mas tem {arr.shape}")
+        self.instance_name = instance_name
+        self.cost = float(cost)
+        self.edge_array = arr
+
+    @classmethod
+    def from_solution(cls, sol) -> "ArraySolution":
+        """Aceita Solution, ArraySolution ou qualquer objeto com instance_name/cost/edges."""
+        if isinstance(sol, ArraySolution):
+            return sol
+        return cls(sol.instance_name, sol.cost, np.asarray(sol.edges, dtype=np.int32).reshape(-1, 2))
+
+    def to_solution(self) -> Solution:
+        return Solution(instance_name=self.instance_name, cost=self.cost, edges=self.edges)
+
+    @property
+    def edges(self) -> List[TreeEdge]:
+        return [tuple(e) for e in self.edge_array.tolist()]
+
+    @property
+    def num_edges(self) -> int:
+        return int(self.edge_array.shape[0])
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ArraySolution):
+            return NotImplemented
+        return (
+            self.instance_name == other.instance_name
+            and self.cost == other.cost
+            and np.array_equal(self.edge_array, other.edge_array)
+        )
+
+    def __repr__(self) -> str:
+        return f"ArraySolution(instance_name={self.instance_name!r}, cost={self.cost}, m={self.num_edges})"
+
+
 def parse_solution_file(path: Path) -> Solution:
     """
     Lê um arquivo .sol no formato:
@@ -83,3 +137,69 @@ def parse_solution_file(path: Path) -> Solution:
         raise ValueError("COST não definido no arquivo .sol")
 
     return Solution(instance_name=instance_name, cost=cost, edges=edges)
+
+
+
+def parse_solution_array(path: Path) -> ArraySolution:
+    """
+    Igual a parse_solution_file, mas devolve ArraySolution e converte a seção
+    EDGES de uma vez com NumPy. Se alguma linha de aresta estiver mal formada,
+    cai no parser linha a linha (mesmas mensagens de erro).
+    """
+    with Path(path).open("r", encoding="utf-8") as f:
+        lines = [ln.strip() for ln in f if ln.strip()]
+
+    name = cost = None
+    start = None
+    for i, ln in enumerate(lines):
+        if name is None:
+            if ln.startswith("INSTANCE"):
+                parts = ln.split(maxsplit=1)
+                name = parts[1].strip() if len(parts) == 2 else None
+        elif cost is None:
+            if ln.startswith("COST"):
+                parts = ln.split(maxsplit=1)
+                cost = float(parts[1].strip()) if len(parts) == 2 else None
+        elif ln.startswith("EDGES"):
+            start = i + 1
+            break
+
+    if name is None or cost is None or start is None:
+        return ArraySolution.from_solution(parse_solution_file(Path(path)))
+
+    body = lines[start:]
+    toks = " ".join(body).split()
+    if len(toks) != 2 * len(body):
+        return ArraySolution.from_solution(parse_solution_file(Path(path)))
+    try:
+        arr = np.array(toks, dtype=np.int64).reshape(-1, 2)
+    except ValueError:
+        return ArraySolution.from_solution(parse_solution_file(Path(path)))
+    return ArraySolution(name, cost, arr)
+
+
+def _format_cost(cost: float) -> str:
+    # 6 casas como nos exemplos da doc; se isso perder precisão, usa repr (ida e volta exata)
+    s = f"{cost:.6f}"
+    return s if float(s) == cost else repr(float(cost))
+
+
+def format_solution(sol: Union[Solution, ArraySolution], comment: Optional[str] = None) -> str:
+    """Texto .sol (docs/solution_format.md, seção 4.2) de uma solução."""
+    out: List[str] = []
+    if comment:
+        out.extend(f"# {ln}" for ln in comment.splitlines())
+    out.append(f"INSTANCE {sol.instance_name}")
+    out.append(f"COST {_format_cost(float(sol.cost))}")
+    out.append("")
+    out.append("EDGES")
+    if isinstance(sol, ArraySolution):
+        out.extend(f"{u} {v}" for u, v in sol.edge_array.tolist())
+    else:
+        out.extend(f"{u} {v}" for u, v in sol.edges)
+    return "\n".join(out) + "\n"
+
+
+def write_solution_file(path: Path, sol: Union[Solution, ArraySolution], comment: Optional[str] = None) -> None:
+    """Grava uma solução no formato texto .sol (lido de volta por parse_solution_file)."""
+    Path(path).write_text(format_solution(sol, comment), encoding="utf-8")
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import struct
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+import typer
+
+from .solution import ArraySolution, Solution, parse_solution_array, write_solution_file
+
+app = typer.Typer(help="Contêiner binário de soluções (.solb): muitas soluções por arquivo")
+
+
+# ---------- Formato ----------
+#
+# Cabeçalho (16 bytes):
+#   magic "TCCSOLB\0" | versão uint16 | codec uint8 (0 = cru, 1 = zlib) | 5 bytes reservados
+#
+# Depois, blocos até o fim do arquivo:
+#   count uint32 | raw_len uint32 | stored_len uint32 | payload (stored_len bytes)
+#
+# O payload (descomprimido, raw_len bytes) tem `count` registros:
+#   name_len uint16 | cost float64 | m uint32 | nome (utf-8) | arestas int32[m][2]
+#
+# Tudo little-endian. Blocos independentes: dá pra ir acrescentando soluções
+# (append) e ler em streaming com memória limitada a um bloco.
+
+MAGIC = b"TCCSOLB\0"
+FORMAT_VERSION = 1
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+
+_HEADER = struct.Struct("<8sHB5x")
+_BLOCK = struct.Struct("<III")
+_RECORD = struct.Struct("<HdI")
+
+SolutionLike = Union[Solution, ArraySolution]
+
+
+def _encode_record(sol: SolutionLike) -> bytes:
+    arr = sol.edge_array if isinstance(sol, ArraySolution) else ArraySolution.from_solution(sol).edge_array
+    name = sol.instance_name.encode("utf-8")
+    if len(name) > 0xFFFF:
+        raise ValueError("nome da instância longo demais para o contêiner")
+    return _RECORD.pack(len(name), float(sol.cost), arr.shape[0]) + name + arr.astype("<i4", copy=False).tobytes()
+
+
+def _decode_block(raw: bytes, count: int) -> Iterator[ArraySolution]:
+    off = 0
+    for _ in range(count):
+        name_len, cost, m = _RECORD.unpack_from(raw, off)
+        off += _RECORD.size
+        name = raw[off:off + name_len].decode("utf-8")
+        off += name_len
+        nbytes = 8 * m
+        if off + nbytes > len(raw):
+            raise ValueError("contêiner de soluções corrompido (registro truncado)")
+        edges = np.frombuffer(raw, dtype="<i4", count=2 * m, offset=off).reshape(m, 2).astype(np.int32)
+        off += nbytes
+        yield ArraySolution(name, cost, edges)
+
+
+def _read_header(f: BinaryIO, path: Path) -> int:
+    head = f.read(_HEADER.size)
+    if len(head) < _HEADER.size:
+        raise ValueError(f"{path}: não é um contêiner de soluções (arquivo curto)")
+    magic, version, codec = _HEADER.unpack(head)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: não é um contêiner de soluções")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path}: versão {version} do contêiner não suportada (esperava {FORMAT_VERSION})")
+    if codec not in (CODEC_RAW, CODEC_ZLIB):
+        raise ValueError(f"{path}: codec {codec} desconhecido")
+    return codec
+
+
+def is_solution_container(path: Path) -> bool:
+    try:
+        with Path(path).open("rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class SolutionWriter:
+    """
+    Grava soluções num contêiner .solb, em blocos de `block_size` soluções.
+
+        with SolutionWriter(path) as w:
+            for sol in ...:
+                w.write(sol)
+
+    `append=True` continua um contêiner existente (mantém o codec dele).
+    """
+
+    def __init__(self, path: Path, compress: bool = True, block_size: int = 256, append: bool = False, level: int = 6) -> None:
+        self.path = Path(path)
+        self.block_size = max(1, int(block_size))
+        self.level = level
+        self._buf: List[bytes] = []
+        self.count = 0
+
+        if append and self.path.exists() and self.path.stat().st_size > 0:
+            with self.path.open("rb") as f:
+                self.codec = _read_header(f, self.path)
+            self._f = self.path.open("ab")
+        else:
+            self.codec = CODEC_ZLIB if compress else CODEC_RAW
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._f = self.path.open("wb")
+            self._f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, self.codec))
+
+    def write(self, sol: SolutionLike) -> None:
+        self._buf.append(_encode_record(sol))
+        self.count += 1
+        if len(self._buf) >= self.block_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buf:
+            return
+        raw = b"".join(self._buf)
+        data = zlib.compress(raw, self.level) if self.codec == CODEC_ZLIB else raw
+        self._f.write(_BLOCK.pack(len(self._buf), len(raw), len(data)))
+        self._f.write(data)
+        self._f.flush()
+        self._buf.clear()
+
+    def close(self) -> None:
+        if self._f is None:
+            return
+        self.flush()
+        self._f.close()
+        self._f = None
+
+    def __enter__(self) -> "SolutionWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_solutions(path: Path, sols: Iterable[SolutionLike], compress: bool = True, block_size: int = 256) -> int:
+    """Grava todas as soluções de `sols` num contêiner novo. Devolve quantas foram gravadas."""
+    with SolutionWriter(path, compress=compress, block_size=block_size) as w:
+        for sol in sols:
+            w.write(sol)
+        return w.count
+
+
+def read_solutions(path: Path) -> Iterator[ArraySolution]:
+    """Lê (em streaming, bloco a bloco) as soluções de um contêiner .solb."""
+    path = Path(path)
+    with path.open("rb") as f:
+        codec = _read_header(f, path)
+        while True:
+            head = f.read(_BLOCK.size)
+            if not head:
+                return
+            if len(head) < _BLOCK.size:
+                raise ValueError(f"{path}: contêiner truncado (cabeçalho de bloco)")
+            count, raw_len, stored_len = _BLOCK.unpack(head)
+            data = f.read(stored_len)
+            if len(data) < stored_len:
+                raise ValueError(f"{path}: contêiner truncado (bloco incompleto)")
+            raw = zlib.decompress(data) if codec == CODEC_ZLIB else data
+            if len(raw) != raw_len:
+                raise ValueError(f"{path}: contêiner corrompido (tamanho do bloco não confere)")
+            yield from _decode_block(raw, count)
+
+
+def count_solutions(path: Path) -> int:
+    """Número de soluções, lendo só os cabeçalhos dos blocos (sem descomprimir)."""
+    path = Path(path)
+    total = 0
+    with path.open("rb") as f:
+        _read_header(f, path)
+        while True:
+            head = f.read(_BLOCK.size)
+            if len(head) < _BLOCK.size:
+                return total
+            count, _, stored_len = _BLOCK.unpack(head)
+            total += count
+            f.seek(stored_len, 1)
+
+
+def load_solutions(path: Path) -> Iterator[ArraySolution]:
+    """Contêiner .solb -> todas as soluções; arquivo texto .sol -> a única solução dele."""
+    if is_solution_container(path):
+        yield from read_solutions(path)
+    else:
+        yield parse_solution_array(Path(path))
+
+
+# ---------- Conversores texto <-> contêiner ----------
+
+
+def pack_text_files(paths: Iterable[Path], out_path: Path, compress: bool = True, block_size: int = 256) -> int:
+    """Arquivos .sol texto -> um contêiner .solb (na ordem de `paths`)."""
+    return write_solutions(out_path, (parse_solution_array(Path(p)) for p in paths), compress, block_size)
+
+
+def _file_stem(i: int, name: str) -> str:
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+    return f"{i:06d}_{safe}"
+
+
+def unpack_to_text(path: Path, out_dir: Path) -> int:
+    """Contêiner .solb -> um .sol texto por solução em out_dir (000000_<instancia>.sol, ...)."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    n = 0
+    for i, sol in enumerate(read_solutions(path)):
+        write_solution_file(out_dir / f"{_file_stem(i, sol.instance_name)}.sol", sol)
+        n += 1
+    return n
+
+
+# ---------- Comandos de linha de comando ----------
+
+
+@app.command()
+def pack(
+    src: Path = typer.Argument(..., exists=True, help="Arquivo .sol ou diretório com arquivos .sol"),
+    out_path: Path = typer.Option(..., "--out", "-o", help="Contêiner de saída (.solb)"),
+    raw: bool = typer.Option(False, "--raw", help="Não comprime os blocos"),
+    block_size: int = typer.Option(256, help="Soluções por bloco"),
+):
+    """Empacota soluções .sol (texto) num contêiner binário."""
+    paths = [src] if src.is_file() else sorted(p for p in src.rglob("*.sol") if p.is_file())
+    if not paths:
+        typer.echo("Nenhuma solução encontrada!")
+        raise typer.Exit(code=1)
+    n = pack_text_files(paths, out_path, compress=not raw, block_size=block_size)
+    typer.echo(f"OK: {n} soluções em {out_path} ({out_path.stat().st_size} bytes)")
+
+
+@app.command()
+def unpack(
+    path: Path = typer.Argument(..., exists=True, dir_okay=False, help="Contêiner .solb"),
+    out_dir: Path = typer.Option(..., "--out_dir", "-o", help="Diretório de saída para os .sol texto"),
+):
+    """Extrai um contêiner binário para arquivos .sol (texto), um por solução."""
+    n = unpack_to_text(path, out_dir)
+    typer.echo(f"OK: {n} soluções extraídas em {out_dir}")
+
+
+@app.command()
+def info(
+    path: Path = typer.Argument(..., exists=True, dir_okay=False, help="Contêiner .solb"),
+    instance_name: Optional[str] = typer.Option(None, "--instance_name", "-n", help="Conta só desta instância"),
+):
+    """Resumo do contêiner: número de soluções (e melhor custo, se filtrar por instância)."""
+    if instance_name is None:
+        typer.echo(f"{path}: {count_solutions(path)} soluções")
+        return
+    costs = [s.cost for s in read_solutions(path) if s.instance_name == instance_name]
+    best = min(costs) if costs else None
+    typer.echo(f"{path}: {len(costs)} soluções de {instance_name} (melhor custo={best})")
+
+
+if __name__ == "__main__":
+    app()
@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+import csv
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import pandas as pd
 import typer
 
 from tcc import Instance  # nossa classe de instância
+from tcc.instance_cache import file_sha256
+from tcc.tsplib_parser import parse_tsplib
 
 app = typer.Typer(help="Resumo das instâncias CluSteiner em data/raw/")
 
@@ -82,105 +89,21 @@ def parse_instance(file_path: Path, is_euclidean: bool) -> Dict[str, object]:
       - cluster_of
     e usar isso para validar a estrutura via Instance.validate().
     """
-    name = file_path.stem
-    dimension = None
-    num_clusters_header = None
+    # Uma passada só pelo arquivo (parser compartilhado com o loader);
+    # coordenadas não entram no resumo, então nem são convertidas.
+    data = parse_tsplib(file_path, read_coords=False)
 
-    # Aqui vamos guardar clusters explicitamente (1-based no arquivo).
-    clusters_1based: List[List[int]] = []
-
-    # Lê todas as linhas não vazias
-    with file_path.open("r") as f:
-        lines = [ln.strip() for ln in f if ln.strip()]
-
-    # ---------- 1ª passada: cabeçalho ----------
-    for line in lines:
-        if line.startswith("Name"):
-            parts = line.split(":")
-            if len(parts) >= 2:
-                name = parts[1].strip()
-
-        elif line.startswith("DIMENSION"):
-            parts = line.split(":")
-            dimension = int(parts[1].strip())
-
-        elif line.startswith("GTSP_SETS"):
-            parts = line.split(":")
-            num_clusters_header = int(parts[1].strip())
-
-        elif line.startswith("NUMBER_OF_CLUSTERS"):
-            parts = line.split(":")
-            num_clusters_header = int(parts[1].strip())
+    name = data.name or file_path.stem
+    dimension = data.dimension
+    num_clusters_header = data.num_clusters_header
 
     if dimension is None:
         raise ValueError(f"Arquivo {file_path} não possui DIMENSION")
 
-    # Descobre qual formato é: GTSP_SET_SECTION ou CLUSTER_SECTION
-    has_gtsp = any(line.startswith("GTSP_SET_SECTION") for line in lines)
-    has_cluster_sec = any(line.startswith("CLUSTER_SECTION") for line in lines)
-
-    mode = None
-    if has_gtsp:
-        mode = "gtsp"
-    elif has_cluster_sec:
-        mode = "cluster"
-
-    # ---------- 2ª passada: leitura dos clusters ----------
-    if mode == "gtsp":
-        in_sets_section = False
-        for line in lines:
-            if line.startswith("GTSP_SET_SECTION"):
-                in_sets_section = True
-                continue
-            if not in_sets_section:
-                continue
-            if line.upper().startswith("EOF"):
-                break
-
-            tokens = line.split()
-            if len(tokens) < 3:
-                continue
-
-            # tokens[0] = id do cluster (ignoramos aqui)
-            vertices_1based: List[int] = []
-            for tok in tokens[1:]:
-                if tok == "-1":
-                    break
-                vertices_1based.append(int(tok))
-
-            if vertices_1based:
-                clusters_1based.append(vertices_1based)
-
-    elif mode == "cluster":
-        in_cluster = False
-        for line in lines:
-            if line.startswith("CLUSTER_SECTION"):
-                in_cluster = True
-                continue
-            if not in_cluster:
-                continue
-
-            tokens = line.split()
-            if len(tokens) < 3:
-                continue
-
-            # tokens[0] = id do cluster (ignoramos aqui)
-            vertices_1based: List[int] = []
-            for tok in tokens[1:]:
-                if tok == "-1":
-                    break
-                vertices_1based.append(int(tok))
-
-            if vertices_1based:
-                clusters_1based.append(vertices_1based)
-
     # ---------- Construção de terminals, clusters 0-based e cluster_sizes ----------
 
-    # Converte clusters de 1-based -> 0-based
-    clusters: List[List[int]] = []
-    for C1 in clusters_1based:
-        C0 = [v - 1 for v in C1]  # 1..DIMENSION -> 0..DIMENSION-1
-        clusters.append(C0)
+    # O parser já devolve os clusters 0-based (1..DIMENSION -> 0..DIMENSION-1)
+    clusters: List[List[int]] = data.clusters
 
     # Conjunto de terminais R
     terminals_set = set(v for C in clusters for v in C)
@@ -228,6 +151,140 @@ def parse_instance(file_path: Path, is_euclidean: bool) -> Dict[str, object]:
     }
 
 
+def summary_row(file_path: Path, data_dir: Path) -> Dict[str, object]:
+    """
+    Linha do resumo de UMA instância (metadados da pasta + estatísticas).
+    `cluster_sizes` fica como lista; vira colunas só na hora de gravar o CSV.
+    """
+    meta = infer_metadata(file_path)
+    is_euclidean = meta["metric"] == "euclidean"
+    stats = parse_instance(file_path, is_euclidean=is_euclidean)
+
+    return {
+        **meta,
+        "instance": stats["instance"],
+        "num_vertices": stats["num_vertices"],
+        "num_clusters": stats["num_clusters"],
+        "num_terminals": stats["num_terminals"],
+        "num_steiner": stats["num_steiner"],
+        "rel_path": file_path.relative_to(data_dir).as_posix(),
+        "cluster_sizes": stats["cluster_sizes"],
+    }
+
+
+def _summarize_job(job: Tuple[Path, Path, Optional[str]]) -> Tuple[str, Optional[Dict[str, object]]]:
+    """
+    Tarefa do pool: (arquivo, data_dir, sha256 antigo) -> (sha256, linha).
+    Se o conteúdo não mudou (mesmo hash), devolve linha None: reaproveita a do manifest.
+    """
+    file_path, data_dir, old_sha = job
+    sha = file_sha256(file_path)
+    if sha == old_sha:
+        return sha, None
+    return sha, summary_row(file_path, data_dir)
+
+
+# ---------- Manifest (modo incremental) ----------
+
+MANIFEST_VERSION = 1
+
+
+def default_manifest_path(out_csv: Path) -> Path:
+    return out_csv.with_name(out_csv.name + ".manifest.json")
+
+
+def load_manifest(path: Path) -> Dict[str, dict]:
+    """rel_path -> {mtime_ns, size, sha256, row}. Manifest ausente/inválido = vazio."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("files", {})
+
+
+def save_manifest(path: Path, files: Dict[str, dict]) -> None:
+    """Grava via arquivo temporário + rename, pra nunca deixar manifest pela metade."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    tmp.write_text(json.dumps({"version": MANIFEST_VERSION, "files": files}), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _iter_rows(
+    paths: List[Path],
+    data_dir: Path,
+    manifest: Dict[str, dict],
+    workers: int,
+    new_manifest: Dict[str, dict],
+) -> Iterator[Tuple[Dict[str, object], bool]]:
+    """
+    Gera (linha, reaproveitada?) na ordem de `paths`.
+
+    - (mtime, tamanho) iguais aos do manifest: usa a linha salva, sem abrir o arquivo;
+    - senão o arquivo vai pro pool: calcula o sha256 e só reparseia se o
+      conteúdo mudou de fato.
+    `new_manifest` é preenchido no caminho.
+    """
+    stat_of = {}
+    jobs: List[Tuple[Path, Path, Optional[str]]] = []
+    for p in paths:
+        rel = p.relative_to(data_dir).as_posix()
+        st = p.stat()
+        stat_of[rel] = st
+        old = manifest.get(rel)
+        if old is None or old["mtime_ns"] != st.st_mtime_ns or old["size"] != st.st_size:
+            jobs.append((p, data_dir, old["sha256"] if old else None))
+    job_rels = {j[0].relative_to(data_dir).as_posix() for j in jobs}
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(jobs) > 1 else None
+    try:
+        if pool is not None:
+            # map mantém a ordem: as linhas saem na ordem de `paths` assim que ficam prontas
+            results = pool.map(_summarize_job, jobs, chunksize=max(1, len(jobs) // (workers * 8)))
+        else:
+            results = map(_summarize_job, jobs)
+
+        for p in paths:
+            rel = p.relative_to(data_dir).as_posix()
+            st = stat_of[rel]
+            old = manifest.get(rel)
+            if rel not in job_rels:
+                sha, row, reused = old["sha256"], old["row"], True
+            else:
+                sha, row = next(results)
+                reused = row is None
+                if reused:
+                    row = old["row"]
+            new_manifest[rel] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": sha, "row": row}
+            yield row, reused
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def write_summary_csv(rows_path: Path, out_csv: Path, max_clusters: int) -> None:
+    """
+    Segunda passada: lê as linhas (JSON por linha) e grava o CSV final,
+    expandindo cluster_sizes em cluster_size_1..cluster_size_{max_clusters}.
+    """
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_csv.with_name(f".{out_csv.name}.tmp-{os.getpid()}")
+    with rows_path.open("r", encoding="utf-8") as src, tmp.open("w", newline="", encoding="utf-8") as dst:
+        writer = None
+        for line in src:
+            row = json.loads(line)
+            sizes = row.pop("cluster_sizes")
+            for i in range(max_clusters):
+                row[f"cluster_size_{i+1}"] = sizes[i] if i < len(sizes) else None
+            if writer is None:
+                writer = csv.DictWriter(dst, fieldnames=list(row.keys()))
+                writer.writeheader()
+            writer.writerow(row)
+    os.replace(tmp, out_csv)
+
+
 # ---------- Comando de linha de comando ----------
 
 
@@ -246,71 +303,74 @@ def summarize(
         "-o",
         help="Caminho do CSV de saída (ex.: ../data/processed/instances.csv)",
     ),
+    workers: int = typer.Option(
+        1,
+        "--workers",
+        "-j",
+        help="Processos para parsear em paralelo (1 = serial)",
+    ),
+    incremental: bool = typer.Option(
+        True,
+        "--incremental/--full",
+        help="Pula arquivos que não mudaram desde a última execução (manifest)",
+    ),
+    manifest_path: Optional[Path] = typer.Option(
+        None,
+        "--manifest",
+        help="Manifest (path, mtime, tamanho, sha256) (padrão: <out_csv>.manifest.json)",
+    ),
 ):
     """
     Varre todas as instâncias em data_dir, valida a estrutura de clusters/terminals
     com Instance.validate() e gera um CSV de resumo.
+
+    As linhas são gravadas à medida que ficam prontas (memória limitada) e o
+    manifest permite pular, na próxima execução, os arquivos inalterados.
     """
     typer.echo(f"Lendo instâncias em: {data_dir}")
 
-    rows: List[Dict[str, object]] = []
-
-    # percorre recursivamente todos os .txt
-    for file_path in sorted(data_dir.rglob("*.txt")):
-        if not file_path.is_file():
-            continue
-
-        meta = infer_metadata(file_path)
-        is_euclidean = meta["metric"] == "euclidean"
-
-        stats = parse_instance(file_path, is_euclidean=is_euclidean)
-        inst = stats["_inst"]
-
-        # Log simples pra garantir que o Instance passou no validate
-        typer.echo(
-            f"OK: {inst.name} "
-            f"(n={inst.n}, |R|={len(inst.terminals)}, h={len(inst.clusters)})"
-        )
-
-        # Monta linha para o CSV (sem o campo interno _inst)
-        row = {
-            **meta,
-            "instance": stats["instance"],
-            "num_vertices": stats["num_vertices"],
-            "num_clusters": stats["num_clusters"],
-            "num_terminals": stats["num_terminals"],
-            "num_steiner": stats["num_steiner"],
-            "rel_path": str(file_path.relative_to(data_dir)),
-        }
-        # cluster_sizes vai virar colunas depois
-        row["cluster_sizes"] = stats["cluster_sizes"]
-
-        rows.append(row)
-
-    if not rows:
+    paths = sorted(p for p in data_dir.rglob("*.txt") if p.is_file())
+    if not paths:
         typer.echo("Nenhuma instância encontrada!")
         raise typer.Exit(code=1)
 
-    df = pd.DataFrame(rows)
-
-    # Expande cluster_sizes em colunas opcionais (máx. N clusters reais)
-    max_clusters = max(len(cs) for cs in df["cluster_sizes"])
-    for i in range(max_clusters):
-        col_name = f"cluster_size_{i+1}"
-        df[col_name] = df["cluster_sizes"].apply(
-            lambda cs, i=i: cs[i] if i < len(cs) else None
-        )
-
-    # não precisamos guardar a lista inteira no CSV
-    df = df.drop(columns=["cluster_sizes"])
+    manifest_path = manifest_path or default_manifest_path(out_csv)
+    manifest = load_manifest(manifest_path) if incremental else {}
+    new_manifest: Dict[str, dict] = {}
 
     out_csv.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(out_csv, index=False)
-
-    typer.echo(f"\nSalvo resumo em: {out_csv}")
+    max_clusters = 0
+    parsed = reused_count = 0
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=".jsonl", dir=out_csv.parent, delete=False, encoding="utf-8"
+    ) as tmp_rows:
+        rows_path = Path(tmp_rows.name)
+    try:
+        with rows_path.open("w", encoding="utf-8") as f:
+            for row, reused in _iter_rows(paths, data_dir, manifest, max(1, workers), new_manifest):
+                f.write(json.dumps(row) + "\n")
+                max_clusters = max(max_clusters, len(row["cluster_sizes"]))
+                if reused:
+                    reused_count += 1
+                else:
+                    parsed += 1
+
+                # Log simples pra garantir que o Instance passou no validate
+                typer.echo(
+                    f"{'OK' if not reused else 'OK (sem mudança)'}: {row['instance']} "
+                    f"(n={row['num_vertices']}, |R|={row['num_terminals']}, h={len(row['cluster_sizes'])})"
+                )
+
+        write_summary_csv(rows_path, out_csv, max_clusters)
+    finally:
+        rows_path.unlink(missing_ok=True)
+
+    save_manifest(manifest_path, new_manifest)
+
+    typer.echo(f"\nSalvo resumo em: {out_csv} ({parsed} parseadas, {reused_count} reaproveitadas)")
     typer.echo()
     typer.echo("Primeiras linhas:")
-    typer.echo(df.head().to_string(index=False))
+    typer.echo(pd.read_csv(out_csv, nrows=5).to_string(index=False))
 
 
 if __name__ == "__main__":
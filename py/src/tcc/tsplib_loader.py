@@ -1,124 +1,137 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Tuple, Optional
-import math
+from typing import List, Optional
+
+import numpy as np
 
 from .instance import Instance
+from .tsplib_parser import edge_data_arrays, explicit_weight_matrix, parse_tsplib
+from .weights import TSPLIB_RULES, CSRGraph, tsplib_matrix
+
+
+# Versão do formato produzido pelo loader; entra na chave do cache de instâncias.
+# Incrementar sempre que o parse/pesos mudarem de resultado.
+LOADER_VERSION = 3
+
+# Acima disso o modo "auto" não monta a matriz n x n (n=4000 já dá 128 MB em float64).
+DENSE_MAX_N = 4000
+
 
+def _open_matrix(mmap_dir: Optional[Path], n: int, dtype) -> Optional[np.ndarray]:
+    """Matriz n x n de saída: memmap em mmap_dir/dist.npy, ou None (memória comum)."""
+    if mmap_dir is None:
+        return None
+    return np.lib.format.open_memmap(Path(mmap_dir) / "dist.npy", mode="w+", dtype=dtype, shape=(n, n))
 
-def _tsplib_euc_2d(a: tuple[float, float], b: tuple[float, float]) -> float:
-    # TSPLIB EUC_2D costuma usar arredondamento para inteiro:
-    # dist = int(sqrt(dx^2+dy^2) + 0.5)
-    dx = a[0] - b[0]
-    dy = a[1] - b[1]
-    return float(int(math.sqrt(dx * dx + dy * dy) + 0.5))
 
+def _mmap_csr(g: CSRGraph, mmap_dir: Optional[Path]) -> CSRGraph:
+    """Grava o CSR em mmap_dir e reabre como memmap somente-leitura."""
+    if mmap_dir is None:
+        return g
+    arrays = {}
+    for field in ("indptr", "indices", "data"):
+        fp = Path(mmap_dir) / f"csr_{field}.npy"
+        np.save(fp, getattr(g, field))
+        arrays[field] = np.load(fp, mmap_mode="r")
+    return CSRGraph(**arrays)
 
-def load_tsplib_clusteiner(path: Path) -> Instance:
+
+def load_tsplib_clusteiner(
+    path: Path,
+    dtype=np.float64,
+    weights: str = "auto",
+    mmap_dir: Optional[Path] = None,
+) -> Instance:
     """
-    Loader mínimo para instâncias estilo TSPLIB + GTSP_SET_SECTION:
+    Loader para instâncias estilo TSPLIB do CluSteiner:
       - NAME
       - DIMENSION
-      - EDGE_WEIGHT_TYPE: EUC_2D (assumido)
-      - NODE_COORD_SECTION
-      - GTSP_SET_SECTION (clusters de terminais)
+      - EDGE_WEIGHT_TYPE: EUC_2D (padrão), CEIL_2D, ATT ou EXPLICIT
+      - NODE_COORD_SECTION (euclidianas)
+      - EDGE_WEIGHT_SECTION + EDGE_WEIGHT_FORMAT (não-euclidianas, matriz explícita)
+      - EDGE_DATA_SECTION com linhas `u v w` (não-euclidianas esparsas -> CSR)
+      - GTSP_SET_SECTION ou CLUSTER_SECTION (clusters de terminais)
+
+    Modos de pesos (`weights`, só para instâncias por coordenadas):
+      - "dense"   : matriz densa `Instance.dist` (float64 ou int32, via `dtype`);
+      - "implicit": guarda só `Instance.coords` + regra TSPLIB; pesos sob demanda;
+      - "auto"    : "dense" até DENSE_MAX_N vértices, "implicit" acima disso.
+    Pesos explícitos sempre viram matriz densa (ou CSR, se vierem como lista de arestas).
+
+    Com `mmap_dir`, a matriz/CSR é gravada direto em arquivos .npy nesse
+    diretório e a instância fica apoiada em memmap (é o que o cache usa).
+
+    Em todos os casos `Instance.edges` é só uma visão preguiçosa e o acesso
+    aos pesos é por `Instance.weights`.
     """
-    lines = [ln.strip() for ln in path.read_text(encoding="utf-8", errors="ignore").splitlines()]
-    lines = [ln for ln in lines if ln]
-
-    name = path.stem
-    n: Optional[int] = None
-    edge_weight_type = None
-
-    # parse header
-    i = 0
-    while i < len(lines):
-        ln = lines[i]
-        if ln.startswith("NAME"):
-            # "NAME : xxx" ou "NAME: xxx"
-            parts = ln.split(":")
-            if len(parts) >= 2:
-                name = parts[1].strip()
-        elif ln.startswith("DIMENSION"):
-            parts = ln.split(":")
-            n = int(parts[1].strip())
-        elif ln.startswith("EDGE_WEIGHT_TYPE"):
-            parts = ln.split(":")
-            edge_weight_type = parts[1].strip()
-        elif ln.startswith("NODE_COORD_SECTION") or ln.startswith("GTSP_SET_SECTION"):
-            break
-        i += 1
+    if weights not in ("auto", "dense", "implicit"):
+        raise ValueError(f"weights deve ser 'auto', 'dense' ou 'implicit' (recebeu {weights!r})")
+
+    path = Path(path)
+    data = parse_tsplib(path)
+
+    name = data.name or path.stem
+    n = data.dimension
+    edge_weight_type = (data.edge_weight_type or "").upper()
 
     if n is None:
         raise ValueError(f"{path}: DIMENSION não encontrado")
 
-    # coordenadas (1-based no arquivo)
-    coords: List[tuple[float, float]] = [(0.0, 0.0)] * n
-    if "NODE_COORD_SECTION" in lines:
-        # achar onde começa
-        idx = lines.index("NODE_COORD_SECTION") + 1
-        for _ in range(n):
-            tokens = lines[idx].split()
-            idx += 1
-            if len(tokens) < 3:
-                raise ValueError(f"{path}: linha de coordenada inválida")
-            node_id = int(tokens[0]) - 1
-            x = float(tokens[1])
-            y = float(tokens[2])
-            coords[node_id] = (x, y)
-
-    # clusters (GTSP_SET_SECTION)
-    clusters: List[List[int]] = []
-    terminals_set = set()
-
-    if "GTSP_SET_SECTION" not in lines:
-        raise ValueError(f"{path}: GTSP_SET_SECTION não encontrado (loader mínimo só cobre esse caso)")
-
-    idx = lines.index("GTSP_SET_SECTION") + 1
-    while idx < len(lines):
-        ln = lines[idx]
-        idx += 1
-        if ln.upper().startswith("EOF"):
-            break
-        toks = ln.split()
-        if len(toks) < 3:
-            continue
-        # toks[0] = id do cluster (ignora)
-        vs: List[int] = []
-        for t in toks[1:]:
-            if t == "-1":
-                break
-            v = int(t) - 1  # 0-based
-            vs.append(v)
-            terminals_set.add(v)
-        if vs:
-            clusters.append(vs)
-
-    terminals = sorted(terminals_set)
+    # clusters (GTSP_SET_SECTION ou CLUSTER_SECTION)
+    if data.cluster_section is None:
+        raise ValueError(f"{path}: GTSP_SET_SECTION/CLUSTER_SECTION não encontrado")
+
+    clusters: List[List[int]] = data.clusters
+    terminals = sorted({v for ck in clusters for v in ck})
 
     cluster_of = [-1] * n
     for k, ck in enumerate(clusters):
         for v in ck:
             cluster_of[v] = k
 
-    # criar arestas do grafo completo usando distância euclidiana
-    edges: List[Tuple[int, int, float]] = []
-    for u in range(n):
-        for v in range(u + 1, n):
-            w = _tsplib_euc_2d(coords[u], coords[v])
-            edges.append((u, v, w))
+    dist: Optional[np.ndarray] = None
+    coords: Optional[np.ndarray] = None
+    csr: Optional[CSRGraph] = None
+    rule: Optional[str] = None
+
+    if "EDGE_DATA_SECTION" in data.other_sections:
+        # não-euclidiana esparsa: lista de arestas -> CSR
+        us, vs, ws = edge_data_arrays(data)
+        csr = _mmap_csr(CSRGraph.from_edges(n, us, vs, ws, dtype=dtype), mmap_dir)
+        m = int(csr.indices.shape[0]) // 2
+    elif edge_weight_type == "EXPLICIT" or "EDGE_WEIGHT_SECTION" in data.other_sections:
+        # não-euclidiana: matriz explícita direto no array tipado
+        dist = explicit_weight_matrix(data, n, dtype=dtype, out=_open_matrix(mmap_dir, n, dtype))
+        m = n * (n - 1) // 2
+    else:
+        rule = edge_weight_type or "EUC_2D"
+        if rule not in TSPLIB_RULES:
+            raise ValueError(f"{path}: EDGE_WEIGHT_TYPE {data.edge_weight_type!r} não suportado (use {TSPLIB_RULES} ou EXPLICIT)")
+        if data.coords is None:
+            raise ValueError(f"{path}: NODE_COORD_SECTION não encontrado")
+        coords = data.coords
+
+        # grafo completo com distância euclidiana: matriz densa ou oráculo por coordenadas
+        if weights == "auto":
+            weights = "dense" if n <= DENSE_MAX_N else "implicit"
+        if weights == "dense":
+            dist = tsplib_matrix(coords, rule, dtype=dtype, out=_open_matrix(mmap_dir, n, dtype))
+        m = n * (n - 1) // 2
 
     inst = Instance(
         name=name,
         n=n,
-        m=len(edges),
-        edges=edges,
+        m=m,
+        edges=None,
         terminals=terminals,
         clusters=clusters,
         cluster_of=cluster_of,
-        is_euclidean=True,
+        is_euclidean=coords is not None,
+        dist=dist,
+        coords=coords,
+        edge_weight_type=rule,
+        csr=csr,
     )
     inst.validate()
     return inst
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+# Seções cujo conteúdo o parser entende; o resto vai cru para `other_sections`.
+CLUSTER_SECTIONS = ("GTSP_SET_SECTION", "CLUSTER_SECTION")
+
+
+@dataclass
+class TSPLIBData:
+    """
+    Resultado bruto do parse de um arquivo TSPLIB/GTSP (uma passada só).
+
+    Índices de vértice aqui já estão 0-based.
+    """
+
+    path: Path
+    header: Dict[str, str] = field(default_factory=dict)  # chaves em maiúsculas
+    coords: Optional[np.ndarray] = None                   # n x 2 (float64), se houver NODE_COORD_SECTION
+    clusters: List[List[int]] = field(default_factory=list)
+    cluster_section: Optional[str] = None                  # GTSP_SET_SECTION ou CLUSTER_SECTION
+    other_sections: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.header.get("NAME")
+
+    @property
+    def dimension(self) -> Optional[int]:
+        d = self.header.get("DIMENSION")
+        return int(d) if d is not None else None
+
+    @property
+    def num_clusters_header(self) -> Optional[int]:
+        for key in ("GTSP_SETS", "NUMBER_OF_CLUSTERS"):
+            if key in self.header:
+                return int(self.header[key])
+        return None
+
+    @property
+    def edge_weight_type(self) -> Optional[str]:
+        return self.header.get("EDGE_WEIGHT_TYPE")
+
+
+def _is_data_line(line: str) -> bool:
+    c = line[0]
+    return c.isdigit() or c in "+-."
+
+
+def _parse_cluster_line(line: str) -> List[int]:
+    """`id v1 v2 ... -1` -> [v1-1, v2-1, ...]; linhas com < 3 tokens são ignoradas."""
+    toks = line.split()
+    if len(toks) < 3:
+        return []
+    vs: List[int] = []
+    # toks[0] = id do cluster (ignora)
+    for t in toks[1:]:
+        if t == "-1":
+            break
+        vs.append(int(t) - 1)
+    return vs
+
+
+def _coords_from_lines(path: Path, lines: List[str], n: Optional[int]) -> np.ndarray:
+    """
+    Converte as linhas `id x y` de uma vez: junta tudo e deixa o NumPy
+    converter os tokens. Se alguma linha não tiver exatamente 3 tokens,
+    cai no caminho linha a linha (só usa os 3 primeiros).
+    """
+    toks = " ".join(lines).split()
+    if len(toks) == 3 * len(lines):
+        arr = np.array(toks, dtype=np.float64).reshape(-1, 3)
+    else:
+        rows = []
+        for ln in lines:
+            t = ln.split()
+            if len(t) < 3:
+                raise ValueError(f"{path}: linha de coordenada inválida")
+            rows.append((float(t[0]), float(t[1]), float(t[2])))
+        arr = np.array(rows, dtype=np.float64).reshape(-1, 3)
+
+    size = n if n is not None else len(arr)
+    if len(arr) < size:
+        raise ValueError(f"{path}: NODE_COORD_SECTION tem {len(arr)} linhas, esperava {size}")
+    arr = arr[:size]
+
+    ids = arr[:, 0].astype(np.int64) - 1  # 1-based no arquivo
+    if ids.min(initial=0) < 0 or ids.max(initial=-1) >= size:
+        raise ValueError(f"{path}: id de vértice fora do range em NODE_COORD_SECTION")
+
+    coords = np.zeros((size, 2), dtype=np.float64)
+    coords[ids] = arr[:, 1:3]
+    return coords
+
+
+def parse_tsplib(path: Path, read_coords: bool = True) -> TSPLIBData:
+    """
+    Parser em streaming (uma passada) para instâncias TSPLIB/GTSP do CluSteiner:
+
+      - cabeçalho `CHAVE : valor` (NAME/Name, DIMENSION, GTSP_SETS,
+        NUMBER_OF_CLUSTERS, EDGE_WEIGHT_TYPE, ...);
+      - NODE_COORD_SECTION (convertida em bloco para um array n x 2);
+      - GTSP_SET_SECTION / CLUSTER_SECTION (clusters de terminais);
+      - qualquer outra *_SECTION é guardada crua em `other_sections`.
+
+    Uma linha que não começa com número fecha a seção corrente.
+    `read_coords=False` pula a conversão das coordenadas (ex.: resumo do dataset).
+    """
+    path = Path(path)
+    data = TSPLIBData(path=path)
+
+    section: Optional[str] = None
+    coord_lines: List[str] = []
+
+    with path.open("r", encoding="utf-8", errors="ignore") as f:
+        for raw in f:
+            line = raw.strip()
+            if not line:
+                continue
+
+            if section is not None and _is_data_line(line):
+                if section == "NODE_COORD_SECTION":
+                    if read_coords:
+                        coord_lines.append(line)
+                elif section in CLUSTER_SECTIONS:
+                    if section != data.cluster_section:
+                        continue
+                    vs = _parse_cluster_line(line)
+                    if vs:
+                        data.clusters.append(vs)
+                else:
+                    data.other_sections[section].append(line)
+                continue
+
+            # linha de palavra-chave: fecha a seção corrente
+            key, sep, value = line.partition(":")
+            key = key.strip().upper()
+            if key == "EOF":
+                break
+            if key.endswith("_SECTION"):
+                section = key
+                if key in CLUSTER_SECTIONS:
+                    data.cluster_section = data.cluster_section or key
+                elif key != "NODE_COORD_SECTION":
+                    data.other_sections.setdefault(key, [])
+                continue
+
+            section = None
+            if sep:
+                data.header[key] = value.strip()
+
+    if read_coords and coord_lines:
+        data.coords = _coords_from_lines(path, coord_lines, data.dimension)
+
+    return data
+
+
+# Formatos de EDGE_WEIGHT_SECTION. As variantes *_COL listam o triângulo
+# oposto na mesma ordem, então (matriz simétrica) equivalem ao *_ROW "espelhado".
+_FORMAT_ALIASES = {
+    "UPPER_COL": "LOWER_ROW",
+    "LOWER_COL": "UPPER_ROW",
+    "UPPER_DIAG_COL": "LOWER_DIAG_ROW",
+    "LOWER_DIAG_COL": "UPPER_DIAG_ROW",
+}
+EDGE_WEIGHT_FORMATS = ("FULL_MATRIX", "UPPER_ROW", "LOWER_ROW", "UPPER_DIAG_ROW", "LOWER_DIAG_ROW") + tuple(_FORMAT_ALIASES)
+
+
+def _section_values(lines: List[str]) -> np.ndarray:
+    """Todos os números de uma seção, convertidos de uma vez (float64)."""
+    return np.array(" ".join(lines).split(), dtype=np.float64)
+
+
+def explicit_weight_matrix(data: TSPLIBData, n: int, dtype=np.float64, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    EDGE_WEIGHT_SECTION -> matriz simétrica n x n (diagonal 0), no `dtype` pedido.
+
+    `out` permite escrever direto num memmap (np.lib.format.open_memmap).
+    O formato vem de EDGE_WEIGHT_FORMAT (padrão FULL_MATRIX).
+    """
+    fmt = data.header.get("EDGE_WEIGHT_FORMAT", "FULL_MATRIX").upper()
+    fmt = _FORMAT_ALIASES.get(fmt, fmt)
+    if fmt not in EDGE_WEIGHT_FORMATS:
+        raise ValueError(f"{data.path}: EDGE_WEIGHT_FORMAT {fmt!r} não suportado")
+
+    vals = _section_values(data.other_sections.get("EDGE_WEIGHT_SECTION", []))
+    D = np.zeros((n, n), dtype=dtype) if out is None else out
+
+    if fmt == "FULL_MATRIX":
+        if len(vals) < n * n:
+            raise ValueError(f"{data.path}: EDGE_WEIGHT_SECTION tem {len(vals)} valores, esperava {n * n}")
+        D[:] = vals[: n * n].reshape(n, n)
+        np.fill_diagonal(D, 0)
+        return D
+
+    diag = fmt.endswith("DIAG_ROW")
+    upper = fmt.startswith("UPPER")
+    expected = n * (n + 1) // 2 if diag else n * (n - 1) // 2
+    if len(vals) < expected:
+        raise ValueError(f"{data.path}: EDGE_WEIGHT_SECTION tem {len(vals)} valores, esperava {expected}")
+
+    if out is not None:
+        D[:] = 0
+    off = 0
+    for i in range(n):
+        # linha i do triângulo: colunas j > i (upper) ou j < i (lower), com/sem diagonal
+        if upper:
+            lo, hi = (i, n) if diag else (i + 1, n)
+        else:
+            lo, hi = (0, i + 1) if diag else (0, i)
+        seg = vals[off:off + (hi - lo)]
+        off += hi - lo
+        D[i, lo:hi] = seg
+        D[lo:hi, i] = seg
+    np.fill_diagonal(D, 0)
+    return D
+
+
+def edge_data_arrays(data: TSPLIBData) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    EDGE_DATA_SECTION com linhas `u v w` (1-based, terminada opcionalmente em -1)
+    -> arrays (u, v, w) 0-based, para montar o grafo esparso.
+    """
+    lines = [ln for ln in data.other_sections.get("EDGE_DATA_SECTION", []) if ln.split()[0] != "-1"]
+    toks = " ".join(lines).split()
+    if len(toks) != 3 * len(lines):
+        raise ValueError(f"{data.path}: EDGE_DATA_SECTION precisa de linhas 'u v w'")
+    arr = np.array(toks, dtype=np.float64).reshape(-1, 3)
+    return arr[:, 0].astype(np.int64) - 1, arr[:, 1].astype(np.int64) - 1, arr[:, 2]
@@ -1,20 +1,71 @@
 from __future__ import annotations
 
-from collections import deque
-from typing import Dict, List, Set, Tuple
+import math
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
 
 from .instance import Instance
-from .solution import Solution, TreeEdge
+from .solution import ArraySolution, Solution, TreeEdge
+
+
+# violação preguiçosa: a mensagem só é montada se alguém chamar
+Violation = Callable[[], str]
 
 
 class VerificationResult:
-    def __init__(self, feasible: bool, violations: List[str], cost: float | None = None):
+    def __init__(
+        self,
+        feasible: bool,
+        violations: List[str],
+        cost: float | None = None,
+        declared_cost: float | None = None,
+    ):
         self.feasible = feasible
         self.violations = violations
-        self.cost = cost  # custo recalculado (opcional, por enquanto pode ser None)
+        self.cost = cost  # custo recalculado pelos pesos da instância (None se há aresta fora do range)
+        self.declared_cost = declared_cost  # COST declarado na solução
+
+    @property
+    def cost_drift(self) -> float | None:
+        """COST declarado - custo real (None se algum dos dois não existe)."""
+        if self.cost is None or self.declared_cost is None:
+            return None
+        return self.declared_cost - self.cost
+
+    def cost_matches(self, rel_tol: float = 1e-6, abs_tol: float = 1e-9) -> bool:
+        """O COST declarado bate com o custo real (dentro da tolerância)?"""
+        if self.cost is None or self.declared_cost is None:
+            return False
+        return math.isclose(self.declared_cost, self.cost, rel_tol=rel_tol, abs_tol=abs_tol)
 
     def __repr__(self) -> str:
-        return f"VerificationResult(feasible={self.feasible}, violations={self.violations}, cost={self.cost})"
+        return (
+            f"VerificationResult(feasible={self.feasible}, violations={self.violations}, "
+            f"cost={self.cost}, declared_cost={self.declared_cost})"
+        )
+
+
+def _edge_array(solution: Solution) -> np.ndarray:
+    if isinstance(solution, ArraySolution):
+        return solution.edge_array
+    return np.asarray(solution.edges, dtype=np.int64).reshape(-1, 2)
+
+
+# (arestas m x 2, máscara das que estão no range, pesos das que estão no range)
+_EdgeWeights = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _edge_weights(instance: Instance, solution: Solution) -> _EdgeWeights:
+    """Pesos de todas as arestas (no range) da solução com UM gather no oráculo."""
+    E = _edge_array(solution)
+    ok = ((E >= 0) & (E < instance.n)).all(axis=1)
+    if ok.all():
+        ws = instance.weights.gather(E[:, 0], E[:, 1])
+    else:
+        ws = instance.weights.gather(E[ok, 0], E[ok, 1])
+    return E, ok, np.asarray(ws, dtype=np.float64)
 
 
 def _build_solution_graph(edges: List[TreeEdge]) -> Tuple[Dict[int, List[int]], Set[int]]:
@@ -32,207 +83,310 @@ def _build_solution_graph(edges: List[TreeEdge]) -> Tuple[Dict[int, List[int]],
     return adj, used_vertices
 
 
-def _check_tree(adj: Dict[int, List[int]], used_vertices: Set[int]) -> List[str]:
-    """Verifica se o grafo definido por adj/used_vertices é uma árvore."""
+@dataclass
+class _RootedForest:
+    """
+    Floresta geradora do grafo da solução, enraizada UMA vez por DFS
+    (uma raiz por componente). Os vértices ganham índices compactos
+    0..N-1 em pré-ordem, então cada subárvore é um intervalo contíguo
+    de índices e cada componente também.
+
+    Índices compactos porque o grafo da solução pode citar vértices fora
+    do range da instância (isso é reportado à parte).
+    """
+
+    index: Dict[int, int] = field(default_factory=dict)  # vértice -> índice (pré-ordem)
+    vertices: List[int] = field(default_factory=list)    # índice -> vértice
+    parent: List[int] = field(default_factory=list)      # índice do pai (-1 na raiz)
+    depth: List[int] = field(default_factory=list)
+    comp: List[int] = field(default_factory=list)        # componente (0 = o da 1a raiz)
+    num_comps: int = 0
+
+    def _visit(self, v: int, p: int, c: int) -> None:
+        self.index[v] = len(self.vertices)
+        self.vertices.append(v)
+        self.parent.append(p)
+        self.depth.append(0 if p < 0 else self.depth[p] + 1)
+        self.comp.append(c)
+
+    def add_isolated(self, v: int) -> int:
+        """Índice de v; se v não está no grafo, vira um componente de um vértice só."""
+        i = self.index.get(v)
+        if i is None:
+            i = len(self.vertices)
+            self._visit(v, -1, self.num_comps)
+            self.num_comps += 1
+        return i
+
+    def path(self, a: int, b: int, out: List[int]) -> None:
+        """Acrescenta a `out` os índices do caminho a..b (mesmo componente) subindo até o LCA."""
+        parent, depth = self.parent, self.depth
+        while depth[a] > depth[b]:
+            out.append(a)
+            a = parent[a]
+        while depth[b] > depth[a]:
+            out.append(b)
+            b = parent[b]
+        while a != b:
+            out.append(a)
+            out.append(b)
+            a = parent[a]
+            b = parent[b]
+        out.append(a)
+
+
+def _root_forest(adj: Dict[int, List[int]], used_vertices: Set[int]) -> _RootedForest:
+    """
+    DFS iterativa a partir de cada vértice ainda não visitado, na ordem de
+    `used_vertices` (a primeira raiz é next(iter(used_vertices)), a mesma
+    partida de _check_tree). O(|V| + |E|).
+
+    Em grafo com ciclo a floresta é uma DFS qualquer; a violação de árvore
+    já é reportada por _check_tree.
+    """
+    forest = _RootedForest()
+    index = forest.index
+    for r in used_vertices:
+        if r in index:
+            continue
+        c = forest.num_comps
+        forest.num_comps += 1
+        stack = [(r, -1)]
+        while stack:
+            u, p = stack.pop()
+            if u in index:
+                continue
+            forest._visit(u, p, c)
+            iu = index[u]
+            for v in adj.get(u, ()):
+                if v not in index:
+                    stack.append((v, iu))
+    return forest
 
-    violations: List[str] = []
+
+def _check_tree(
+    adj: Dict[int, List[int]],
+    used_vertices: Set[int],
+    forest: Optional[_RootedForest] = None,
+) -> Iterator[Violation]:
+    """Verifica se o grafo definido por adj/used_vertices é uma árvore."""
 
     if not used_vertices:
-        violations.append("Solução não contém vértices (lista de arestas vazia).")
-        return violations
-
-    # BFS/DFS a partir de um vértice qualquer
-    start = next(iter(used_vertices))
-    visited: Set[int] = set()
-    parent: Dict[int, int] = {}
-
-    queue = deque([start])
-    visited.add(start)
-
-    while queue:
-        u = queue.popleft()
-        for v in adj.get(u, []):
-            if v not in visited:
-                visited.add(v)
-                parent[v] = u
-                queue.append(v)
-            else:
-                # Encontrou aresta de retorno que não é para o pai -> potencial ciclo,
-                # mas em grafo não-direcionado precisamos tomar cuidado.
-                if parent.get(u) != v:
-                    # Vamos apenas marcar que pode haver ciclo; checaremos com |E| = |V|-1 também
-                    pass
-
-    if visited != used_vertices:
-        missing = used_vertices - visited
-        violations.append(
-            f"Árvore não conexa: vértices não alcançáveis a partir de {start}: {sorted(missing)}"
-        )
+        yield lambda: "Solução não contém vértices (lista de arestas vazia)."
+        return
+
+    if forest is None:
+        forest = _root_forest(adj, used_vertices)
+
+    # alcançáveis a partir da primeira raiz = componente 0
+    if forest.num_comps > 1:
+        def _msg() -> str:
+            missing = [v for v, c in zip(forest.vertices, forest.comp) if c != 0]
+            return (
+                f"Árvore não conexa: vértices não alcançáveis a partir de {forest.vertices[0]}: {sorted(missing)}"
+            )
+        yield _msg
 
     # Checagem clássica: em uma árvore, |E| = |V| - 1
     num_edges = sum(len(vs) for vs in adj.values()) // 2  # cada aresta contada duas vezes
     num_vertices = len(used_vertices)
     if num_edges != num_vertices - 1:
-        violations.append(
+        yield lambda: (
             f"Não satisfaz |E| = |V| - 1 (tem {num_edges} arestas para {num_vertices} vértices). "
             "Provavelmente não é uma árvore (pode ter ciclo ou múltiplos componentes)."
         )
 
-    return violations
 
-
-def _check_terminals(instance: Instance, used_vertices: Set[int]) -> List[str]:
+def _check_terminals(instance: Instance, used_vertices: Set[int]) -> Iterator[Violation]:
     """Verifica se todos os vértices terminais R aparecem na solução."""
-    violations: List[str] = []
-    missing = set(instance.terminals) - used_vertices
-    if missing:
-        violations.append(f"Terminais ausentes na solução: {sorted(missing)}")
-    return violations
-
+    if any(t not in used_vertices for t in instance.terminals):
+        yield lambda: f"Terminais ausentes na solução: {sorted(set(instance.terminals) - used_vertices)}"
 
-def _shortest_path_tree(adj: Dict[int, List[int]], start: int, target: int) -> List[int]:
-    """
-    Encontra um caminho (não ponderado) entre start e target no grafo da solução.
-    Como a solução deveria ser uma árvore, esse caminho é único se existir.
-    """
-    if start == target:
-        return [start]
-
-    queue = deque([start])
-    parent: Dict[int, int] = {start: -1}
-
-    while queue:
-        u = queue.popleft()
-        for v in adj.get(u, []):
-            if v not in parent:
-                parent[v] = u
-                queue.append(v)
-                if v == target:
-                    # podemos parar cedo
-                    queue.clear()
-                    break
-
-    if target not in parent:
-        # não há caminho no grafo da solução (árvore quebrada)
-        return []
-
-    # Reconstrói caminho target -> start usando parent
-    path = []
-    cur = target
-    while cur != -1:
-        path.append(cur)
-        cur = parent[cur]
-    path.reverse()
-    return path
-
-
-def _compute_local_tree_vertices_for_cluster(
-    adj: Dict[int, List[int]],
-    cluster_terminals: List[int],
-) -> Set[int]:
-    """
-    Para um cluster R_k, retorna o conjunto de vértices V_k do menor subgrafo
-    que conecta todos os seus terminais, assumindo que a solução é uma árvore.
 
-    Implementação simples:
-    - Para cada par de terminais do cluster, pega o caminho entre eles na árvore.
-    - V_k é a união de todos os vértices de todos esses caminhos.
+def _local_tree_indices(forest: _RootedForest, cluster_terminals: List[int], stamp: List[int], tag: int) -> List[int]:
     """
-    V_k: Set[int] = set()
-
-    if not cluster_terminals:
-        return V_k
-
-    # Para evitar O(|R_k|^2) muito grande, poderíamos fixar um "root" e conectar tudo a ele,
-    # mas como as instâncias relevantes não são gigantes nesta fase, mantemos simples.
-    t_list = cluster_terminals
-    for i in range(len(t_list)):
-        for j in range(i + 1, len(t_list)):
-            a = t_list[i]
-            b = t_list[j]
-            path = _shortest_path_tree(adj, a, b)
-            if not path:
-                # Se não há caminho, a solução já está quebrada como árvore
-                # (isso será pego nas outras checagens), mas aqui marcamos V_k parcial.
-                continue
-            V_k.update(path)
-
-    # Caso o cluster tenha só um terminal, a "local tree" é apenas esse vértice.
-    if len(t_list) == 1:
-        V_k.add(t_list[0])
+    Índices (na floresta) de V_k: o menor subgrafo que conecta os terminais
+    do cluster, componente a componente.
 
-    return V_k
+    Ordenando os terminais pela pré-ordem, a subárvore de Steiner é a união
+    dos caminhos entre terminais consecutivos (cada aresta dela separa um
+    intervalo contíguo da pré-ordem). Cada caminho sobe até o LCA, então o
+    custo é O(|R_k| log |R_k| + |V_k|).
 
-
-def _check_cluster_disjointness(instance: Instance, adj: Dict[int, List[int]]) -> List[str]:
+    Terminais sozinhos no seu componente não entram (não há caminho até os
+    outros); cluster de um terminal só -> V_k = {terminal}. `stamp`/`tag`
+    deduplicam sem montar um set por cluster.
+    """
+    if len(cluster_terminals) == 1:
+        i = forest.add_isolated(cluster_terminals[0])
+        stamp[i] = tag
+        return [i]
+
+    ts = sorted(forest.add_isolated(t) for t in cluster_terminals)
+    comp = forest.comp
+    path: List[int] = []
+    for a, b in zip(ts, ts[1:]):
+        if comp[a] == comp[b]:
+            forest.path(a, b, path)
+
+    out: List[int] = []
+    for i in path:
+        if stamp[i] != tag:
+            stamp[i] = tag
+            out.append(i)
+    return out
+
+
+def _check_cluster_disjointness(
+    instance: Instance,
+    adj: Dict[int, List[int]],
+    forest: Optional[_RootedForest] = None,
+    fail_fast: bool = False,
+) -> Iterator[Violation]:
     """
     Checa se os local trees dos clusters são disjuntos.
 
-    Para cada cluster R_k:
-      - calcula V_k, o conjunto de vértices do menor subgrafo que conecta R_k;
-    Depois verifica se V_i ∩ V_j = ∅ para todo i ≠ j.
-    """
-    violations: List[str] = []
-    cluster_vertex_sets: List[Set[int]] = []
+    Para cada cluster R_k calcula V_k (ver _local_tree_indices) e marca o
+    dono de cada vértice num único array; um vértice que já tem dono é
+    interseção. Tudo em O(n + |R| log |R|) sobre a floresta enraizada, em
+    vez de uma BFS por par de terminais e uma interseção por par de clusters.
 
-    # Construir listas de terminais por cluster a partir de instance.clusters
+    As interseções só são agrupadas por par de clusters no fim; com
+    fail_fast a primeira encontrada já encerra a checagem.
+    """
+    if forest is None:
+        forest = _root_forest(adj, set(adj))
+
+    # terminais fora da solução entram como vértices isolados
+    for Ck in instance.clusters:
+        for t in Ck:
+            forest.add_isolated(t)
+    N = len(forest.vertices)
+    stamp = [-1] * N
+    owner = [-1] * N
+    shared: Dict[int, List[int]] = {}  # índice -> clusters (posições) que o contêm, se > 1
+
+    pos = 0  # posição na lista de local trees (clusters vazios não entram, como antes)
     for k, Ck in enumerate(instance.clusters):
         if not Ck:
-            violations.append(f"Cluster {k} está vazio na Instance (violação de modelo).")
+            yield lambda k=k: f"Cluster {k} está vazio na Instance (violação de modelo)."
             continue
 
-        Vk = _compute_local_tree_vertices_for_cluster(adj, Ck)
+        Vk = _local_tree_indices(forest, Ck, stamp, pos)
         if not Vk:
-            violations.append(
+            yield lambda k=k, Ck=Ck: (
                 f"Cluster {k} (terminais {Ck}) não está conectado na solução (local tree vazio)."
             )
-        cluster_vertex_sets.append(Vk)
-
-    # Checar interseções
-    h = len(cluster_vertex_sets)
-    for i in range(h):
-        for j in range(i + 1, h):
-            inter = cluster_vertex_sets[i] & cluster_vertex_sets[j]
-            if inter:
-                violations.append(
-                    f"Violação de disjunção entre clusters {i} e {j}: "
-                    f"local trees compartilham vértices {sorted(inter)}"
-                )
-
-    return violations
+        for i in Vk:
+            o = owner[i]
+            if o == -1:
+                owner[i] = pos
+            else:
+                if fail_fast:
+                    yield lambda: "Violação de disjunção entre clusters"
+                    return
+                shared.setdefault(i, [o]).append(pos)
+        pos += 1
+
+    if not shared:
+        return
+
+    # interseções por par de clusters, na ordem (i, j) da checagem par-a-par
+    inter: Dict[Tuple[int, int], List[int]] = {}
+    for i, hs in shared.items():
+        v = forest.vertices[i]
+        for a in range(len(hs)):
+            for b in range(a + 1, len(hs)):
+                inter.setdefault((hs[a], hs[b]), []).append(v)
+    for (i, j) in sorted(inter):
+        yield lambda i=i, j=j: (
+            f"Violação de disjunção entre clusters {i} e {j}: "
+            f"local trees compartilham vértices {sorted(inter[(i, j)])}"
+        )
 
 
-def verify_solution(instance: Instance, solution: Solution) -> VerificationResult:
+def _violations(
+    instance: Instance,
+    solution: Solution,
+    fail_fast: bool = False,
+    edge_weights: Optional[_EdgeWeights] = None,
+) -> Iterator[Violation]:
     """
-    Verifica se a solução é factível para a instância, de acordo com as regras:
-
-      - Árvore (conexa, acíclica)
-      - Cobertura de todos os terminais
-      - Local trees por cluster disjuntos
+    Todas as checagens de factibilidade, em ordem, como gerador preguiçoso:
+    cada violação sai como uma função que monta a mensagem, então quem só
+    quer saber se existe alguma (is_feasible) para na primeira e não formata
+    nada. verify_solution e is_feasible usam este mesmo gerador.
 
-    Ainda não estamos recalculando o custo a partir de Instance.edges,
-    isso será conectado quando o loader real de arestas estiver pronto.
+    `edge_weights` (de _edge_weights) reaproveita o gather já feito para o
+    custo; sem ele, só grafo não-completo consulta os pesos.
     """
-    violations: List[str] = []
-
     # Construir grafo da solução
-    adj, used_vertices = _build_solution_graph(solution.edges)
+    edges = solution.edges
+    adj, used_vertices = _build_solution_graph(edges)
 
     # 1) Checar se índices das arestas estão no range
-    for u, v in solution.edges:
-        if not (0 <= u < instance.n and 0 <= v < instance.n):
-            violations.append(
-                f"Aresta ({u}, {v}) fora do range [0, {instance.n - 1}]"
-            )
-
-    # 2) Checar se é árvore
-    violations.extend(_check_tree(adj, used_vertices))
+    n = instance.n
+    if edge_weights is not None:
+        E, ok, ws = edge_weights
+    else:
+        E = _edge_array(solution)
+        ok = ((E >= 0) & (E < n)).all(axis=1)
+        ws = None
+    for i in np.flatnonzero(~ok).tolist():
+        u, v = edges[i]
+        yield lambda u=u, v=v: f"Aresta ({u}, {v}) fora do range [0, {n - 1}]"
+
+    # 1b) Em grafo não-completo, a aresta precisa existir (peso finito no oráculo)
+    weights = instance.weights
+    if not weights.complete and ok.any():
+        if ws is None:
+            ws = weights.gather(E[ok, 0], E[ok, 1])
+        idx = np.flatnonzero(ok)
+        for i in idx[np.isinf(ws)].tolist():
+            u, v = edges[i]
+            yield lambda u=u, v=v: f"Aresta ({u}, {v}) não existe no grafo da instância"
+
+    # 2) Checar se é árvore (a floresta enraizada é reaproveitada no passo 4)
+    forest = _root_forest(adj, used_vertices)
+    yield from _check_tree(adj, used_vertices, forest)
 
     # 3) Cobertura de terminais
-    violations.extend(_check_terminals(instance, used_vertices))
+    yield from _check_terminals(instance, used_vertices)
 
     # 4) Disjunção dos clusters (local trees)
-    violations.extend(_check_cluster_disjointness(instance, adj))
+    yield from _check_cluster_disjointness(instance, adj, forest, fail_fast)
+
+
+def is_feasible(instance: Instance, solution: Solution) -> bool:
+    """
+    Mesmo resultado que verify_solution(instance, solution).feasible, mas
+    para na primeira violação e não monta mensagens (para o laço do ALNS).
+    """
+    return next(_violations(instance, solution, fail_fast=True), None) is None
+
+
+def verify_solution(instance: Instance, solution: Solution) -> VerificationResult:
+    """
+    Verifica se a solução é factível para a instância, de acordo com as regras:
+
+      - Árvore (conexa, acíclica)
+      - Cobertura de todos os terminais
+      - Local trees por cluster disjuntos
 
+    e recalcula o custo com um gather dos pesos de todas as arestas (o mesmo
+    que serve à checagem de existência em grafo não-completo). O COST
+    declarado vai junto, para detectar divergência (cost_drift / cost_matches).
+    """
+    ew = _edge_weights(instance, solution)
+    violations = [msg() for msg in _violations(instance, solution, edge_weights=ew)]
     feasible = len(violations) == 0
-    return VerificationResult(feasible=feasible, violations=violations, cost=None)
+
+    _, ok, ws = ew
+    cost = float(np.sum(ws, dtype=np.float64)) if ok.all() else None
+    declared = getattr(solution, "cost", None)
+    return VerificationResult(
+        feasible=feasible,
+        violations=violations,
+        cost=cost,
+        declared_cost=None if declared is None else float(declared),
+    )
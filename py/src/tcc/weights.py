@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+# Regras de arredondamento da TSPLIB suportadas pelo oráculo por coordenadas.
+TSPLIB_RULES = ("EUC_2D", "CEIL_2D", "ATT")
+
+
+def tsplib_round(dx: np.ndarray, dy: np.ndarray, rule: str = "EUC_2D") -> np.ndarray:
+    """
+    Distância TSPLIB vetorizada a partir das diferenças de coordenadas.
+
+      - EUC_2D : nint(sqrt(dx^2+dy^2))       (= int(sqrt(...) + 0.5))
+      - CEIL_2D: ceil(sqrt(dx^2+dy^2))
+      - ATT    : pseudo-euclidiana da TSPLIB (att48/att532)
+    """
+    if rule == "EUC_2D":
+        return np.floor(np.sqrt(dx * dx + dy * dy) + 0.5)
+    if rule == "CEIL_2D":
+        return np.ceil(np.sqrt(dx * dx + dy * dy))
+    if rule == "ATT":
+        r = np.sqrt((dx * dx + dy * dy) / 10.0)
+        t = np.floor(r + 0.5)
+        return np.where(t < r, t + 1.0, t)
+    raise ValueError(f"Regra de distância não suportada: {rule!r} (use uma de {TSPLIB_RULES})")
+
+
+def tsplib_matrix(
+    coords: np.ndarray,
+    rule: str = "EUC_2D",
+    dtype=np.float64,
+    block: int = 1024,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Matriz n x n com a regra TSPLIB. Calcula em blocos de linhas pra não alocar
+    temporários n x n x 2. `out` permite escrever direto num memmap.
+    """
+    n = coords.shape[0]
+    x = coords[:, 0]
+    y = coords[:, 1]
+    D = np.empty((n, n), dtype=dtype) if out is None else out
+    for i0 in range(0, n, block):
+        i1 = min(n, i0 + block)
+        dx = x[i0:i1, None] - x[None, :]
+        dy = y[i0:i1, None] - y[None, :]
+        D[i0:i1] = tsplib_round(dx, dy, rule)
+    return D
+
+
+class WeightOracle:
+    """
+    Interface comum de acesso a pesos w(u, v) de uma instância.
+
+    Operadores e verificador falam só com essa interface, então tanto faz se
+    os pesos vêm de uma matriz densa, de coordenadas (calculados sob demanda),
+    de um grafo esparso em CSR ou de uma lista de arestas.
+
+      - w(u, v)          -> float (inf se a aresta não existe)
+      - row(u, vs=None)  -> pesos de u para todos os vértices (ou só para vs)
+      - rows(us)         -> matriz len(us) x n (consulta em lote)
+      - submatrix(us, vs)
+      - gather(us, vs)   -> pesos dos pares (us[i], vs[i])
+      - total(edges)     -> soma dos pesos de uma lista/array de arestas (um gather)
+      - oracle[(u, v)]   -> igual a w(u, v); compatível com os dicts antigos
+      - neighbors(u)     -> (vizinhos, pesos) de u, só arestas existentes
+
+    `complete` diz se o grafo é completo (todo par tem aresta).
+    """
+
+    n: int
+    complete: bool = True
+
+    @property
+    def num_edges(self) -> int:
+        return self.n * (self.n - 1) // 2
+
+    def neighbors(self, u: int) -> Tuple[np.ndarray, np.ndarray]:
+        r = self.row(u)
+        mask = np.isfinite(r)
+        mask[u] = False
+        idx = np.flatnonzero(mask)
+        return idx, r[idx]
+
+    def w(self, u: int, v: int) -> float:
+        raise NotImplementedError
+
+    def rows(self, us) -> np.ndarray:
+        raise NotImplementedError
+
+    def row(self, u: int, vs=None) -> np.ndarray:
+        r = self.rows([u])[0]
+        return r if vs is None else r[np.asarray(vs, dtype=np.intp)]
+
+    def submatrix(self, us, vs) -> np.ndarray:
+        return self.rows(us)[:, np.asarray(vs, dtype=np.intp)]
+
+    def gather(self, us, vs) -> np.ndarray:
+        us = np.asarray(us, dtype=np.intp)
+        vs = np.asarray(vs, dtype=np.intp)
+        return np.fromiter((self.w(int(u), int(v)) for u, v in zip(us, vs)), dtype=np.float64, count=len(us))
+
+    def __getitem__(self, key: Tuple[int, int]) -> float:
+        u, v = key
+        return self.w(u, v)
+
+    def total(self, edges) -> float:
+        """Custo de um conjunto de arestas [(u, v), ...] ou array m x 2: um gather e uma soma."""
+        E = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+        if len(E) == 0:
+            return 0.0
+        return float(np.sum(self.gather(E[:, 0], E[:, 1]), dtype=np.float64))
+
+    def iter_edges(self):
+        """Gera (u, v, w) com u < v para toda aresta existente, linha a linha."""
+        for u in range(self.n - 1):
+            r = self.row(u)[u + 1:]
+            for j, w in enumerate(r.tolist()):
+                if w != np.inf:
+                    yield (u, u + 1 + j, float(w))
+
+
+class DenseWeights(WeightOracle):
+    """Pesos numa matriz densa n x n (float64 ou int32)."""
+
+    complete = True
+
+    def __init__(self, dist: np.ndarray) -> None:
+        self.dist = dist
+        self.n = int(dist.shape[0])
+
+    def w(self, u: int, v: int) -> float:
+        return float(self.dist[u, v])
+
+    def __getitem__(self, key: Tuple[int, int]) -> float:
+        return self.dist[key]
+
+    def rows(self, us) -> np.ndarray:
+        return np.asarray(self.dist[np.asarray(us, dtype=np.intp)], dtype=np.float64)
+
+    def row(self, u: int, vs=None) -> np.ndarray:
+        r = self.dist[u]
+        if vs is not None:
+            r = r[np.asarray(vs, dtype=np.intp)]
+        return np.asarray(r, dtype=np.float64)
+
+    def submatrix(self, us, vs) -> np.ndarray:
+        return np.asarray(self.dist[np.ix_(np.asarray(us, dtype=np.intp), np.asarray(vs, dtype=np.intp))], dtype=np.float64)
+
+    def gather(self, us, vs) -> np.ndarray:
+        return np.asarray(self.dist[np.asarray(us, dtype=np.intp), np.asarray(vs, dtype=np.intp)], dtype=np.float64)
+
+
+class EuclideanWeights(WeightOracle):
+    """
+    Oráculo implícito: guarda só as coordenadas (n x 2) e a regra TSPLIB,
+    e calcula os pesos sob demanda. Memória O(n) em vez de O(n²).
+    """
+
+    complete = True
+
+    def __init__(self, coords: np.ndarray, rule: str = "EUC_2D") -> None:
+        if rule not in TSPLIB_RULES:
+            raise ValueError(f"Regra de distância não suportada: {rule!r} (use uma de {TSPLIB_RULES})")
+        self.coords = np.ascontiguousarray(coords, dtype=np.float64)
+        self.rule = rule
+        self.n = int(self.coords.shape[0])
+        self._x = self.coords[:, 0]
+        self._y = self.coords[:, 1]
+
+    def w(self, u: int, v: int) -> float:
+        dx = np.float64(self._x[u] - self._x[v])
+        dy = np.float64(self._y[u] - self._y[v])
+        return float(tsplib_round(dx, dy, self.rule))
+
+    def rows(self, us) -> np.ndarray:
+        us = np.asarray(us, dtype=np.intp)
+        dx = self._x[us, None] - self._x[None, :]
+        dy = self._y[us, None] - self._y[None, :]
+        return tsplib_round(dx, dy, self.rule)
+
+    def row(self, u: int, vs=None) -> np.ndarray:
+        if vs is None:
+            dx = self._x[u] - self._x
+            dy = self._y[u] - self._y
+        else:
+            vs = np.asarray(vs, dtype=np.intp)
+            dx = self._x[u] - self._x[vs]
+            dy = self._y[u] - self._y[vs]
+        return tsplib_round(dx, dy, self.rule)
+
+    def submatrix(self, us, vs) -> np.ndarray:
+        us = np.asarray(us, dtype=np.intp)
+        vs = np.asarray(vs, dtype=np.intp)
+        dx = self._x[us, None] - self._x[None, vs]
+        dy = self._y[us, None] - self._y[None, vs]
+        return tsplib_round(dx, dy, self.rule)
+
+    def gather(self, us, vs) -> np.ndarray:
+        us = np.asarray(us, dtype=np.intp)
+        vs = np.asarray(vs, dtype=np.intp)
+        return tsplib_round(self._x[us] - self._x[vs], self._y[us] - self._y[vs], self.rule)
+
+
+class EdgeListWeights(WeightOracle):
+    """
+    Pesos a partir de uma lista de arestas (u, v, w) — o formato antigo da Instance.
+    Pares sem aresta valem inf.
+    """
+
+    def __init__(self, n: int, edges: Iterable[Tuple[int, int, float]]) -> None:
+        self.n = n
+        self._w: Dict[Tuple[int, int], float] = {}
+        self._adj: List[List[Tuple[int, float]]] = [[] for _ in range(n)]
+        for u, v, c in edges:
+            cc = float(c)
+            self._w[(u, v)] = cc
+            self._w[(v, u)] = cc
+            self._adj[u].append((v, cc))
+            self._adj[v].append((u, cc))
+        self.complete = len(self._w) == n * (n - 1)
+
+    def w(self, u: int, v: int) -> float:
+        if u == v:
+            return 0.0
+        return self._w.get((u, v), np.inf)
+
+    def rows(self, us) -> np.ndarray:
+        us = list(us)
+        R = np.full((len(us), self.n), np.inf)
+        for i, u in enumerate(us):
+            R[i, u] = 0.0
+            for v, c in self._adj[u]:
+                R[i, v] = c
+        return R
+
+    @property
+    def num_edges(self) -> int:
+        return len(self._w) // 2
+
+    def neighbors(self, u: int) -> Tuple[np.ndarray, np.ndarray]:
+        # mantém a ordem original das arestas
+        nb = self._adj[u]
+        return np.array([v for v, _ in nb], dtype=np.intp), np.array([c for _, c in nb], dtype=np.float64)
+
+    def iter_edges(self):
+        for (u, v), c in self._w.items():
+            if u < v:
+                yield (u, v, c)
+
+
+@dataclass
+class CSRGraph:
+    """
+    Grafo esparso não-direcionado em CSR, guardado nas duas direções:
+    os vizinhos de u são indices[indptr[u]:indptr[u+1]] (ordenados), com
+    pesos em data. Os arrays podem ser memmaps.
+    """
+
+    indptr: np.ndarray   # int64, tamanho n+1
+    indices: np.ndarray  # int32, tamanho nnz
+    data: np.ndarray     # float64 (ou int32), tamanho nnz
+
+    @property
+    def n(self) -> int:
+        return int(self.indptr.shape[0]) - 1
+
+    @classmethod
+    def from_edges(cls, n: int, us: np.ndarray, vs: np.ndarray, ws: np.ndarray, dtype=np.float64) -> "CSRGraph":
+        """Monta o CSR simétrico a partir de arrays (u, v, w) 0-based."""
+        us = np.asarray(us, dtype=np.int64)
+        vs = np.asarray(vs, dtype=np.int64)
+        rows = np.concatenate([us, vs])
+        cols = np.concatenate([vs, us])
+        vals = np.concatenate([ws, ws]).astype(dtype, copy=False)
+        order = np.lexsort((cols, rows))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        return cls(indptr=indptr, indices=cols[order].astype(np.int32), data=vals[order])
+
+
+class CSRWeights(WeightOracle):
+    """Pesos num grafo esparso (CSR). Pares sem aresta valem inf."""
+
+    def __init__(self, g: CSRGraph) -> None:
+        self.g = g
+        self.n = g.n
+        # chave global u*n+v, ordenada (CSR já vem ordenado por linha e coluna):
+        # permite w(u, v) e gather por busca binária vetorizada
+        rows = np.repeat(np.arange(self.n, dtype=np.int64), np.diff(g.indptr))
+        self._keys = rows * self.n + g.indices
+        self.complete = int(g.indices.shape[0]) == self.n * (self.n - 1)
+
+    @property
+    def num_edges(self) -> int:
+        return int(self.g.indices.shape[0]) // 2
+
+    def gather(self, us, vs) -> np.ndarray:
+        us = np.asarray(us, dtype=np.int64)
+        vs = np.asarray(vs, dtype=np.int64)
+        q = us * self.n + vs
+        pos = np.searchsorted(self._keys, q)
+        pos_c = np.minimum(pos, len(self._keys) - 1)
+        found = (pos < len(self._keys)) & (self._keys[pos_c] == q)
+        out = np.where(found, np.asarray(self.g.data, dtype=np.float64)[pos_c], np.inf)
+        out[us == vs] = 0.0
+        return out
+
+    def w(self, u: int, v: int) -> float:
+        return float(self.gather([u], [v])[0])
+
+    def neighbors(self, u: int) -> Tuple[np.ndarray, np.ndarray]:
+        a, b = int(self.g.indptr[u]), int(self.g.indptr[u + 1])
+        return np.asarray(self.g.indices[a:b], dtype=np.intp), np.asarray(self.g.data[a:b], dtype=np.float64)
+
+    def rows(self, us) -> np.ndarray:
+        us = list(us)
+        R = np.full((len(us), self.n), np.inf)
+        for i, u in enumerate(us):
+            idx, ws = self.neighbors(u)
+            R[i, idx] = ws
+            R[i, u] = 0.0
+        return R
+
+    def iter_edges(self):
+        for u in range(self.n):
+            idx, ws = self.neighbors(u)
+            for v, c in zip(idx.tolist(), ws.tolist()):
+                if u < v:
+                    yield (u, v, c)
+
+
+def weights_from_instance_fields(
+    n: int,
+    dist: Optional[np.ndarray],
+    coords: Optional[np.ndarray],
+    rule: Optional[str],
+    edges,
+    csr: Optional[CSRGraph] = None,
+) -> WeightOracle:
+    """Escolhe o oráculo a partir do que a Instance tem (matriz > CSR > coordenadas > arestas)."""
+    if dist is not None:
+        return DenseWeights(dist)
+    if csr is not None:
+        return CSRWeights(csr)
+    if coords is not None:
+        return EuclideanWeights(coords, rule or "EUC_2D")
+    return EdgeListWeights(n, edges or [])
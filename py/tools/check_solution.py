@@ -1,12 +1,18 @@
 from __future__ import annotations
 
+import csv
+import itertools
+import json
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 import typer
 
-from tcc import Instance, Solution, verify_solution
-from tcc.solution import parse_solution_file
+from tcc import ArraySolution, Instance, Solution, verify_solution
+from tcc.instance_cache import load_instance
+from tcc.solution import parse_solution_array, parse_solution_file
+from tcc.solution_store import is_solution_container, read_solutions
 
 app = typer.Typer(help="Verificador de soluções CluSteiner (.sol)")
 
@@ -65,6 +71,260 @@ def load_toy_instance() -> Instance:
     return inst
 
 
+# ---------- Índice nome da instância -> arquivo do dataset ----------
+
+
+def _instance_header_name(path: Path) -> Optional[str]:
+    """Valor de NAME no cabeçalho TSPLIB (lê só até a primeira seção)."""
+    with path.open("r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if ":" not in line:
+                if line.strip().endswith("_SECTION"):
+                    break
+                continue
+            key, value = line.split(":", 1)
+            key = key.strip().upper()
+            if key.endswith("_SECTION"):
+                break
+            if key == "NAME":
+                return value.strip() or None
+    return None
+
+
+def build_instance_index(data_dir: Path) -> Dict[str, Path]:
+    """
+    Nome da instância -> arquivo .txt, para todas as instâncias em data_dir.
+
+    O nome é o mesmo que load_instance dá à Instance (NAME do cabeçalho, ou
+    o nome do arquivo sem extensão); o nome do arquivo também entra como
+    chave. Em nome repetido vale o primeiro arquivo (ordem alfabética).
+    """
+    index: Dict[str, Path] = {}
+    for p in sorted(q for q in data_dir.rglob("*.txt") if q.is_file()):
+        for key in (_instance_header_name(p), p.stem):
+            if key and key not in index:
+                index[key] = p
+    return index
+
+
+def _solution_instance_name(path: Path) -> Optional[str]:
+    """Valor da linha INSTANCE de um .sol, sem ler as arestas."""
+    with path.open("r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith("INSTANCE"):
+                parts = line.split(maxsplit=1)
+                return parts[1].strip() if len(parts) == 2 else None
+            if line.startswith("EDGES"):
+                break
+    return None
+
+
+# ---------- Verificação de uma solução ----------
+
+REPORT_FIELDS = [
+    "source",
+    "record",
+    "instance",
+    "status",
+    "feasible",
+    "declared_cost",
+    "cost",
+    "cost_diff",
+    "num_edges",
+    "num_violations",
+    "first_violation",
+]
+
+
+def check_one(inst: Instance, sol: Union[Solution, ArraySolution], tol: float) -> Dict[str, object]:
+    """Linha do relatório de UMA solução: factibilidade + custo real vs COST declarado."""
+    res = verify_solution(inst, sol)
+    row: Dict[str, object] = {
+        "instance": sol.instance_name,
+        "declared_cost": res.declared_cost,
+        "cost": res.cost,
+        "cost_diff": res.cost_drift,
+        "num_edges": len(sol.edge_array) if isinstance(sol, ArraySolution) else len(sol.edges),
+        "feasible": int(res.feasible),
+        "num_violations": len(res.violations),
+        "first_violation": res.violations[0] if res.violations else "",
+    }
+    if not res.feasible:
+        row["status"] = "infeasible"
+    elif not res.cost_matches(rel_tol=tol):
+        row["status"] = "cost_mismatch"
+    else:
+        row["status"] = "ok"
+    return row
+
+
+def _error_row(source: str, record: Optional[int], instance: Optional[str], status: str, msg: str) -> Dict[str, object]:
+    return {"source": source, "record": record, "instance": instance, "status": status, "first_violation": msg}
+
+
+# ---------- Lote: tarefas do pool ----------
+
+# instâncias já carregadas neste processo (os lotes da mesma instância caem em sequência)
+_LOADED: Dict[Path, Instance] = {}
+_MAX_LOADED = 2
+
+
+def _get_instance(path: Path, cache_dir: Optional[Path]) -> Instance:
+    inst = _LOADED.get(path)
+    if inst is None:
+        if len(_LOADED) >= _MAX_LOADED:
+            _LOADED.pop(next(iter(_LOADED)))
+        inst = load_instance(path, cache_dir=cache_dir, trusted=True)
+        _LOADED[path] = inst
+    return inst
+
+
+# (instância, arquivos .sol) ou (None, contêiner .solb); mais cache_dir, índice e tolerância
+_Job = Tuple[Optional[Path], List[Path], Optional[Path], Dict[str, Path], float]
+
+
+def _check_job(job: _Job) -> List[Dict[str, object]]:
+    """
+    Tarefa do pool. Arquivos .sol vêm agrupados por instância (uma carga por
+    lote); um contêiner .solb é lido em streaming e cada solução resolve a
+    própria instância pelo índice.
+    """
+    inst_path, paths, cache_dir, index, tol = job
+    rows: List[Dict[str, object]] = []
+
+    if inst_path is None:
+        src = paths[0]
+        try:
+            for i, sol in enumerate(read_solutions(src)):
+                p = index.get(sol.instance_name)
+                if p is None:
+                    rows.append(_error_row(str(src), i, sol.instance_name, "unknown_instance", "instância não encontrada no índice"))
+                    continue
+                try:
+                    row = check_one(_get_instance(p, cache_dir), sol, tol)
+                except (OSError, ValueError) as e:
+                    row = _error_row(str(src), i, sol.instance_name, "error", str(e))
+                rows.append({"source": str(src), "record": i, **row})
+        except (OSError, ValueError) as e:
+            rows.append(_error_row(str(src), None, None, "error", str(e)))
+        return rows
+
+    try:
+        inst = _get_instance(inst_path, cache_dir)
+    except (OSError, ValueError) as e:
+        return [_error_row(str(p), None, None, "error", f"{inst_path}: {e}") for p in paths]
+
+    for p in paths:
+        try:
+            row = check_one(inst, parse_solution_array(p), tol)
+        except (OSError, ValueError) as e:
+            row = _error_row(str(p), None, None, "error", str(e))
+        rows.append({"source": str(p), "record": None, **row})
+    return rows
+
+
+def plan_jobs(
+    sol_paths: List[Path],
+    index: Dict[str, Path],
+    cache_dir: Optional[Path],
+    tol: float,
+    chunk: int,
+) -> Tuple[List[_Job], List[Dict[str, object]]]:
+    """
+    Agrupa os .sol por instância (lendo só a linha INSTANCE) e quebra cada
+    grupo em lotes de até `chunk` arquivos; cada contêiner .solb vira um
+    lote. Devolve (lotes, linhas de erro de quem nem dá pra verificar).
+    """
+    groups: Dict[Path, List[Path]] = {}
+    containers: List[Path] = []
+    errors: List[Dict[str, object]] = []
+    for p in sol_paths:
+        if is_solution_container(p):
+            containers.append(p)
+            continue
+        try:
+            name = _solution_instance_name(p)
+        except OSError as e:
+            errors.append(_error_row(str(p), None, None, "error", str(e)))
+            continue
+        if name is None:
+            errors.append(_error_row(str(p), None, None, "error", "Arquivo .sol sem linha INSTANCE"))
+            continue
+        inst_path = index.get(name)
+        if inst_path is None:
+            errors.append(_error_row(str(p), None, name, "unknown_instance", "instância não encontrada no índice"))
+            continue
+        groups.setdefault(inst_path, []).append(p)
+
+    jobs: List[_Job] = []
+    for inst_path in sorted(groups):
+        ps = groups[inst_path]
+        for i in range(0, len(ps), chunk):
+            jobs.append((inst_path, ps[i:i + chunk], cache_dir, {}, tol))
+    for c in containers:
+        jobs.append((None, [c], cache_dir, index, tol))
+    return jobs, errors
+
+
+def run_jobs(jobs: List[_Job], workers: int) -> Iterator[Dict[str, object]]:
+    """Linhas de todos os lotes, na ordem dos lotes, à medida que ficam prontas."""
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield from _check_job(job)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for rows in pool.map(_check_job, jobs):
+            yield from rows
+
+
+class ReportWriter:
+    """
+    Relatório em streaming, uma linha por solução com problema (ou todas):
+      - .csv: colunas REPORT_FIELDS;
+      - .jsonl: um objeto JSON por linha;
+      - .json: uma lista JSON, escrita item a item.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = path.open("w", newline="", encoding="utf-8")
+        suffix = path.suffix.lower()
+        self._mode = "jsonl" if suffix == ".jsonl" else ("json" if suffix == ".json" else "csv")
+        self._n = 0
+        self._csv = None
+        if self._mode == "csv":
+            self._csv = csv.DictWriter(self._f, fieldnames=REPORT_FIELDS)
+            self._csv.writeheader()
+        elif self._mode == "json":
+            self._f.write("[")
+
+    def write(self, row: Dict[str, object]) -> None:
+        row = {k: row.get(k) for k in REPORT_FIELDS}
+        if self._mode == "csv":
+            self._csv.writerow(row)
+        elif self._mode == "jsonl":
+            self._f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        else:
+            self._f.write(("," if self._n else "") + "\n" + json.dumps(row, ensure_ascii=False))
+        self._n += 1
+        self._f.flush()
+
+    def close(self) -> None:
+        if self._mode == "json":
+            self._f.write("\n]\n")
+        self._f.close()
+
+    def __enter__(self) -> "ReportWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ---------- Comandos de linha de comando ----------
+
+
 @app.command()
 def check(
     solution_path: Path = typer.Argument(
@@ -79,15 +339,25 @@ def check(
         None,
         "--instance_name",
         "-n",
-        help="Nome da instância (por enquanto ignorado; usamos instância toy interna)",
+        help="Nome da instância (padrão: a linha INSTANCE do .sol); só com --data_dir",
     ),
+    data_dir: Optional[Path] = typer.Option(
+        None,
+        "--data_dir",
+        "-d",
+        exists=True,
+        file_okay=False,
+        help="Diretório com as instâncias do dataset (sem ele, usa a instância toy interna)",
+    ),
+    cache_dir: Optional[Path] = typer.Option(None, "--cache_dir", help="Cache de instâncias (padrão: $TCC_CACHE_DIR ou ~/.cache/tcc)"),
 ):
     """
     Verifica uma solução .sol usando a lógica de verificação estrutural
     (árvore, terminais, clusters).
 
-    OBS: nesta fase, usamos uma instância 'toy' fixa.
-    Depois, este comando será conectado ao loader real das instâncias do dataset.
+    Com --data_dir a instância é achada pelo nome (índice do dataset) e o
+    custo é recalculado pelos pesos dela; sem ele, usa a instância 'toy' fixa.
+    Para muitos arquivos, veja o comando `batch`.
     """
     typer.echo(f"Lendo solução de: {solution_path}")
     sol = parse_solution_file(solution_path)
@@ -96,11 +366,22 @@ def check(
     typer.echo(f"COST declarado  = {sol.cost}")
     typer.echo(f"#arestas        = {len(sol.edges)}")
 
-    # Por enquanto, usamos uma instância pequena artificial.
-    inst = load_toy_instance()
-    typer.echo(f"Usando instância interna: {inst.name} (n={inst.n}, |R|={len(inst.terminals)})")
+    if data_dir is None:
+        inst = load_toy_instance()
+        typer.echo(f"Usando instância interna: {inst.name} (n={inst.n}, |R|={len(inst.terminals)})")
+    else:
+        name = instance_name or sol.instance_name
+        inst_path = build_instance_index(data_dir).get(name)
+        if inst_path is None:
+            typer.echo(f"Instância {name} não encontrada em {data_dir}")
+            raise typer.Exit(code=1)
+        inst = load_instance(inst_path, cache_dir=cache_dir, trusted=True)
+        typer.echo(f"Usando instância: {inst_path} (n={inst.n}, |R|={len(inst.terminals)})")
 
     result = verify_solution(inst, sol)
+    typer.echo(f"COST recalculado = {result.cost}")
+    if data_dir is not None and not result.cost_matches():
+        typer.echo(f"⚠️  COST declarado difere do custo real em {result.cost_drift}")
 
     if result.feasible:
         typer.echo("\n✅ Solução FEASÍVEL de acordo com as regras estruturais.")
@@ -110,5 +391,56 @@ def check(
             typer.echo(f"  - {v}")
 
 
+
+@app.command()
+def batch(
+    src: Path = typer.Argument(..., exists=True, help="Diretório com .sol/.solb (recursivo), ou um arquivo"),
+    data_dir: Path = typer.Option(..., "--data_dir", "-d", exists=True, file_okay=False, help="Diretório com as instâncias do dataset"),
+    report: Path = typer.Option(..., "--report", "-o", help="Relatório (.csv, .json ou .jsonl)"),
+    workers: int = typer.Option(1, "--workers", "-j", help="Processos para verificar em paralelo (1 = serial)"),
+    chunk: int = typer.Option(256, help="Máximo de .sol por lote (mesma instância)"),
+    tol: float = typer.Option(1e-6, help="Tolerância relativa entre COST declarado e recalculado"),
+    all_rows: bool = typer.Option(False, "--all", help="Inclui no relatório também as soluções corretas"),
+    cache_dir: Optional[Path] = typer.Option(None, "--cache_dir", help="Cache de instâncias (padrão: $TCC_CACHE_DIR ou ~/.cache/tcc)"),
+):
+    """
+    Audita muitas soluções de uma vez contra as instâncias reais.
+
+    Cada .sol é ligado à instância pela linha INSTANCE (índice de data_dir),
+    os arquivos são agrupados por instância (cada uma carregada uma vez por
+    lote) e verificados num pool de processos. O custo é recalculado pelos
+    pesos da instância; o relatório lista infactíveis, custos divergentes e
+    erros, gravado à medida que os lotes terminam.
+    """
+    if src.is_file():
+        sol_paths = [src]
+    else:
+        sol_paths = sorted(p for p in src.rglob("*") if p.is_file() and p.suffix in (".sol", ".solb"))
+    if not sol_paths:
+        typer.echo("Nenhuma solução encontrada!")
+        raise typer.Exit(code=1)
+
+    index = build_instance_index(data_dir)
+    typer.echo(f"Índice: {len(index)} nomes de instância em {data_dir}")
+
+    jobs, early = plan_jobs(sol_paths, index, cache_dir, tol, max(1, chunk))
+    typer.echo(f"{len(sol_paths)} arquivos, {len(jobs)} lotes, {max(1, workers)} processo(s)")
+
+    counts: Dict[str, int] = {}
+    with ReportWriter(report) as out:
+        for row in itertools.chain(early, run_jobs(jobs, max(1, workers))):
+            status = str(row["status"])
+            counts[status] = counts.get(status, 0) + 1
+            if all_rows or status != "ok":
+                out.write(row)
+
+    total = sum(counts.values())
+    typer.echo(f"\n{total} soluções verificadas -> relatório em {report}")
+    for status in sorted(counts):
+        typer.echo(f"  {status}: {counts[status]}")
+    if total != counts.get("ok", 0):
+        raise typer.Exit(code=1)
+
+
 if __name__ == "__main__":
     app()